@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Threshold calibration - full ROC sweeps from a single scoring pass.
+
+Every word is scored once. The scores are sorted and the confusion counts at
+every distinct threshold are read off with binary searches, so a whole
+language calibrates in O(n log n) instead of re-scoring the test set for each
+candidate threshold.
+
+Two detection rules are calibrated:
+    absolute: flag a word when score(word) < threshold
+    margin:   flag a word when score(candidate) - score(word) > margin
+For the margin rule the misspelling/correction pairs are the positives, and
+the same pairs reversed (the correct word checked against its misspelling)
+are the negatives.
+
+Usage:
+    python calibration.py                      # all languages, ROC curves in calibration_results/
+    python calibration.py --languages isiNdebele --output-dir /tmp/roc
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+
+import numpy as np
+
+from char_scorer import CharScorer, load_test_pairs
+
+
+CURVE_FIELDS = ['threshold', 'tp', 'fp', 'fn', 'tn', 'tpr', 'fpr', 'precision', 'recall', 'f1']
+
+LANGUAGES = [
+    ('isiZulu', 'models/isiZuluUModel.arpa', 'cleaned_corpora/isiZulu.txt', 'test_data/isiZulu_test_pairs.txt'),
+    ('isiXhosa', 'models/isiXhosaUModel.arpa', 'cleaned_corpora/isiXhosa.txt', 'test_data/isiXhosa_test_pairs.txt'),
+    ('isiNdebele', 'models/isiNdebeleUModel.arpa', 'cleaned_corpora/isiNdebele.txt', 'test_data/isiNdebele_test_pairs.txt'),
+    ('siSwati', 'models/siSwatiUModel.arpa', 'cleaned_corpora/siSwati.txt', 'test_data/siSwati_test_pairs.txt'),
+]
+
+
+def _divide(a, b):
+    return np.divide(a, b, out=np.zeros(len(a), dtype=np.float64), where=b > 0)
+
+
+def _cuts(values):
+    """Candidate thresholds: halfway between neighbouring distinct values, plus one beyond each end."""
+    distinct = np.unique(values)
+    if not len(distinct):
+        return np.zeros(1)
+    return np.concatenate(([distinct[0] - 1.0], (distinct[:-1] + distinct[1:]) / 2, [distinct[-1] + 1.0]))
+
+
+def curve_at(positive_scores, negative_scores, thresholds, flag_below=True):
+    """
+    Confusion counts and rates at the given thresholds.
+
+    Args:
+        positive_scores: Scores of the items that should be flagged
+        negative_scores: Scores of the items that should pass
+        thresholds: Thresholds to evaluate
+        flag_below: Flag items scoring below the threshold (absolute scores);
+                    False flags items above it (margins)
+
+    Returns:
+        Dict of NumPy arrays keyed by CURVE_FIELDS, one entry per threshold
+    """
+    positive = np.sort(np.asarray(positive_scores, dtype=np.float64))
+    negative = np.sort(np.asarray(negative_scores, dtype=np.float64))
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    if flag_below:
+        tp = np.searchsorted(positive, thresholds, side='left')
+        fp = np.searchsorted(negative, thresholds, side='left')
+    else:
+        tp = len(positive) - np.searchsorted(positive, thresholds, side='right')
+        fp = len(negative) - np.searchsorted(negative, thresholds, side='right')
+
+    fn = len(positive) - tp
+    tn = len(negative) - fp
+    precision = _divide(tp, tp + fp)
+    recall = _divide(tp, tp + fn)
+    return {
+        'threshold': thresholds,
+        'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'tpr': recall,
+        'fpr': _divide(fp, fp + tn),
+        'precision': precision,
+        'recall': recall,
+        'f1': _divide(2 * precision * recall, precision + recall),
+    }
+
+
+def roc_sweep(positive_scores, negative_scores, flag_below=True):
+    """
+    Confusion counts and rates at every distinct threshold.
+
+    Sorting the scores once and binary-searching every candidate threshold
+    gives the whole curve in O(n log n).
+
+    Returns:
+        curve_at() dict ordered from flagging nothing to flagging everything
+    """
+    cuts = _cuts(np.concatenate((np.asarray(positive_scores, dtype=np.float64),
+                                 np.asarray(negative_scores, dtype=np.float64))))
+    return curve_at(positive_scores, negative_scores, cuts if flag_below else cuts[::-1], flag_below)
+
+
+def pair_accuracy_sweep(wrong_scores, correct_scores):
+    """
+    Fraction of pairs where the wrong word is flagged (score < threshold) and
+    its correction passes, at every threshold where that fraction can change.
+
+    Returns:
+        (thresholds, accuracy) NumPy arrays
+    """
+    wrong = np.asarray(wrong_scores, dtype=np.float64)
+    correct = np.asarray(correct_scores, dtype=np.float64)
+    thresholds = _cuts(np.concatenate((wrong, correct)))
+    # a pair is right when wrong < t <= correct: pairs with wrong below t minus pairs with both below t
+    below_wrong = np.searchsorted(np.sort(wrong), thresholds, side='left')
+    below_both = np.searchsorted(np.sort(np.maximum(wrong, correct)), thresholds, side='left')
+    accuracy = _divide((below_wrong - below_both).astype(np.float64), np.full(len(thresholds), len(wrong)))
+    return thresholds, accuracy
+
+
+def auc(curve):
+    """Area under the ROC curve (trapezoidal)."""
+    fpr, tpr = curve['fpr'], curve['tpr']
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+def best_point(curve, metric='f1'):
+    """The row of a curve that maximizes metric, as a dict of plain numbers."""
+    i = int(np.argmax(curve[metric]))
+    return {field: curve[field][i].item() for field in CURVE_FIELDS}
+
+
+def write_curve(curve, path):
+    """Write a curve as CSV, one row per threshold."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CURVE_FIELDS)
+        writer.writerows(zip(*(curve[field].tolist() for field in CURVE_FIELDS)))
+
+
+def sample_corpus_words(corpus_path, num_samples, min_length=4, seed=None):
+    """Random sample of distinct alphabetic words from a corpus, as threshold_analysis draws them."""
+    words = set()
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            for word in line.split():
+                word = ''.join(c for c in word if c.isalpha())
+                if len(word) >= min_length:
+                    words.add(word)
+            if len(words) >= num_samples * 2:
+                break
+    return random.Random(seed).sample(sorted(words), min(num_samples, len(words)))
+
+
+def calibrate(scorer, wrong_words, correct_words, extra_correct_words=()):
+    """
+    Calibrate both detection rules for one language.
+
+    Args:
+        scorer: CharScorer for the language's model
+        wrong_words: Misspellings
+        correct_words: Their corrections, pairwise
+        extra_correct_words: More correctly spelled words (e.g. a corpus sample)
+                             to use as negatives for the absolute threshold
+
+    Returns:
+        Dict with the 'absolute' and 'margin' curves, their best (max F1)
+        points and AUCs, and the raw scores
+    """
+    wrong_scores = scorer.score_many(wrong_words)
+    correct_scores = scorer.score_many(correct_words)
+    extra_scores = scorer.score_many(extra_correct_words)
+    differences = correct_scores - wrong_scores
+
+    absolute = roc_sweep(wrong_scores, np.concatenate((correct_scores, extra_scores)), flag_below=True)
+    margin = roc_sweep(differences, -differences, flag_below=False)
+    return {
+        'absolute': absolute,
+        'margin': margin,
+        'best_absolute': best_point(absolute),
+        'best_margin': best_point(margin),
+        'absolute_auc': auc(absolute),
+        'margin_auc': auc(margin),
+        'wrong_scores': wrong_scores,
+        'correct_scores': correct_scores,
+        'extra_scores': extra_scores,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate absolute and margin detection thresholds per language.")
+    parser.add_argument('--languages', nargs='+', help="languages to calibrate (default: all)")
+    parser.add_argument('--samples', type=int, default=1000, help="correct words sampled from each corpus")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default='calibration_results', help="where ROC curves and the summary go")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Threshold Calibration")
+    print("=" * 80)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary = {}
+    for lang_name, model_path, corpus_path, test_path in LANGUAGES:
+        if args.languages and lang_name not in args.languages:
+            continue
+        if not os.path.exists(model_path) or not os.path.exists(test_path):
+            print(f"\n⚠ Warning: {lang_name}: missing {model_path} or {test_path}")
+            continue
+
+        scorer = CharScorer(model_path, cache=True)
+        wrong_words, correct_words = load_test_pairs(test_path)
+        extra = sample_corpus_words(corpus_path, args.samples, seed=args.seed) if os.path.exists(corpus_path) else []
+        result = calibrate(scorer, wrong_words, correct_words, extra)
+
+        for rule in ('absolute', 'margin'):
+            write_curve(result[rule], os.path.join(args.output_dir, f"{lang_name}_{rule}_roc.csv"))
+        summary[lang_name] = {
+            'pairs': len(wrong_words),
+            'corpus_samples': len(extra),
+            'best_absolute': result['best_absolute'],
+            'best_margin': result['best_margin'],
+            'absolute_auc': result['absolute_auc'],
+            'margin_auc': result['margin_auc'],
+        }
+
+        best_abs, best_margin = result['best_absolute'], result['best_margin']
+        print(f"\n{lang_name}: {len(wrong_words)} pairs, {len(extra)} corpus words, {scorer.report()}")
+        print(f"  Absolute: threshold {best_abs['threshold']:8.3f}  F1 {best_abs['f1']:.3f}  "
+              f"TPR {best_abs['tpr'] * 100:5.1f}%  FPR {best_abs['fpr'] * 100:5.1f}%  AUC {result['absolute_auc']:.3f}")
+        print(f"  Margin:   threshold {best_margin['threshold']:8.3f}  F1 {best_margin['f1']:.3f}  "
+              f"TPR {best_margin['tpr'] * 100:5.1f}%  FPR {best_margin['fpr'] * 100:5.1f}%  AUC {result['margin_auc']:.3f}")
+
+    with open(os.path.join(args.output_dir, 'calibration_summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(f"\nROC curves and summary written to {args.output_dir}/")
+
+
+if __name__ == '__main__':
+    main()
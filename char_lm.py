@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Compact binary format for the character-level ARPA models.
+
+compile_arpa() turns an ARPA file into a single memory-mappable file: the
+vocabulary followed by, for every order, a sorted array of packed n-gram keys
+(character IDs packed into one integer) with parallel probability and backoff
+arrays. CharLM maps that file and scores with the same backoff rules as KenLM,
+so it can stand in for kenlm.LanguageModel in CharScorer.
+
+For batches, CharLM.score_words() indexes each order's keys with an
+open-addressing hash table and resolves the backoff chain for every character
+position of every word at once with NumPy, so no kenlm extension is needed.
+kenlm is only imported by --verify, which checks the two agree.
+
+Usage:
+    python char_lm.py models/isiNdebeleUModel.arpa            # writes model_cache/isiNdebeleUModel-<digest>.clm
+    python char_lm.py models/isiNdebeleUModel.arpa -o out.clm
+    python char_lm.py models/isiNdebeleUModel.arpa --max-order 3  # writes model_cache/isiNdebeleUModel-<digest>.3gram.clm
+    python char_lm.py models/isiNdebeleUModel.arpa --verify   # compare with kenlm on test_data/*_test_pairs.txt
+"""
+
+import argparse
+import glob
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+
+MAGIC = b'CHARLM\0\0'
+FORMAT_VERSION = 1
+# magic, version, order, key bits per symbol, key bytes, vocab size, vocab bytes,
+# source size, source mtime (ns), source sha256
+HEADER = struct.Struct('<8sIIIIIIqq32s')
+ALIGN = 8
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_cache')
+TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data')
+
+# Fibonacci hashing multiplier for the lookup tables
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+# words per block in score_words, bounds the per-position working arrays
+SCORE_BLOCK = 1 << 15
+# characters str.split() treats as whitespace, dropped from words before scoring
+WHITESPACE = np.array([cp for cp in range(0x3001) if chr(cp).isspace()], dtype=np.uint32)
+
+
+def _pad(n):
+    return (-n) % ALIGN
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.digest()
+
+
+class HashIndex:
+    """
+    Open-addressing (linear probing) hash table mapping packed n-gram keys to
+    their row in the sorted key array. Built and probed with whole-array NumPy
+    operations, one probe step per round for every key still unresolved.
+    """
+
+    def __init__(self, keys):
+        size = 16
+        while size < 4 * len(keys):
+            size <<= 1
+        self.mask = size - 1
+        self.shift = np.uint64(64 - size.bit_length() + 1)
+        self.slot_keys = np.zeros(size, dtype=keys.dtype)
+        self.slot_rows = np.full(size, -1, dtype=np.intp)
+
+        pending = np.arange(len(keys))
+        slots = self._hash(keys)
+        while pending.size:
+            # every pending key whose slot is empty competes for it; the first one wins
+            free = self.slot_rows[slots] < 0
+            taken, first = np.unique(slots[free], return_index=True)
+            winners = pending[free][first]
+            self.slot_rows[taken] = winners
+            self.slot_keys[taken] = keys[winners]
+            placed = np.zeros(len(keys), dtype=bool)
+            placed[winners] = True
+            keep = ~placed[pending]
+            pending = pending[keep]
+            slots = (slots[keep] + 1) & self.mask
+
+    def _hash(self, keys):
+        return ((keys.astype(np.uint64) * HASH_MULTIPLIER) >> self.shift).astype(np.intp)
+
+    def lookup(self, keys):
+        """Row of each key in the sorted key array, -1 where it is absent."""
+        slots = self._hash(keys)
+        rows = self.slot_rows[slots]
+        # most keys resolve on the first probe, only collisions go round the loop
+        probe = np.nonzero((rows >= 0) & (self.slot_keys[slots] != keys))[0]
+        rows[probe] = -1
+        slots = slots[probe]
+        while probe.size:
+            slots = (slots + 1) & self.mask
+            found = self.slot_rows[slots]
+            occupied = found >= 0
+            hit = occupied & (self.slot_keys[slots] == keys[probe])
+            rows[probe[hit]] = found[hit]
+            more = occupied & ~hit
+            probe = probe[more]
+            slots = slots[more]
+        return rows
+
+
+def read_arpa(arpa_path):
+    """
+    Parse an ARPA file.
+
+    Returns:
+        (vocab, ngrams) where vocab lists the unigrams in file order and
+        ngrams[n - 1] is a list of (words, prob, backoff) tuples of order n
+    """
+    counts = []
+    ngrams = []
+    current = None
+    with open(arpa_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            if line.startswith('ngram ') and current is None:
+                counts.append(int(line.split('=', 1)[1]))
+                continue
+            if line.startswith('\\'):
+                if line.endswith('-grams:'):
+                    current = int(line[1:line.index('-')])
+                    while len(ngrams) < current:
+                        ngrams.append([])
+                elif line == '\\end\\':
+                    break
+                continue
+            if current is None:
+                continue
+            parts = line.split('\t')
+            prob = float(parts[0])
+            backoff = float(parts[2]) if len(parts) > 2 else 0.0
+            ngrams[current - 1].append((parts[1].split(' '), prob, backoff))
+
+    for n, expected in enumerate(counts, 1):
+        if len(ngrams[n - 1]) != expected:
+            raise ValueError(f"{arpa_path}: header lists {expected} {n}-grams, found {len(ngrams[n - 1])}")
+    vocab = [words[0] for words, _, _ in ngrams[0]]
+    return vocab, ngrams
+
+
+def compile_arpa(arpa_path, output_path, max_order=None):
+    """
+    Compile an ARPA model into the binary format at output_path.
+
+    With max_order the n-grams above that order are dropped, which leaves the
+    lower-order backoff model contained in the ARPA file (e.g. a 3-gram model
+    from a 5-gram one).
+    """
+    vocab, ngrams = read_arpa(arpa_path)
+    if max_order is not None:
+        ngrams = ngrams[:max_order]
+    order = len(ngrams)
+    bits = max(1, (len(vocab) - 1).bit_length())
+    if bits * order > 64:
+        raise ValueError(f"{arpa_path}: {len(vocab)} symbols x order {order} does not fit a 64-bit key")
+    key_dtype = np.uint32 if bits * order <= 32 else np.uint64
+    ids = {word: i for i, word in enumerate(vocab)}
+
+    blocks = []
+    for n, entries in enumerate(ngrams, 1):
+        keys = np.empty(len(entries), dtype=np.uint64)
+        probs = np.empty(len(entries), dtype=np.float32)
+        backoffs = np.empty(len(entries), dtype=np.float32)
+        for i, (words, prob, backoff) in enumerate(entries):
+            key = 0
+            for word in words:
+                key = (key << bits) | ids[word]
+            keys[i] = key
+            probs[i] = prob
+            backoffs[i] = backoff
+        perm = np.argsort(keys, kind='stable')
+        blocks.append(keys[perm].astype(key_dtype))
+        blocks.append(probs[perm])
+        if n < order:
+            blocks.append(backoffs[perm])
+
+    vocab_bytes = '\n'.join(vocab).encode('utf-8')
+    stat = os.stat(arpa_path)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, order, bits, np.dtype(key_dtype).itemsize,
+                         len(vocab), len(vocab_bytes), stat.st_size, stat.st_mtime_ns,
+                         file_digest(arpa_path))
+
+    tmp_path = f"{output_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        counts = np.array([len(entries) for entries in ngrams], dtype=np.uint64)
+        f.write(counts.tobytes())
+        f.write(vocab_bytes + b'\0' * _pad(len(vocab_bytes)))
+        for block in blocks:
+            data = block.tobytes()
+            f.write(data + b'\0' * _pad(len(data)))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def read_header(path):
+    """Return the header fields of a compiled model as a dict, or None if it is not one."""
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(raw) < HEADER.size:
+        return None
+    (magic, version, order, bits, key_bytes, vocab_size, vocab_bytes,
+     source_size, source_mtime_ns, source_sha256) = HEADER.unpack(raw)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    return {
+        'order': order, 'bits': bits, 'key_bytes': key_bytes,
+        'vocab_size': vocab_size, 'vocab_bytes': vocab_bytes,
+        'source_size': source_size, 'source_mtime_ns': source_mtime_ns,
+        'source_sha256': source_sha256,
+    }
+
+
+class CharLM:
+    """
+    Memory-mapped character language model.
+
+    score() follows the kenlm.LanguageModel.score signature, taking a
+    space-separated sentence, so CharScorer can use it unchanged.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        header = read_header(path)
+        if header is None:
+            raise ValueError(f"{path} is not a compiled character model (format version {FORMAT_VERSION})")
+        self.order = header['order']
+        self.bits = header['bits']
+        key_dtype = np.uint32 if header['key_bytes'] == 4 else np.uint64
+
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        pos = HEADER.size
+        counts = np.frombuffer(self._mmap, dtype=np.uint64, count=self.order, offset=pos)
+        pos += counts.nbytes
+        vocab_bytes = header['vocab_bytes']
+        self.vocab = self._mmap[pos:pos + vocab_bytes].decode('utf-8').split('\n')
+        pos += vocab_bytes + _pad(vocab_bytes)
+
+        self.keys, self.probs, self.backoffs = [], [], []
+        for n in range(1, self.order + 1):
+            count = int(counts[n - 1])
+            arrays = [(key_dtype, self.keys), (np.float32, self.probs)]
+            if n < self.order:
+                arrays.append((np.float32, self.backoffs))
+            for dtype, target in arrays:
+                array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=pos)
+                target.append(array)
+                pos += array.nbytes + _pad(array.nbytes)
+        # the highest order has no backoffs
+        self.backoffs.append(np.zeros(0, dtype=np.float32))
+
+        self.ids = {word: i for i, word in enumerate(self.vocab)}
+        self.unk_id = self.ids['<unk>']
+        self.bos_id = self.ids['<s>']
+        self.eos_id = self.ids['</s>']
+        self._key_type = key_dtype
+        self._index = None
+        # codepoint -> ID lookup for the single-character symbols
+        chars = [(ord(word), i) for i, word in enumerate(self.vocab) if len(word) == 1]
+        self._char_ids = np.full(max([cp for cp, _ in chars], default=0) + 1, self.unk_id, dtype=np.intp)
+        for cp, i in chars:
+            self._char_ids[cp] = i
+
+    def _find(self, n, key):
+        """Index of a packed n-gram key in the order-n table, or -1."""
+        keys = self.keys[n - 1]
+        key = self._key_type(key)
+        i = int(np.searchsorted(keys, key))
+        return i if i < keys.shape[0] and keys[i] == key else -1
+
+    def _pack(self, ids):
+        key = 0
+        for i in ids:
+            key = (key << self.bits) | i
+        return key
+
+    def word_prob(self, context, word_id):
+        """log10 p(word | context) with backoff; context is a list of IDs, oldest first."""
+        backoff = 0.0
+        for k in range(min(len(context), self.order - 1), -1, -1):
+            ctx = context[len(context) - k:]
+            i = self._find(k + 1, self._pack(ctx + [word_id]))
+            if i >= 0:
+                return backoff + float(self.probs[k][i])
+            if k > 0:
+                j = self._find(k, self._pack(ctx))
+                if j >= 0:
+                    backoff += float(self.backoffs[k - 1][j])
+        return backoff
+
+    def score_ids(self, ids, bos=True, eos=True):
+        """Total log10 probability of a sequence of vocabulary IDs."""
+        context = [self.bos_id] if bos else []
+        total = 0.0
+        for word_id in (list(ids) + [self.eos_id] if eos else ids):
+            total += self.word_prob(context, word_id)
+            context.append(word_id)
+            if len(context) >= self.order:
+                del context[0]
+        return total
+
+    def score(self, sentence, bos=True, eos=True):
+        """Same as kenlm.LanguageModel.score: sentence is space-separated symbols."""
+        ids = [self.ids.get(word, self.unk_id) for word in sentence.split()]
+        return self.score_ids(ids, bos, eos)
+
+    def _lookup(self, n, keys):
+        if self._index is None:
+            self._index = [HashIndex(keys) for keys in self.keys]
+        return self._index[n - 1].lookup(keys)
+
+    def score_words(self, words, bos=True, eos=True):
+        """
+        Score a batch of words character by character, vectorized.
+
+        Gives the same result as score(" ".join(word)) for every word, with
+        whitespace inside a word ignored the way the space-separated form does.
+
+        Args:
+            words: List of words
+            bos: Score with a sentence-start context
+            eos: Include the end-of-sentence probability
+
+        Returns:
+            float64 array of log10 scores, one per word
+        """
+        if not isinstance(words, (list, tuple)):
+            words = list(words)
+        scores = np.empty(len(words), dtype=np.float64)
+        for start in range(0, len(words), SCORE_BLOCK):
+            block = words[start:start + SCORE_BLOCK]
+            scores[start:start + len(block)] = self._score_block(block, bos, eos)
+        return scores
+
+    def _score_block(self, words, bos, eos):
+        n = len(words)
+        lengths = np.fromiter(map(len, words), dtype=np.intp, count=n)
+        codepoints = np.frombuffer(''.join(words).encode('utf-32-le'), dtype=np.uint32)
+        spaces = np.isin(codepoints, WHITESPACE)
+        if spaces.any():
+            word_of_char = np.repeat(np.arange(n), lengths)
+            lengths = lengths - np.bincount(word_of_char[spaces], minlength=n)
+            codepoints = codepoints[~spaces]
+        char_ids = np.full(codepoints.shape[0], self.unk_id, dtype=np.intp)
+        known = codepoints < self._char_ids.shape[0]
+        char_ids[known] = self._char_ids[codepoints[known]]
+
+        # lay every word out as [<s>] chars [</s>] in one flat ID array, after
+        # order - 1 padding slots so every position can look back order - 1 places
+        pad = self.order - 1
+        seq_lengths = lengths + int(bos) + int(eos)
+        seq_starts = pad + np.cumsum(seq_lengths) - seq_lengths
+        flat = np.zeros(pad + int(seq_lengths.sum()), dtype=self._key_type)
+        if bos:
+            flat[seq_starts] = self.bos_id
+        if eos:
+            flat[seq_starts + seq_lengths - 1] = self.eos_id
+        char_starts = np.cumsum(lengths) - lengths
+        flat[np.repeat(seq_starts + int(bos) - char_starts, lengths) + np.arange(char_ids.shape[0])] = char_ids
+
+        # history[p]: how many earlier symbols of its own word position p is
+        # conditioned on, -1 for <s> which is context only
+        word_of = np.repeat(np.arange(n), seq_lengths)
+        history = np.arange(pad, flat.shape[0]) - seq_starts[word_of]
+        if bos:
+            history[seq_starts - pad] = -1
+        np.minimum(history, pad, out=history)
+
+        # keys[k][p] packs the (k + 1)-gram ending at position p
+        symbols = flat[pad:]
+        keys = [symbols]
+        for k in range(1, self.order):
+            keys.append((flat[pad - k:flat.shape[0] - k] << self._key_type(self.bits * k)) | keys[k - 1])
+
+        # walk from the longest n-gram down, adding context backoffs until one is found
+        bits = self._key_type(self.bits)
+        logprob = np.zeros(symbols.shape[0], dtype=np.float64)
+        pending = np.nonzero(history >= 0)[0]
+        for k in range(self.order - 1, 0, -1):
+            at_k = history[pending] >= k
+            candidates = pending[at_k]
+            rows = self._lookup(k + 1, keys[k][candidates])
+            hit = rows >= 0
+            logprob[candidates[hit]] += self.probs[k][rows[hit]]
+            missed = candidates[~hit]
+            contexts = self._lookup(k, keys[k][missed] >> bits)
+            found = contexts >= 0
+            logprob[missed[found]] += self.backoffs[k - 1][contexts[found]]
+            pending = np.concatenate((pending[~at_k], missed))
+        # unigram keys are the IDs themselves, so their rows are too
+        logprob[pending] += self.probs[0][symbols[pending]]
+
+        return np.bincount(word_of[history >= 0], weights=logprob[history >= 0], minlength=n)
+
+
+def _restamp(binary_path, header, stat):
+    """Record a new source modification time so the digest is not recomputed on every load."""
+    with open(binary_path, 'r+b') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, header['order'], header['bits'], header['key_bytes'],
+                            header['vocab_size'], header['vocab_bytes'], stat.st_size, stat.st_mtime_ns,
+                            header['source_sha256']))
+
+
+def cached_model_path(arpa_path, cache_dir=None, max_order=None):
+    """
+    model_cache/<stem>-<path digest>.clm; the digest of the absolute ARPA path
+    keeps same-named models from different directories apart.
+    """
+    stem = os.path.splitext(os.path.basename(arpa_path))[0]
+    stem += '-' + hashlib.sha256(os.path.abspath(arpa_path).encode('utf-8')).hexdigest()[:8]
+    if max_order is not None:
+        stem += f'.{max_order}gram'
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, stem + '.clm')
+
+
+def load_model(arpa_path, cache_dir=None, max_order=None):
+    """
+    Load an ARPA model through the binary cache.
+
+    The compiled file is rebuilt when the ARPA file's size, modification time
+    and contents no longer match what it was built from.
+
+    Args:
+        max_order: Load only the n-grams up to this order, see compile_arpa()
+    """
+    binary_path = cached_model_path(arpa_path, cache_dir, max_order)
+    header = read_header(binary_path)
+    stat = os.stat(arpa_path)
+    fresh = (header is not None
+             and header['source_size'] == stat.st_size
+             and header['source_mtime_ns'] == stat.st_mtime_ns)
+    if header is not None and not fresh:
+        # touched but possibly unchanged, fall back to the content digest
+        fresh = header['source_size'] == stat.st_size and header['source_sha256'] == file_digest(arpa_path)
+        if fresh:
+            _restamp(binary_path, header, stat)
+    if not fresh:
+        os.makedirs(os.path.dirname(binary_path), exist_ok=True)
+        compile_arpa(arpa_path, binary_path, max_order)
+    return CharLM(binary_path)
+
+
+def verify_against_kenlm(arpa_path, test_files=None, cache_dir=None, tolerance=1e-4):
+    """
+    Check CharLM.score_words against kenlm for every word in the test pairs files.
+
+    Args:
+        arpa_path: ARPA model to compare
+        test_files: "wrong - correct" pairs files, defaults to test_data/*_test_pairs.txt
+        cache_dir: Model cache directory
+        tolerance: Largest accepted absolute difference in log10 score
+
+    Returns:
+        True if every word agrees within tolerance
+    """
+    import kenlm
+    from char_scorer import char_sequence, load_test_pairs
+
+    test_files = test_files or sorted(glob.glob(os.path.join(TEST_DATA_DIR, '*_test_pairs.txt')))
+    words = []
+    for test_file in test_files:
+        wrong_words, correct_words = load_test_pairs(test_file)
+        words.extend(wrong_words)
+        words.extend(correct_words)
+
+    reference = kenlm.LanguageModel(arpa_path)
+    model = load_model(arpa_path, cache_dir)
+    model.score_words(words[:1])  # build the hash tables outside the timing
+
+    start = time.perf_counter()
+    expected = np.array([reference.score(char_sequence(word), bos=True, eos=True) for word in words])
+    kenlm_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = model.score_words(words)
+    numpy_seconds = time.perf_counter() - start
+
+    diff = np.abs(actual - expected)
+    bad = np.nonzero(diff > tolerance)[0]
+    print(f"{arpa_path}: {len(words)} words from {len(test_files)} files, max |diff| {diff.max():.2e}")
+    print(f"  kenlm per word:     {kenlm_seconds:.3f}s ({len(words) / kenlm_seconds:,.0f} words/sec)")
+    print(f"  score_words batch:  {numpy_seconds:.3f}s ({len(words) / numpy_seconds:,.0f} words/sec)")
+    for i in bad[:10]:
+        print(f"  MISMATCH {words[i]!r}: kenlm {expected[i]:.6f}, char_lm {actual[i]:.6f}")
+    return bad.size == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile character-level ARPA models into the binary format.")
+    parser.add_argument('arpa', nargs='+', help="ARPA model files")
+    parser.add_argument('-o', '--output', help="output file (single input only), defaults to the model cache")
+    parser.add_argument('--cache-dir', default=None, help=f"cache directory (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--max-order', type=int, default=None,
+                        help="keep only the n-grams up to this order (e.g. 3 for a trigram model)")
+    parser.add_argument('--verify', action='store_true',
+                        help="check batch scores against kenlm on test_data/*_test_pairs.txt instead of compiling")
+    args = parser.parse_args()
+
+    if args.output and len(args.arpa) > 1:
+        parser.error("--output needs exactly one ARPA file")
+
+    if args.verify:
+        results = [verify_against_kenlm(arpa_path, cache_dir=args.cache_dir) for arpa_path in args.arpa]
+        raise SystemExit(0 if all(results) else 1)
+
+    for arpa_path in args.arpa:
+        output = args.output or cached_model_path(arpa_path, args.cache_dir, args.max_order)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        start = time.perf_counter()
+        compile_arpa(arpa_path, output, args.max_order)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        CharLM(output)
+        loaded = time.perf_counter() - start
+        print(f"{arpa_path} -> {output} ({os.path.getsize(output):,} bytes, "
+              f"built in {built:.2f}s, loads in {loaded * 1000:.1f}ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Shared character-level scoring for the KenLM spellchecker models.
+Every experiment script and detector class scores words through CharScorer
+instead of keeping its own copy of char_score.
+"""
+
+import time
+
+import numpy as np
+
+from char_lm import CharLM, load_model
+from score_cache import ScoreCache
+
+try:
+    import kenlm
+except ImportError:  # CharLM can score ARPA models on its own
+    kenlm = None
+
+
+def char_sequence(word: str) -> str:
+    """Turn a word into the space-separated character sequence the models were trained on."""
+    return " ".join(word.strip())
+
+
+class CharScorer:
+    """
+    Batch scorer around a character-level kenlm.LanguageModel.
+
+    Keeps running totals of words scored and time spent so callers can
+    report throughput.
+    """
+
+    def __init__(self, model, bos=True, eos=True, cache=None):
+        """
+        Args:
+            model: Path to an ARPA/KenLM binary model or a compiled .clm model,
+                   or an already loaded model with a kenlm-style score method.
+                   Without the kenlm module, ARPA files load through char_lm.
+            bos: Score with a sentence-start context
+            eos: Include the end-of-sentence probability
+            cache: ScoreCache to read and store scores through, or True for
+                   the shared ScoreCache.default(). Only models given by path
+                   are cached; the model itself is then loaded on the first miss.
+        """
+        self.bos = bos
+        self.eos = eos
+        self.words_scored = 0
+        self.seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # character lookups made and needed for whole words by below_threshold
+        self.chars_scored = 0
+        self.chars_total = 0
+        # model lookups made by score_trie, and those scoring each word on its own would take
+        self.trie_lookups = 0
+        self.trie_unshared_lookups = 0
+        self._model = None
+        self._cache_key = None
+
+        if hasattr(model, 'score'):
+            self._model = model
+            self.model_path = None
+            self.backend = None
+        else:
+            self.model_path = str(model)
+            if self.model_path.endswith('.clm'):
+                self.backend = 'charlm'
+            elif kenlm is None:
+                if not self.model_path.endswith('.arpa'):
+                    raise ImportError(f"kenlm is needed to load {model}; only ARPA and .clm models load without it")
+                self.backend = 'charlm'
+            else:
+                self.backend = 'kenlm'
+
+        self.cache = ScoreCache.default() if cache is True else cache or None
+        if self.model_path is None:
+            self.cache = None
+        if self.cache is None and self._model is None:
+            # every word needs the model anyway, load it up front
+            self._model = self._load_model()
+
+    def _load_model(self):
+        if self.model_path.endswith('.clm'):
+            return CharLM(self.model_path)
+        if self.backend == 'charlm':
+            return load_model(self.model_path)
+        return kenlm.LanguageModel(self.model_path)
+
+    @property
+    def model(self):
+        """The underlying language model, loaded on first use."""
+        if self._model is None:
+            self._model = self._load_model()
+        return self._model
+
+    def score(self, word: str) -> float:
+        """Score a single word."""
+        if self.cache is not None:
+            return float(self._score_distinct([word])[0])
+        return self.model.score(char_sequence(word), bos=self.bos, eos=self.eos)
+
+    def _score_distinct(self, words):
+        """Score a list of distinct words, through the cache when there is one."""
+        if self.cache is None:
+            return self._model_scores(words)
+
+        if self._cache_key is None:
+            self._cache_key = self.cache.model_key(self.model_path, self.backend, self.bos, self.eos)
+        found = self.cache.get_many(self._cache_key, words)
+        self.cache_hits += len(found)
+        self.cache_misses += len(words) - len(found)
+        if len(found) < len(words):
+            missing = [word for word in words if word not in found]
+            scores = self._model_scores(missing)
+            self.cache.put_many(self._cache_key, missing, scores)
+            found.update(zip(missing, scores.tolist()))
+        return np.fromiter((found[word] for word in words), dtype=np.float64, count=len(words))
+
+    def _model_scores(self, words):
+        bos, eos = self.bos, self.eos
+        if hasattr(self.model, 'score_words'):
+            # CharLM scores the whole batch in one vectorized pass
+            return self.model.score_words(words, bos, eos)
+        score = self.model.score
+        join = " ".join
+        return np.fromiter((score(join(word.strip()), bos, eos) for word in words),
+                           dtype=np.float64, count=len(words))
+
+    def score_many(self, words, out=None) -> np.ndarray:
+        """
+        Score a batch of words.
+
+        Args:
+            words: Iterable of words
+            out: Optional float64 array to write the scores into, so callers
+                 scoring many batches can reuse one buffer
+
+        Returns:
+            NumPy array of log10 scores, one per input word
+        """
+        if not isinstance(words, (list, tuple)):
+            words = list(words)
+        n = len(words)
+
+        if out is None:
+            target = np.empty(n, dtype=np.float64)
+        elif out.shape[0] < n:
+            raise ValueError(f"out has room for {out.shape[0]} scores, {n} words given")
+        else:
+            target = out[:n]
+
+        start = time.perf_counter()
+        # Each distinct word is joined into a character sequence and scored once;
+        # repeated words just reuse its slot through the codes array.
+        index = {}
+        codes = np.fromiter((index.setdefault(word, len(index)) for word in words),
+                            dtype=np.intp, count=n)
+        distinct = self._score_distinct(list(index))
+        np.take(distinct, codes, out=target)
+        self.seconds += time.perf_counter() - start
+        self.words_scored += n
+
+        return target
+
+    def score_trie(self, words) -> np.ndarray:
+        """
+        Score a batch of words, scoring every shared prefix only once.
+
+        The distinct words are walked in sorted order, i.e. depth-first
+        through their prefix trie, keeping the kenlm State and running total
+        after each character of the current word. A word reuses the states
+        of the prefix it shares with the previous one and only scores its
+        own suffix (and </s>). Sorted vocabularies like the character corpora
+        share most of their prefixes (aba..., uku..., ngi...).
+
+        Each step is one call from Python into kenlm, which costs more than
+        kenlm scoring a whole word in C, so this saves model lookups rather
+        than time; it pays off when a lookup is the expensive part (a large
+        or remote model). Models without BaseScore (CharLM, whose lookups are
+        vectorized already) are scored with score_many().
+
+        Returns:
+            NumPy array of log10 scores in input order, as score_many()
+        """
+        if not isinstance(words, (list, tuple)):
+            words = list(words)
+        model = self.model
+        if not hasattr(model, 'BaseScore'):
+            return self.score_many(words)
+
+        start = time.perf_counter()
+        sequences = {word: tuple(char_sequence(word).split()) for word in words}
+        root = kenlm.State()
+        if self.bos:
+            model.BeginSentenceWrite(root)
+        else:
+            model.NullContextWrite(root)
+        # states[d] and totals[d] hold the context and score after d symbols of
+        # the current word; the State objects are reused as the walk moves on
+        states, totals = [root], [0.0]
+        end = kenlm.State()
+        base_score = model.BaseScore
+        scores = {}
+        previous = ()
+        lookups = 0
+        for sequence in sorted(set(sequences.values())):
+            common = 0
+            limit = min(len(sequence), len(previous))
+            while common < limit and sequence[common] == previous[common]:
+                common += 1
+            depth = common
+            for symbol in sequence[common:]:
+                if depth + 1 == len(states):
+                    states.append(kenlm.State())
+                    totals.append(0.0)
+                totals[depth + 1] = totals[depth] + base_score(states[depth], symbol, states[depth + 1])
+                depth += 1
+            lookups += len(sequence) - common
+            total = totals[depth]
+            if self.eos:
+                total += base_score(states[depth], '</s>', end)
+                lookups += 1
+            scores[sequence] = total
+            previous = sequence
+
+        result = np.fromiter((scores[sequences[word]] for word in words), dtype=np.float64, count=len(words))
+        self.trie_lookups += lookups
+        self.trie_unshared_lookups += sum(len(sequences[word]) + int(self.eos) for word in words)
+        self.seconds += time.perf_counter() - start
+        self.words_scored += len(words)
+        return result
+
+    def below_threshold(self, word: str, threshold: float, char_floor=None) -> bool:
+        """
+        Whether word scores below threshold, scoring one character at a time
+        through kenlm's State/BaseScore API.
+
+        Log probabilities are never positive, so the running total only falls:
+        the word is flagged as soon as it drops below threshold, without
+        scoring the rest of it. With char_floor, the word is also accepted as
+        soon as the remaining characters could not push it below threshold
+        even if each cost char_floor (a lower bound on one character's log10
+        probability, see char_floor()). That bound is optimistic, not exact,
+        unless char_floor is the model's true minimum.
+
+        Models without BaseScore (CharLM) and cached scorers score the whole word.
+        """
+        symbols = char_sequence(word).split()
+        if self.eos:
+            symbols.append('</s>')
+        self.chars_total += len(symbols)
+        model = self.model
+        if self.cache is not None or not hasattr(model, 'BaseScore'):
+            self.chars_scored += len(symbols)
+            return self.score(word) < threshold
+
+        start = time.perf_counter()
+        state, out = kenlm.State(), kenlm.State()
+        if self.bos:
+            model.BeginSentenceWrite(state)
+        else:
+            model.NullContextWrite(state)
+        total = 0.0
+        flagged = False
+        remaining = len(symbols)
+        for symbol in symbols:
+            total += model.BaseScore(state, symbol, out)
+            state, out = out, state
+            remaining -= 1
+            if total < threshold:
+                flagged = True
+                break
+            if char_floor is not None and total + char_floor * remaining >= threshold:
+                break
+        self.chars_scored += len(symbols) - remaining
+        self.seconds += time.perf_counter() - start
+        self.words_scored += 1
+        return flagged
+
+    def below_threshold_many(self, words, threshold: float, char_floor=None) -> np.ndarray:
+        """below_threshold() for a batch, each distinct word checked once; returns a bool array."""
+        if not isinstance(words, (list, tuple)):
+            words = list(words)
+        index = {}
+        codes = np.fromiter((index.setdefault(word, len(index)) for word in words),
+                            dtype=np.intp, count=len(words))
+        distinct = np.fromiter((self.below_threshold(word, threshold, char_floor) for word in index),
+                               dtype=bool, count=len(index))
+        return distinct[codes]
+
+    def char_floor(self, words, quantile=0.001) -> float:
+        """
+        Per-character log10 probability that only a quantile of the characters
+        of words (e.g. correctly spelled vocabulary) fall below, as a
+        char_floor for below_threshold. Needs kenlm's full_scores.
+        """
+        probs = [prob for word in words
+                 for prob, _, _ in self.model.full_scores(char_sequence(word), bos=self.bos, eos=self.eos)]
+        return float(np.quantile(probs, quantile))
+
+    def words_per_second(self) -> float:
+        """Average throughput over every batch scored so far."""
+        return self.words_scored / self.seconds if self.seconds > 0 else 0.0
+
+    def report(self) -> str:
+        """One-line throughput summary."""
+        summary = (f"Scored {self.words_scored} words in {self.seconds:.3f}s "
+                   f"({self.words_per_second():,.0f} words/sec)")
+        if self.cache is not None:
+            summary += f", cache {self.cache_hits} hits / {self.cache_misses} misses"
+        if self.trie_unshared_lookups:
+            summary += (f", trie {self.trie_lookups}/{self.trie_unshared_lookups} lookups "
+                        f"({self.trie_unshared_lookups / max(self.trie_lookups, 1):.1f}x fewer)")
+        if self.chars_total:
+            summary += (f", early exit {self.chars_scored}/{self.chars_total} character lookups "
+                        f"({(1 - self.chars_scored / self.chars_total) * 100:.1f}% skipped)")
+        return summary
+
+
+def load_test_pairs(test_pairs_path):
+    """
+    Read a "wrong - correct" test pairs file.
+
+    Returns:
+        Two lists: wrong words and their correct versions
+    """
+    wrong_words = []
+    correct_words = []
+    with open(test_pairs_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or '-' not in line:
+                continue
+            wrong, correct = line.split('-', 1)
+            wrong_words.append(wrong.strip())
+            correct_words.append(correct.strip())
+    return wrong_words, correct_words
@@ -2,10 +2,26 @@
 """
 Cross-model testing: Test each language's test file against all 4 models.
 Creates a confusion matrix showing which models detect which language errors.
+
+Every test file is parsed once and its distinct words are pooled, so each
+model scores the pool a single time (one worker process per model). The
+confusion matrix and margins are then read off the (words x models) score
+matrix with NumPy, and adding a language adds one column and one file read.
+
+Usage:
+    python3 cross_model_test.py
+    python3 cross_model_test.py --models isiZulu isiXhosa --tests isiZulu --json results.json
+    python3 cross_model_test.py --models Sesotho=models/SesothoUModel.arpa --tests Sesotho=test_data/Sesotho_test.txt
 """
 
+import argparse
+import json
+import multiprocessing
 import os
-import kenlm
+
+import numpy as np
+
+from char_scorer import CharScorer, load_test_pairs
 
 
 # Model and test file paths
@@ -26,131 +42,209 @@ TEST_FILES = {
 }
 
 
-def char_score(model: kenlm.LanguageModel, word: str) -> float:
-    """Score a word using character-level model."""
-    seq = " ".join(list(word.strip()))
-    return model.score(seq, bos=True, eos=True)
-
-
-def test_file_on_model(test_file_path: str, model: kenlm.LanguageModel, margin: float = 1.5):
-    """Test a file against a model and return accuracy."""
-    total = 0
-    correct = 0
-    
-    with open(test_file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line or '-' not in line:
-                continue
-            
-            parts = line.split('-', 1)
-            if len(parts) != 2:
-                continue
-                
-            wrong, correct_word = [w.strip() for w in parts]
-            s_wrong = char_score(model, wrong)
-            s_correct = char_score(model, correct_word)
-            
-            if (s_correct - s_wrong) > margin:
-                correct += 1
-            total += 1
-    
-    return correct, total
+def resolve_paths(selection, defaults):
+    """
+    Turn --models/--tests arguments into a name -> path dict.
+    Each entry is either a known language name or NAME=PATH for a new one.
+    """
+    if not selection:
+        return {name: os.path.join(TOOLS_DIR, filename) for name, filename in defaults.items()}
+    paths = {}
+    for entry in selection:
+        name, sep, path = entry.partition('=')
+        if sep:
+            paths[name] = path
+        elif name in defaults:
+            paths[name] = os.path.join(TOOLS_DIR, defaults[name])
+        else:
+            raise ValueError(f"unknown language {name!r}, use NAME=PATH for a new one")
+    return paths
+
+
+def load_tests(test_paths):
+    """
+    Parse every test file once.
+
+    Returns:
+        (words, tests): the distinct words over all files, and a dict of
+        name -> (wrong_codes, correct_codes) index arrays into words
+    """
+    index = {}
+    tests = {}
+    for name, path in test_paths.items():
+        wrong_words, correct_words = load_test_pairs(path)
+        wrong = np.fromiter((index.setdefault(w, len(index)) for w in wrong_words), dtype=np.intp, count=len(wrong_words))
+        correct = np.fromiter((index.setdefault(w, len(index)) for w in correct_words), dtype=np.intp, count=len(correct_words))
+        tests[name] = (wrong, correct)
+    return list(index), tests
+
+
+def _score_column(task):
+    model_path, words = task
+    scorer = CharScorer(model_path, cache=True)
+    return scorer.score_many(words), scorer.report()
+
+
+def score_matrix(model_paths, words, jobs=None):
+    """
+    Score every word with every model.
+
+    Args:
+        model_paths: List of model paths, one matrix column each
+        words: Words to score, one matrix row each
+        jobs: Worker processes (default: one per model)
+
+    Returns:
+        (scores, reports): float64 array of shape (len(words), len(model_paths))
+        and each model's CharScorer report line
+    """
+    tasks = [(path, words) for path in model_paths]
+    jobs = min(jobs or len(tasks), len(tasks))
+    if jobs > 1:
+        with multiprocessing.Pool(jobs) as pool:
+            columns = pool.map(_score_column, tasks)
+    else:
+        columns = [_score_column(task) for task in tasks]
+    scores = np.empty((len(words), len(model_paths)), dtype=np.float64)
+    for m, (column, _) in enumerate(columns):
+        scores[:, m] = column
+    return scores, [report for _, report in columns]
+
+
+def cross_model_matrix(scores, tests, margin=1.5):
+    """
+    Per test file, the margins (correct - wrong) under every model and the
+    number of pairs each model gets right.
+
+    Returns:
+        Dict of test name -> {'correct': int array per model, 'total': int,
+        'accuracy': float array per model, 'mean_margin': float array per model}
+    """
+    results = {}
+    for name, (wrong, correct) in tests.items():
+        margins = scores[correct] - scores[wrong]
+        hits = (margins > margin).sum(axis=0)
+        total = len(wrong)
+        results[name] = {
+            'correct': hits,
+            'total': total,
+            'accuracy': hits / total * 100.0 if total else np.zeros(scores.shape[1]),
+            'mean_margin': margins.mean(axis=0) if total else np.zeros(scores.shape[1]),
+        }
+    return results
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Score every test file against every model and print the confusion matrix.")
+    parser.add_argument('--models', nargs='+', help="model languages, or NAME=PATH (default: all four)")
+    parser.add_argument('--tests', nargs='+', help="test languages, or NAME=PATH (default: all four)")
+    parser.add_argument('--margin', type=float, default=1.5, help="score(correct) - score(wrong) needed to count a pair")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: one per model)")
+    parser.add_argument('--json', help="also write the matrix to this JSON file")
+    args = parser.parse_args()
+
     print("=" * 80)
     print("Cross-Model Testing Matrix")
     print("=" * 80)
     print()
-    
-    # Load all models
-    print("Loading models...")
-    loaded_models = {}
-    for lang_name, model_file in MODELS.items():
-        model_path = os.path.join(TOOLS_DIR, model_file)
-        if os.path.exists(model_path):
-            print(f"  Loading {lang_name} model...")
-            loaded_models[lang_name] = kenlm.LanguageModel(model_path)
-        else:
+
+    try:
+        model_paths = resolve_paths(args.models, MODELS)
+        test_paths = resolve_paths(args.tests, TEST_FILES)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for lang_name, model_path in list(model_paths.items()):
+        if not os.path.exists(model_path):
             print(f"  [WARN] {lang_name} model not found: {model_path}")
-    
-    print()
-    print("=" * 80)
-    print("Testing each language test file against all models...")
-    print("=" * 80)
-    print()
-    
-    # Results matrix
-    results = {}
-    
-    # Test each test file against each model
-    for test_lang, test_file in TEST_FILES.items():
-        test_path = os.path.join(TOOLS_DIR, test_file)
-        
+            del model_paths[lang_name]
+    for test_lang, test_path in list(test_paths.items()):
         if not os.path.exists(test_path):
             print(f"[WARN] Test file not found: {test_path}")
-            continue
-        
-        results[test_lang] = {}
-        
+            del test_paths[test_lang]
+    if not model_paths or not test_paths:
+        print("Nothing to test.")
+        return
+
+    words, tests = load_tests(test_paths)
+    model_langs = list(model_paths)
+    print(f"Scoring {len(words)} distinct words from {len(tests)} test files "
+          f"against {len(model_langs)} models...")
+    scores, reports = score_matrix([model_paths[lang] for lang in model_langs], words, args.jobs)
+    results = cross_model_matrix(scores, tests, args.margin)
+    print()
+
+    for test_lang, result in results.items():
         print(f"Testing {test_lang} test data:")
-        for model_lang, model in loaded_models.items():
-            correct, total = test_file_on_model(test_path, model)
-            accuracy = (correct / total * 100.0) if total > 0 else 0.0
-            results[test_lang][model_lang] = (correct, total, accuracy)
+        for m, model_lang in enumerate(model_langs):
+            correct, total, accuracy = int(result['correct'][m]), result['total'], result['accuracy'][m]
             print(f"  vs {model_lang:12s} model: {correct:2d}/{total:2d} = {accuracy:6.2f}%")
         print()
-    
+
+    for model_lang, report in zip(model_langs, reports):
+        print(f"{model_lang} model: {report}")
+    print()
+
     # Print matrix
     print("=" * 80)
     print("CONFUSION MATRIX")
     print("=" * 80)
     print()
-    
+
     # Header
     print(f"{'Test Data':<15s}", end="")
-    for model_lang in MODELS.keys():
+    for model_lang in model_langs:
         print(f"{model_lang:>12s}", end="")
     print()
     print("-" * 80)
-    
+
     # Rows
-    for test_lang in TEST_FILES.keys():
-        if test_lang not in results:
-            continue
+    for test_lang, result in results.items():
         print(f"{test_lang:<15s}", end="")
-        for model_lang in MODELS.keys():
-            if model_lang in results[test_lang]:
-                correct, total, accuracy = results[test_lang][model_lang]
-                print(f"{accuracy:11.1f}%", end="")
-            else:
-                print(f"{'N/A':>12s}", end="")
+        for m in range(len(model_langs)):
+            print(f"{result['accuracy'][m]:11.1f}%", end="")
         print()
-    
+
     print()
     print("=" * 80)
     print("Analysis:")
     print("=" * 80)
     print()
-    
+
     # Diagonal (same language) performance
     print("Same-language performance (diagonal):")
-    for lang in TEST_FILES.keys():
-        if lang in results and lang in results[lang]:
-            correct, total, accuracy = results[lang][lang]
-            print(f"  {lang}: {accuracy:.1f}%")
-    
+    for lang, result in results.items():
+        if lang in model_paths:
+            print(f"  {lang}: {result['accuracy'][model_langs.index(lang)]:.1f}%")
+
     print()
     print("Cross-language detection:")
-    for test_lang in TEST_FILES.keys():
-        if test_lang not in results:
-            continue
+    for test_lang, result in results.items():
         print(f"  {test_lang} errors detected by:")
-        for model_lang in MODELS.keys():
-            if model_lang != test_lang and model_lang in results[test_lang]:
-                correct, total, accuracy = results[test_lang][model_lang]
-                print(f"    {model_lang}: {accuracy:.1f}%")
+        for m, model_lang in enumerate(model_langs):
+            if model_lang != test_lang:
+                print(f"    {model_lang}: {result['accuracy'][m]:.1f}%")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'margin': args.margin,
+                'models': model_paths,
+                'tests': test_paths,
+                'matrix': {
+                    test_lang: {
+                        model_lang: {
+                            'correct': int(result['correct'][m]),
+                            'total': result['total'],
+                            'accuracy': float(result['accuracy'][m]),
+                            'mean_margin': float(result['mean_margin'][m]),
+                        }
+                        for m, model_lang in enumerate(model_langs)
+                    }
+                    for test_lang, result in results.items()
+                },
+            }, f, indent=2)
+        print(f"\nMatrix written to {args.json}")
 
 
 if __name__ == "__main__":
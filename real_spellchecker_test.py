@@ -2,22 +2,23 @@
 """
 Experiment 7: Real Spellchecker Test
 Test single-word detection using absolute threshold (no comparison needed)
+
+Usage:
+    python real_spellchecker_test.py
+    python real_spellchecker_test.py --early-exit   # stop scoring a word once it is below the threshold
 """
 
+import argparse
 import os
-import kenlm
-
 
-def char_score(model: kenlm.LanguageModel, word: str) -> float:
-    """Score a word using character-level model."""
-    seq = " ".join(list(word.strip()))
-    return model.score(seq, bos=True, eos=True)
+from char_scorer import CharScorer, load_test_pairs
 
 
-def test_real_spellchecker(language, model_path, test_pairs_path, threshold=-10.0):
+def test_real_spellchecker(language, model_path, test_pairs_path, threshold=-10.0, early_exit=False):
     """
     Test real spellchecker using absolute threshold.
     Only looks at one word at a time (no comparison).
+    With early_exit, each word is only scored until it falls below the threshold.
     """
     print(f"\n{'=' * 80}")
     print(f"Real Spellchecker Test: {language}")
@@ -26,46 +27,28 @@ def test_real_spellchecker(language, model_path, test_pairs_path, threshold=-10.
     
     # Load model
     print(f"Loading model: {model_path}")
-    model = kenlm.LanguageModel(model_path)
+    scorer = CharScorer(model_path, cache=not early_exit)
     
     # Load test pairs
     print(f"Loading test data: {test_pairs_path}")
-    test_cases = []
-    
-    with open(test_pairs_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if '-' in line:
-                parts = line.split('-', 1)
-                if len(parts) == 2:
-                    wrong = parts[0].strip()
-                    correct = parts[1].strip()
-                    test_cases.append((wrong, correct))
-    
-    print(f"Testing {len(test_cases)} word pairs...\n")
-    
-    # Test incorrect words (should be flagged)
-    incorrect_detected = 0
-    incorrect_missed = 0
-    
-    # Test correct words (should NOT be flagged)
-    correct_ok = 0
-    correct_flagged = 0
-    
-    for wrong, correct in test_cases:
-        # Test the WRONG word (should be detected as misspelled)
-        wrong_score = char_score(model, wrong)
-        if wrong_score < threshold:
-            incorrect_detected += 1
-        else:
-            incorrect_missed += 1
-        
-        # Test the CORRECT word (should NOT be flagged)
-        correct_score = char_score(model, correct)
-        if correct_score >= threshold:
-            correct_ok += 1
-        else:
-            correct_flagged += 1
+    wrong_words, correct_words = load_test_pairs(test_pairs_path)
+    
+    print(f"Testing {len(wrong_words)} word pairs...\n")
+    
+    if early_exit:
+        wrong_flags = scorer.below_threshold_many(wrong_words, threshold)
+        correct_flags = scorer.below_threshold_many(correct_words, threshold)
+    else:
+        wrong_flags = scorer.score_many(wrong_words) < threshold
+        correct_flags = scorer.score_many(correct_words) < threshold
+    
+    # Incorrect words should be flagged
+    incorrect_detected = int(wrong_flags.sum())
+    incorrect_missed = len(wrong_flags) - incorrect_detected
+    
+    # Correct words should NOT be flagged
+    correct_flagged = int(correct_flags.sum())
+    correct_ok = len(correct_flags) - correct_flagged
     
     # Calculate metrics
     total_incorrect = incorrect_detected + incorrect_missed
@@ -91,6 +74,7 @@ def test_real_spellchecker(language, model_path, test_pairs_path, threshold=-10.
     print('=' * 80)
     print(f"True Positive Rate (Detection):  {true_positive_rate:6.2f}%")
     print(f"False Positive Rate (False Alarm): {false_positive_rate:6.2f}%")
+    print(scorer.report())
     
     return {
         'language': language,
@@ -106,6 +90,10 @@ def test_real_spellchecker(language, model_path, test_pairs_path, threshold=-10.
 
 def main():
     """Run real spellchecker test for all languages."""
+    parser = argparse.ArgumentParser(description="Single-word detection with an absolute threshold.")
+    parser.add_argument('--early-exit', action='store_true',
+                        help="score each word only until it falls below the threshold")
+    args = parser.parse_args()
     
     languages = [
         ('isiZulu', 'models/isiZuluUModel.arpa', 'test_data/isiZulu_test_pairs.txt'),
@@ -133,7 +121,7 @@ def main():
             print(f"\n⚠ Warning: Test file not found: {test_path}")
             continue
         
-        result = test_real_spellchecker(lang_name, model_path, test_path, threshold)
+        result = test_real_spellchecker(lang_name, model_path, test_path, threshold, args.early_exit)
         results.append(result)
     
     # Overall summary
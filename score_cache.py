@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Persistent score store shared by the experiment scripts.
+
+Scores are kept in SQLite keyed by (model, word), where the model key is the
+scoring backend, the SHA-256 of the model file and the bos/eos flags. A
+rebuilt model gets a new digest, so its old scores are never reused, and they
+are deleted the first time the changed file is seen.
+
+Usage:
+    python score_cache.py            # show what is stored
+    python score_cache.py --clear
+"""
+
+import argparse
+import os
+import sqlite3
+
+from char_lm import DEFAULT_CACHE_DIR, file_digest
+
+
+DEFAULT_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIR, 'scores.sqlite')
+# stay under SQLite's bound-parameter limit
+QUERY_CHUNK = 500
+
+_default = None
+
+
+class ScoreCache:
+    """
+    Content-addressed (model digest, word) -> score store.
+
+    Keeps hit and miss counters across every lookup made through it. Safe to
+    use from forked worker processes: each process opens its own connection.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = os.path.abspath(path)
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pid = None
+
+    @classmethod
+    def default(cls):
+        """The store under model_cache/ that the experiment scripts share."""
+        global _default
+        if _default is None:
+            _default = cls()
+        return _default
+
+    def _connection(self):
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._pid = os.getpid()
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS models '
+                               '(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS scores '
+                               '(model TEXT, word TEXT, score REAL, PRIMARY KEY (model, word)) WITHOUT ROWID')
+            self._conn.commit()
+        return self._conn
+
+    def model_key(self, model_path, backend, bos=True, eos=True):
+        """
+        Cache key for scores from one model file.
+
+        The file's digest is remembered against its size and modification time,
+        so it is only recomputed when the file changes. When the contents did
+        change, the scores stored under the old digest are dropped.
+        """
+        conn = self._connection()
+        path = os.path.abspath(model_path)
+        stat = os.stat(path)
+        row = conn.execute('SELECT size, mtime_ns, digest FROM models WHERE path = ?', (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            digest = row[2]
+        else:
+            digest = file_digest(path).hex()
+            with conn:
+                if row is not None and row[2] != digest:
+                    shared = conn.execute('SELECT COUNT(*) FROM models WHERE digest = ? AND path != ?',
+                                          (row[2], path)).fetchone()[0]
+                    if not shared:
+                        conn.execute('DELETE FROM scores WHERE model LIKE ?', (f"%:{row[2]}:%",))
+                conn.execute('INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?)',
+                             (path, stat.st_size, stat.st_mtime_ns, digest))
+        return f"{backend}:{digest}:{int(bos)}{int(eos)}"
+
+    def get_many(self, model_key, words):
+        """
+        Look up stored scores.
+
+        Returns:
+            Dict of word -> score for the words that were found
+        """
+        conn = self._connection()
+        found = {}
+        for start in range(0, len(words), QUERY_CHUNK):
+            chunk = words[start:start + QUERY_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            found.update(conn.execute(f'SELECT word, score FROM scores WHERE model = ? AND word IN ({placeholders})',
+                                      [model_key, *chunk]))
+        self.hits += len(found)
+        self.misses += len(words) - len(found)
+        return found
+
+    def put_many(self, model_key, words, scores):
+        """Store scores for words."""
+        conn = self._connection()
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO scores VALUES (?, ?, ?)',
+                             zip([model_key] * len(words), words, map(float, scores)))
+
+    def report(self):
+        """One-line hit/miss summary."""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"Score cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def stats(self):
+        """Stored score counts per model key."""
+        return dict(self._connection().execute('SELECT model, COUNT(*) FROM scores GROUP BY model'))
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM scores')
+            conn.execute('DELETE FROM models')
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the shared score cache.")
+    parser.add_argument('--path', default=DEFAULT_CACHE_PATH)
+    parser.add_argument('--clear', action='store_true', help="delete every stored score")
+    args = parser.parse_args()
+
+    cache = ScoreCache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {cache.path}")
+        return
+    stats = cache.stats()
+    print(f"{cache.path}: {sum(stats.values())} scores for {len(stats)} model keys")
+    for model_key, count in sorted(stats.items()):
+        print(f"  {model_key}: {count}")
+
+
+if __name__ == '__main__':
+    main()
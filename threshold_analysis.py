@@ -5,19 +5,14 @@ Analyzes score distributions of correct vs incorrect words.
 """
 
 import os
-import kenlm
-import random
 import numpy as np
 from pathlib import Path
 
+from calibration import auc, best_point, curve_at, roc_sweep, sample_corpus_words
+from char_scorer import CharScorer, load_test_pairs
 
-def char_score(model: kenlm.LanguageModel, word: str) -> float:
-    """Score a word using character-level model."""
-    seq = " ".join(list(word.strip()))
-    return model.score(seq, bos=True, eos=True)
 
-
-def analyze_threshold(language, model_path, corpus_path, test_pairs_path, num_correct_samples=1000):
+def analyze_threshold(language, model_path, corpus_path, test_pairs_path, num_correct_samples=1000, seed=0):
     """
     Analyze score distributions to find optimal threshold.
     
@@ -27,6 +22,7 @@ def analyze_threshold(language, model_path, corpus_path, test_pairs_path, num_co
         corpus_path: Path to corpus (for correct words)
         test_pairs_path: Path to test pairs file
         num_correct_samples: Number of correct words to sample
+        seed: Seed for the corpus sample
     """
     print(f"\n{'=' * 80}")
     print(f"Threshold Analysis: {language}")
@@ -34,61 +30,25 @@ def analyze_threshold(language, model_path, corpus_path, test_pairs_path, num_co
     
     # Load model
     print(f"Loading model: {model_path}")
-    model = kenlm.LanguageModel(model_path)
+    scorer = CharScorer(model_path, cache=True)
     
-    # Sample correct words from corpus
+    # Sample correct words from corpus (fixed seed, so re-runs reuse cached scores)
     print(f"\nSampling {num_correct_samples} correct words from corpus...")
-    correct_words = set()
-    with open(corpus_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            words = line.strip().split()
-            for word in words:
-                # Clean word
-                word = ''.join(c for c in word if c.isalpha())
-                if len(word) >= 4 and not any(c.isdigit() for c in word):
-                    correct_words.add(word)
-                if len(correct_words) >= num_correct_samples * 2:
-                    break
-            if len(correct_words) >= num_correct_samples * 2:
-                break
-    
-    correct_words = random.sample(list(correct_words), min(num_correct_samples, len(correct_words)))
+    correct_words = sample_corpus_words(corpus_path, num_correct_samples, seed=seed)
     
     # Score correct words
     print(f"Scoring {len(correct_words)} correct words...")
-    correct_scores = []
-    for word in correct_words:
-        score = char_score(model, word)
-        correct_scores.append(score)
+    correct_scores = scorer.score_many(correct_words)
     
     # Load and score incorrect words
     print(f"\nLoading incorrect words from: {test_pairs_path}")
-    incorrect_words = []
-    correct_versions = []
-    
-    with open(test_pairs_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if '-' in line:
-                parts = line.split('-', 1)
-                if len(parts) == 2:
-                    wrong = parts[0].strip()
-                    correct = parts[1].strip()
-                    incorrect_words.append(wrong)
-                    correct_versions.append(correct)
+    incorrect_words, correct_versions = load_test_pairs(test_pairs_path)
     
     print(f"Scoring {len(incorrect_words)} incorrect words...")
-    incorrect_scores = []
-    correct_version_scores = []
-    score_differences = []
-    
-    for wrong, correct in zip(incorrect_words, correct_versions):
-        wrong_score = char_score(model, wrong)
-        correct_score = char_score(model, correct)
-        
-        incorrect_scores.append(wrong_score)
-        correct_version_scores.append(correct_score)
-        score_differences.append(correct_score - wrong_score)
+    incorrect_scores = scorer.score_many(incorrect_words)
+    correct_version_scores = scorer.score_many(correct_versions)
+    score_differences = correct_version_scores - incorrect_scores
+    print(scorer.report())
     
     # Calculate statistics
     print(f"\n{'=' * 80}")
@@ -127,37 +87,28 @@ def analyze_threshold(language, model_path, corpus_path, test_pairs_path, num_co
     print("Threshold Analysis")
     print('=' * 80)
     
-    # Test different thresholds
+    # Full sweep over every distinct margin; the reversed pairs (correct word
+    # checked against its misspelling) are the negatives
+    margin_curve = roc_sweep(score_differences, -score_differences, flag_below=False)
+    best = best_point(margin_curve)
+    best_threshold = best['threshold']
+    best_f1 = best['f1']
+    
     thresholds = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0]
+    table = curve_at(score_differences, -score_differences, thresholds, flag_below=False)
     
     print(f"\nTesting thresholds (score_difference > threshold = misspelling detected):")
     print(f"{'Threshold':>10s} {'Detected':>10s} {'Accuracy':>10s} {'Precision':>10s} {'Recall':>10s} {'F1':>10s}")
     print('-' * 80)
     
-    best_f1 = 0
-    best_threshold = 1.5
-    
-    for threshold in thresholds:
-        # Count detections
-        detected = sum(1 for diff in score_differences if diff > threshold)
+    for i, threshold in enumerate(thresholds):
+        detected = int(table['tp'][i])
         accuracy = detected / len(score_differences) * 100
-        
-        # Calculate precision and recall
-        true_positives = detected
-        false_positives = 0  # We don't have false positives in this test (all are actual errors)
-        false_negatives = len(score_differences) - detected
-        
-        precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
-        recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
-        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-        
-        print(f"{threshold:10.1f} {detected:10d} {accuracy:9.1f}% {precision:9.1f}% {recall:9.1f}% {f1:9.3f}")
-        
-        if f1 > best_f1:
-            best_f1 = f1
-            best_threshold = threshold
+        print(f"{threshold:10.1f} {detected:10d} {accuracy:9.1f}% {table['precision'][i] * 100:9.1f}% "
+              f"{table['recall'][i] * 100:9.1f}% {table['f1'][i]:9.3f}")
     
-    print(f"\nBest threshold: {best_threshold} (F1={best_f1:.3f})")
+    print(f"\nBest threshold over {len(margin_curve['threshold'])} candidates: {best_threshold:.3f} "
+          f"(F1={best_f1:.3f}, AUC={auc(margin_curve):.3f})")
     
     # Absolute score threshold analysis
     print(f"\n{'=' * 80}")
@@ -166,18 +117,20 @@ def analyze_threshold(language, model_path, corpus_path, test_pairs_path, num_co
     print("\nTesting absolute score thresholds (score < threshold = misspelling):")
     
     abs_thresholds = [-15, -12, -10, -8, -6, -5, -4]
+    table = curve_at(incorrect_scores, correct_scores, abs_thresholds, flag_below=True)
     
     print(f"{'Threshold':>10s} {'Correct':>12s} {'Incorrect':>12s} {'FP Rate':>10s} {'TP Rate':>10s}")
     print('-' * 80)
     
-    for threshold in abs_thresholds:
-        correct_flagged = sum(1 for score in correct_scores if score < threshold)
-        incorrect_flagged = sum(1 for score in incorrect_scores if score < threshold)
-        
-        fp_rate = correct_flagged / len(correct_scores) * 100
-        tp_rate = incorrect_flagged / len(incorrect_scores) * 100
-        
-        print(f"{threshold:10.1f} {correct_flagged:12d} {incorrect_flagged:12d} {fp_rate:9.1f}% {tp_rate:9.1f}%")
+    for i, threshold in enumerate(abs_thresholds):
+        print(f"{threshold:10.1f} {int(table['fp'][i]):12d} {int(table['tp'][i]):12d} "
+              f"{table['fpr'][i] * 100:9.1f}% {table['tpr'][i] * 100:9.1f}%")
+    
+    absolute_curve = roc_sweep(incorrect_scores, correct_scores, flag_below=True)
+    best_absolute = best_point(absolute_curve)
+    print(f"\nBest absolute threshold: {best_absolute['threshold']:.3f} (F1={best_absolute['f1']:.3f}, "
+          f"FP Rate={best_absolute['fpr'] * 100:.1f}%, TP Rate={best_absolute['tpr'] * 100:.1f}%, "
+          f"AUC={auc(absolute_curve):.3f})")
     
     # Return results
     return {
@@ -187,6 +140,9 @@ def analyze_threshold(language, model_path, corpus_path, test_pairs_path, num_co
         'score_differences': score_differences,
         'best_threshold': best_threshold,
         'best_f1': best_f1,
+        'best_absolute_threshold': best_absolute['threshold'],
+        'margin_curve': margin_curve,
+        'absolute_curve': absolute_curve,
         'stats': {
             'correct_mean': np.mean(correct_scores),
             'incorrect_mean': np.mean(incorrect_scores),
@@ -227,11 +183,12 @@ def main():
     print(f"\n{'=' * 80}")
     print("Summary: Recommended Thresholds")
     print('=' * 80)
-    print(f"\n{'Language':15s} {'Best Threshold':>15s} {'F1 Score':>10s} {'Mean Diff':>12s}")
+    print(f"\n{'Language':15s} {'Best Threshold':>15s} {'F1 Score':>10s} {'Mean Diff':>12s} {'Best Absolute':>14s}")
     print('-' * 80)
     
     for result in results:
-        print(f"{result['language']:15s} {result['best_threshold']:15.1f} {result['best_f1']:10.3f} {result['stats']['diff_mean']:12.3f}")
+        print(f"{result['language']:15s} {result['best_threshold']:15.3f} {result['best_f1']:10.3f} "
+              f"{result['stats']['diff_mean']:12.3f} {result['best_absolute_threshold']:14.3f}")
     
     print(f"\n{'=' * 80}")
     print("Conclusion")
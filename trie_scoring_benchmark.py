@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Prefix-sharing scoring benchmark.
+
+Scores each character corpus (one word per line, sorted) with
+CharScorer.score_trie and with score_many, checks the scores agree and
+reports how many model lookups sharing the prefixes saved.
+
+Usage:
+    python trie_scoring_benchmark.py
+    python trie_scoring_benchmark.py --words wordlist.txt --model models/isiNdebeleUModel.arpa
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from char_scorer import CharScorer
+
+LANGUAGES = [
+    ('isiXhosa', 'models/isiXhosaUModel.arpa', 'character_corpora/isiXhosaUCorpus.txt'),
+    ('isiNdebele', 'models/isiNdebeleUModel.arpa', 'character_corpora/isiNdebeleUCorpus.txt'),
+    ('siSwati', 'models/siSwatiUModel.arpa', 'character_corpora/siSwatiUCorpus.txt'),
+]
+
+
+def read_words(path):
+    """Words of a word list or character corpus (spaces between characters are dropped)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [word for word in (''.join(line.split()) for line in f) if word]
+
+
+def benchmark(name, model_path, words_path):
+    words = read_words(words_path)
+    print(f"\n{name}: {len(words)} words from {words_path}")
+
+    plain = CharScorer(model_path)
+    start = time.perf_counter()
+    expected = plain.score_many(words)
+    plain_seconds = time.perf_counter() - start
+
+    shared = CharScorer(model_path)
+    start = time.perf_counter()
+    actual = shared.score_trie(words)
+    trie_seconds = time.perf_counter() - start
+
+    print(f"  score_many: {plain_seconds:.3f}s")
+    print(f"  score_trie: {trie_seconds:.3f}s, max |diff| {np.abs(actual - expected).max():.2e}")
+    print(f"  {shared.report()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare prefix-sharing and per-word scoring.")
+    parser.add_argument('--words', help="word list to score instead of the character corpora")
+    parser.add_argument('--model', help="model for --words")
+    args = parser.parse_args()
+
+    if args.words:
+        if not args.model:
+            parser.error("--words needs --model")
+        benchmark(os.path.basename(args.words), args.model, args.words)
+        return
+
+    for name, model_path, words_path in LANGUAGES:
+        if not os.path.exists(model_path) or not os.path.exists(words_path):
+            print(f"\n⚠ Warning: {name}: missing {model_path} or {words_path}")
+            continue
+        benchmark(name, model_path, words_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+import java.util.*;
+
+/*
+ * Incremental checking session for an editor (check_session.py does the same for Python editors).
+ *
+ * Holds the tokens of a document, runs of non-whitespace as the Run and Check All buttons split
+ * them, with whether each is an error, and is kept up to date with edit events (offset, deleted
+ * length, inserted text) instead of re-splitting the whole text. An edit only re-tokenizes the
+ * tokens it touched: the edited span is widened to the enclosing token boundaries, tokenized
+ * alone and spliced in, and the later tokens are moved by the length change. Results are
+ * remembered per word, so only words the session has not seen before reach the checker.
+ *
+ * Each edit returns a Diff of the error tokens it removed (in offsets before the edit) and
+ * added (after it), for the editor to update its highlights.
+ *
+ * A deferred session never calls the checker from edit(): new words are left pending, so an
+ * edit only costs tokenizing, and their answers are supplied later with resolve(), e.g. from a
+ * background thread's results. Answers depend only on the word, so they stay valid however the
+ * text changed in the meantime.
+ */
+public class CheckSession {
+	public interface Checker {
+		boolean isCorrect(String word);
+	}
+
+	public static class Token {
+		public int start;
+		public int end;
+		public final String word;
+		boolean error;
+		boolean pending; //not decided yet (deferred sessions)
+		boolean live = true; //still in the document
+
+		Token(int start, String word) {
+			this.start = start;
+			this.end = start + word.length();
+			this.word = word;
+		}
+
+		public boolean isError() {
+			return error;
+		}
+
+		public boolean isPending() {
+			return pending;
+		}
+
+		public String toString() {
+			return word + "@" + start;
+		}
+	}
+
+	public static class Diff {
+		//re-tokenized span, in offsets after the edit
+		public final int start;
+		public final int end;
+		public final List<Token> removed;
+		public final List<Token> added;
+
+		Diff(int start, int end, List<Token> removed, List<Token> added) {
+			this.start = start;
+			this.end = end;
+			this.removed = removed;
+			this.added = added;
+		}
+
+		public boolean isEmpty() {
+			return removed.isEmpty() && added.isEmpty();
+		}
+	}
+
+	private final Checker checker;
+	private final StringBuilder text = new StringBuilder();
+	private final ArrayList<Token> tokens = new ArrayList<Token>();
+	private final HashMap<String, Boolean> results = new HashMap<String, Boolean>();
+	private final boolean deferred;
+	//tokens waiting for each undecided word (deferred sessions)
+	private final HashMap<String, ArrayList<Token>> pendingTokens = new HashMap<String, ArrayList<Token>>();
+	private int errors = 0;
+	//counters over every edit so far
+	long edits = 0;
+	long tokensRetokenized = 0;
+	long wordsChecked = 0;
+
+	public CheckSession(Checker checker, String text) {
+		this(checker, text, false);
+	}
+
+	public CheckSession(Checker checker, String text, boolean deferred) {
+		this.checker = checker;
+		this.deferred = deferred;
+		if(!text.isEmpty())
+			edit(0, 0, text);
+	}
+
+	public int length() {
+		return text.length();
+	}
+
+	public int errorCount() {
+		return errors;
+	}
+
+	//true when every token has been decided
+	public boolean isComplete() {
+		return pendingWords().isEmpty();
+	}
+
+	//the cached answer for word (true if correct), or null if it has not been decided
+	public Boolean result(String word) {
+		return results.get(word);
+	}
+
+	//words still in the document that have not been decided (deferred sessions)
+	public List<String> pendingWords() {
+		ArrayList<String> words = new ArrayList<String>();
+		Iterator<Map.Entry<String, ArrayList<Token>>> it = pendingTokens.entrySet().iterator();
+		while(it.hasNext()) {
+			Map.Entry<String, ArrayList<Token>> entry = it.next();
+			boolean live = false;
+			for(Token token : entry.getValue()) {
+				if(token.live) {
+					live = true;
+					break;
+				}
+			}
+			if(live)
+				words.add(entry.getKey());
+			else
+				it.remove();
+		}
+		return words;
+	}
+
+	/*
+	 * Supplies the answers (true if correct) for pending words. Words decided in the meantime
+	 * keep their answer: a late answer may come from before a recheck() changed it.
+	 * returns: the errors that appeared
+	 */
+	public Diff resolve(Map<String, Boolean> answers) {
+		ArrayList<Token> added = new ArrayList<Token>();
+		for(Map.Entry<String, Boolean> entry : answers.entrySet()) {
+			if(results.containsKey(entry.getKey()))
+				continue;
+			results.put(entry.getKey(), entry.getValue());
+			ArrayList<Token> waiting = pendingTokens.remove(entry.getKey());
+			if(waiting == null)
+				continue;
+			for(Token token : waiting) {
+				if(!token.live)
+					continue;
+				token.pending = false;
+				token.error = !entry.getValue();
+				if(token.error) {
+					added.add(token);
+					errors++;
+				}
+			}
+		}
+		return new Diff(0, text.length(), new ArrayList<Token>(), added);
+	}
+
+	//error tokens in document order
+	public List<Token> errors() {
+		ArrayList<Token> found = new ArrayList<Token>();
+		for(Token token : tokens) {
+			if(token.error)
+				found.add(token);
+		}
+		return found;
+	}
+
+	//first error token starting at or after offset, or null
+	public Token nextError(int offset) {
+		for(int i=firstEndingAtOrAfter(offset); i<tokens.size(); i++) {
+			Token token = tokens.get(i);
+			if(token.error && token.start >= offset)
+				return token;
+		}
+		return null;
+	}
+
+	/*
+	 * Replaces text[offset, offset + deleted) with inserted
+	 * returns: the errors that disappeared and appeared
+	 */
+	public Diff edit(int offset, int deleted, String inserted) {
+		if(offset < 0 || deleted < 0 || offset + deleted > text.length())
+			throw new IllegalArgumentException("edit " + offset + "+" + deleted + " outside a text of length " + text.length());
+		int end = offset + deleted;
+		int delta = inserted.length() - deleted;
+		//tokens ending at or after the edit and starting at or before its end can change;
+		//the characters just outside them are whitespace the edit did not touch
+		int lo = firstEndingAtOrAfter(offset);
+		int hi = Math.max(lo, firstStartingAfter(end));
+		int start = lo < hi ? Math.min(offset, tokens.get(lo).start) : offset;
+		int oldEnd = lo < hi ? Math.max(end, tokens.get(hi - 1).end) : end;
+
+		ArrayList<Token> removed = new ArrayList<Token>();
+		for(int i=lo; i<hi; i++) {
+			Token token = tokens.get(i);
+			token.live = false;
+			if(token.error) {
+				removed.add(token);
+				errors--;
+			}
+		}
+		text.replace(offset, end, inserted);
+		ArrayList<Token> fresh = tokenize(start, oldEnd + delta);
+		ArrayList<Token> added = new ArrayList<Token>();
+		for(Token token : fresh) {
+			if(deferred && !results.containsKey(token.word)) {
+				token.pending = true;
+				ArrayList<Token> waiting = pendingTokens.get(token.word);
+				if(waiting == null) {
+					waiting = new ArrayList<Token>();
+					pendingTokens.put(token.word, waiting);
+				}
+				waiting.add(token);
+				continue;
+			}
+			token.error = !isCorrect(token.word);
+			if(token.error) {
+				added.add(token);
+				errors++;
+			}
+		}
+		tokens.subList(lo, hi).clear();
+		tokens.addAll(lo, fresh);
+		if(delta != 0) {
+			for(int i=lo + fresh.size(); i<tokens.size(); i++) {
+				Token token = tokens.get(i);
+				token.start += delta;
+				token.end += delta;
+			}
+		}
+		edits++;
+		tokensRetokenized += fresh.size();
+		return new Diff(start, oldEnd + delta, removed, added);
+	}
+
+	/*
+	 * Checks word again after the checker's answer changed (ignored or added to the dictionary)
+	 * returns: the errors that disappeared and appeared
+	 */
+	public Diff recheck(String word) {
+		results.remove(word);
+		return recheck(word, isCorrect(word));
+	}
+
+	/*
+	 * recheck() with the word's new answer (true if correct) given, instead of asking the checker,
+	 * e.g. for a word just added to the dictionary while the checker is busy on another thread
+	 */
+	public Diff recheck(String word, boolean correct) {
+		results.put(word, correct);
+		pendingTokens.remove(word);
+		ArrayList<Token> removed = new ArrayList<Token>();
+		ArrayList<Token> added = new ArrayList<Token>();
+		boolean error = !correct;
+		for(Token token : tokens) {
+			if(!token.word.equals(word))
+				continue;
+			token.pending = false;
+			if(token.error == error)
+				continue;
+			token.error = error;
+			if(error) {
+				added.add(token);
+				errors++;
+			} else {
+				removed.add(token);
+				errors--;
+			}
+		}
+		return new Diff(0, text.length(), removed, added);
+	}
+
+	public String stats() {
+		return "Check session: " + tokens.size() + " tokens, " + errors + " errors, " + pendingTokens.size()
+				+ " words pending; " + edits + " edits re-tokenized "
+				+ tokensRetokenized + " tokens and checked " + wordsChecked + " new words";
+	}
+
+	private boolean isCorrect(String word) {
+		Boolean correct = results.get(word);
+		if(correct == null) {
+			correct = checker.isCorrect(word);
+			results.put(word, correct);
+			wordsChecked++;
+		}
+		return correct;
+	}
+
+	private ArrayList<Token> tokenize(int from, int to) {
+		ArrayList<Token> found = new ArrayList<Token>();
+		int i = from;
+		while(i < to) {
+			while(i < to && Character.isWhitespace(text.charAt(i)))
+				i++;
+			int start = i;
+			while(i < to && !Character.isWhitespace(text.charAt(i)))
+				i++;
+			if(i > start)
+				found.add(new Token(start, text.substring(start, i)));
+		}
+		return found;
+	}
+
+	//index of the first token with end >= offset
+	private int firstEndingAtOrAfter(int offset) {
+		int lo = 0, hi = tokens.size();
+		while(lo < hi) {
+			int mid = (lo + hi) >>> 1;
+			if(tokens.get(mid).end < offset)
+				lo = mid + 1;
+			else
+				hi = mid;
+		}
+		return lo;
+	}
+
+	//index of the first token with start > offset
+	private int firstStartingAfter(int offset) {
+		int lo = 0, hi = tokens.size();
+		while(lo < hi) {
+			int mid = (lo + hi) >>> 1;
+			if(tokens.get(mid).start <= offset)
+				lo = mid + 1;
+			else
+				hi = mid;
+		}
+		return lo;
+	}
+}
@@ -0,0 +1,349 @@
+import java.io.*;
+import java.nio.ByteBuffer;
+import java.nio.MappedByteBuffer;
+import java.nio.channels.FileChannel;
+import java.nio.charset.StandardCharsets;
+import java.util.*;
+import java.util.zip.CRC32;
+
+/*
+ * Binary snapshot of the corrector tables (trigram frequencies, wordlist and
+ * trigram transitions), so startup does not re-parse the text files.
+ *
+ * Layout (big-endian):
+ *   int magic, int version, long checksum of the source files
+ *   int poolSize, int blobLength, int[poolSize+1] offsets, byte[blobLength] UTF-8 blob (padded to 4)
+ *   int trigramCount, int[] trigram ids, int[] frequencies      (file order)
+ *   int wordCount, int[] word ids                                (file order)
+ *   int nameCount, int[] name ids, int[nameCount+1] row offsets,  (TransitionTable arrays)
+ *       int[] next, int[] counts, int[] byFreq, int[nameCount] totals, int rowCount, int[] ids with a row
+ * Every string is stored once in the sorted pool and referred to by its index. The
+ * transition arrays are stored as TransitionTable holds them (next refers to the
+ * table's own names, not the pool), so mapping the snapshot does no sorting.
+ *
+ * load() reads the source files, and if the snapshot's version and checksum
+ * match it maps the snapshot instead of parsing them; otherwise it parses the
+ * sources and rewrites the snapshot. Build it ahead of time with
+ *   java CorrectorSnapshot
+ */
+public class CorrectorSnapshot {
+	static final int MAGIC = 0x534E4150; //"SNAP"
+	static final int VERSION = 2;
+	static final String CORRECTOR_FILE = "corrector.snapshot";
+
+	final String[] pool;
+	final int[] triIds;
+	final int[] triFreqs;
+	final int[] wordIds;
+	final TransitionTable table;
+	boolean rebuilt = false; //true if the snapshot was (re)built from the text files
+
+	private CorrectorSnapshot(String[] pool, int[] triIds, int[] triFreqs, int[] wordIds, TransitionTable table) {
+		this.pool = pool;
+		this.triIds = triIds;
+		this.triFreqs = triFreqs;
+		this.wordIds = wordIds;
+		this.table = table;
+	}
+
+	/*
+	 * Snapshot of trigrams2.txt, wordlist.txt and probabilities.txt in the working directory
+	 */
+	public static CorrectorSnapshot forCorrector() throws IOException {
+		return load(new File(CORRECTOR_FILE), read(new File("trigrams2.txt")),
+				read(new File("wordlist.txt")), read(new File("probabilities.txt")));
+	}
+
+	/*
+	 * Maps snapshot if it was built from exactly these sources, otherwise parses them and rewrites it
+	 */
+	public static CorrectorSnapshot load(File snapshot, byte[] trigrams, byte[] wordlist, byte[] probabilities) throws IOException {
+		long checksum = checksum(trigrams, wordlist, probabilities);
+		if(snapshot.exists()) {
+			try {
+				CorrectorSnapshot snap = map(snapshot, checksum);
+				if(snap != null)
+					return snap;
+			} catch(IOException | RuntimeException e) {
+				System.err.println("Ignoring unreadable snapshot " + snapshot + ": " + e);
+			}
+		}
+		CorrectorSnapshot snap = parse(trigrams, wordlist, probabilities);
+		snap.rebuilt = true;
+		try {
+			snap.write(snapshot, checksum);
+		} catch(IOException e) {
+			//the snapshot is only a cache, carry on with the parsed tables
+			System.err.println("Could not write snapshot " + snapshot + ": " + e);
+		}
+		return snap;
+	}
+
+	static byte[] read(File file) throws IOException {
+		return read(new FileInputStream(file));
+	}
+
+	static byte[] read(InputStream in) throws IOException {
+		if(in == null)
+			throw new FileNotFoundException("missing resource");
+		try {
+			ByteArrayOutputStream out = new ByteArrayOutputStream();
+			byte[] buf = new byte[1 << 16];
+			int n;
+			while((n = in.read(buf)) > 0)
+				out.write(buf, 0, n);
+			return out.toByteArray();
+		} finally {
+			in.close();
+		}
+	}
+
+	static long checksum(byte[]... sources) {
+		CRC32 crc = new CRC32();
+		ByteBuffer lengths = ByteBuffer.allocate(8 * sources.length);
+		for(byte[] source : sources) {
+			crc.update(source, 0, source.length);
+			lengths.putLong(source.length);
+		}
+		crc.update(lengths.array(), 0, lengths.capacity());
+		return crc.getValue();
+	}
+
+	/*
+	 * Parses the text files the same way the Scanner loops in ErrorCorrector and Probabilities did
+	 */
+	static CorrectorSnapshot parse(byte[] trigrams, byte[] wordlist, byte[] probabilities) throws IOException {
+		ArrayList<String> triList = new ArrayList<String>();
+		ArrayList<Integer> freqList = new ArrayList<Integer>();
+		for(String line : lines(trigrams)) {
+			String[] entry = line.split(" ");
+			triList.add(entry[0]);
+			freqList.add(Integer.parseInt(entry[1]));
+		}
+		ArrayList<String> words = new ArrayList<String>();
+		for(String line : lines(wordlist))
+			words.add(line.trim());
+		//later lines for the same trigram replace earlier ones, as HashMap.put did
+		LinkedHashMap<String, String[]> rows = new LinkedHashMap<String, String[]>();
+		for(String line : lines(probabilities)) {
+			String[] tokens = line.trim().split("\\s+");
+			if(tokens[0].isEmpty())
+				continue;
+			rows.remove(tokens[0]);
+			rows.put(tokens[0], tokens);
+		}
+
+		TreeSet<String> distinct = new TreeSet<String>(triList);
+		distinct.addAll(words);
+		for(String[] tokens : rows.values()) {
+			distinct.add(tokens[0]);
+			for(int t=1; t+1<tokens.length; t+=2)
+				distinct.add(tokens[t]);
+		}
+		String[] pool = distinct.toArray(new String[0]);
+		HashMap<String, Integer> ids = new HashMap<String, Integer>(pool.length * 2);
+		for(int i=0; i<pool.length; i++)
+			ids.put(pool[i], i);
+
+		int[] triIds = new int[triList.size()];
+		int[] triFreqs = new int[triList.size()];
+		for(int i=0; i<triIds.length; i++) {
+			triIds[i] = ids.get(triList.get(i));
+			triFreqs[i] = freqList.get(i);
+		}
+		int[] wordIds = new int[words.size()];
+		for(int i=0; i<wordIds.length; i++)
+			wordIds[i] = ids.get(words.get(i));
+
+		int[] prevIds = new int[rows.size()];
+		int[] rowOffsets = new int[rows.size() + 1];
+		int total = 0;
+		for(String[] tokens : rows.values())
+			total += (tokens.length - 1) / 2;
+		int[] nextIds = new int[total];
+		int[] counts = new int[total];
+		int r = 0, k = 0;
+		for(String[] tokens : rows.values()) {
+			prevIds[r] = ids.get(tokens[0]);
+			rowOffsets[r] = k;
+			for(int t=1; t+1<tokens.length; t+=2) {
+				nextIds[k] = ids.get(tokens[t]);
+				counts[k] = Integer.parseInt(tokens[t+1]);
+				k++;
+			}
+			r++;
+		}
+		rowOffsets[r] = k;
+		TransitionTable table = new TransitionTable(pool, prevIds, rowOffsets, nextIds, counts);
+		return new CorrectorSnapshot(pool, triIds, triFreqs, wordIds, table);
+	}
+
+	private static ArrayList<String> lines(byte[] data) throws IOException {
+		ArrayList<String> lines = new ArrayList<String>();
+		BufferedReader reader = new BufferedReader(new InputStreamReader(new ByteArrayInputStream(data), StandardCharsets.UTF_8));
+		String line;
+		while((line = reader.readLine()) != null)
+			lines.add(line);
+		return lines;
+	}
+
+	private void write(File snapshot, long checksum) throws IOException {
+		byte[][] encoded = new byte[pool.length][];
+		int blobLength = 0;
+		for(int i=0; i<pool.length; i++) {
+			encoded[i] = pool[i].getBytes(StandardCharsets.UTF_8);
+			blobLength += encoded[i].length;
+		}
+		File tmp = new File(snapshot.getPath() + ".tmp");
+		DataOutputStream out = new DataOutputStream(new BufferedOutputStream(new FileOutputStream(tmp), 1 << 16));
+		try {
+			out.writeInt(MAGIC);
+			out.writeInt(VERSION);
+			out.writeLong(checksum);
+			out.writeInt(pool.length);
+			out.writeInt(blobLength);
+			int offset = 0;
+			for(byte[] s : encoded) {
+				out.writeInt(offset);
+				offset += s.length;
+			}
+			out.writeInt(offset);
+			for(byte[] s : encoded)
+				out.write(s);
+			for(int pad = blobLength; pad % 4 != 0; pad++)
+				out.writeByte(0);
+			out.writeInt(triIds.length);
+			writeInts(out, triIds);
+			writeInts(out, triFreqs);
+			out.writeInt(wordIds.length);
+			writeInts(out, wordIds);
+			//the table's names are a sorted subset of the sorted pool
+			out.writeInt(table.names.length);
+			for(String name : table.names)
+				out.writeInt(Arrays.binarySearch(pool, name));
+			writeInts(out, table.rowOffsets);
+			writeInts(out, table.next);
+			writeInts(out, table.counts);
+			writeInts(out, table.byFreq);
+			writeInts(out, table.totals);
+			out.writeInt(table.hasRow.cardinality());
+			for(int id=table.hasRow.nextSetBit(0); id>=0; id=table.hasRow.nextSetBit(id+1))
+				out.writeInt(id);
+		} finally {
+			out.close();
+		}
+		if(snapshot.exists() && !snapshot.delete())
+			throw new IOException("cannot replace " + snapshot);
+		if(!tmp.renameTo(snapshot))
+			throw new IOException("cannot rename " + tmp + " to " + snapshot);
+	}
+
+	private static void writeInts(DataOutputStream out, int[] values) throws IOException {
+		for(int v : values)
+			out.writeInt(v);
+	}
+
+	/*
+	 * Returns null if the snapshot is from another version or other source files
+	 */
+	private static CorrectorSnapshot map(File snapshot, long checksum) throws IOException {
+		RandomAccessFile file = new RandomAccessFile(snapshot, "r");
+		try {
+			if(file.length() < 16 || file.readInt() != MAGIC || file.readInt() != VERSION || file.readLong() != checksum)
+				return null;
+			FileChannel channel = file.getChannel();
+			MappedByteBuffer buf = channel.map(FileChannel.MapMode.READ_ONLY, 0, channel.size());
+			buf.position(16);
+			int poolSize = buf.getInt();
+			int blobLength = buf.getInt();
+			int[] offsets = ints(buf, poolSize + 1);
+			byte[] blob = new byte[blobLength];
+			buf.get(blob);
+			buf.position(buf.position() + (4 - blobLength % 4) % 4);
+			String[] pool = new String[poolSize];
+			for(int i=0; i<poolSize; i++)
+				pool[i] = new String(blob, offsets[i], offsets[i+1] - offsets[i], StandardCharsets.UTF_8);
+
+			int trigramCount = buf.getInt();
+			int[] triIds = ints(buf, trigramCount);
+			int[] triFreqs = ints(buf, trigramCount);
+			int[] wordIds = ints(buf, buf.getInt());
+			int nameCount = buf.getInt();
+			String[] names = new String[nameCount];
+			int[] nameIds = ints(buf, nameCount);
+			for(int i=0; i<nameCount; i++)
+				names[i] = pool[nameIds[i]];
+			int[] rowOffsets = ints(buf, nameCount + 1);
+			int total = rowOffsets[nameCount];
+			int[] next = ints(buf, total);
+			int[] counts = ints(buf, total);
+			int[] byFreq = ints(buf, total);
+			int[] totals = ints(buf, nameCount);
+			BitSet hasRow = new BitSet(nameCount);
+			for(int id : ints(buf, buf.getInt()))
+				hasRow.set(id);
+			TransitionTable table = new TransitionTable(names, rowOffsets, next, counts, byFreq, totals, hasRow);
+			return new CorrectorSnapshot(pool, triIds, triFreqs, wordIds, table);
+		} finally {
+			file.close();
+		}
+	}
+
+	private static int[] ints(ByteBuffer buf, int n) {
+		int[] values = new int[n];
+		buf.asIntBuffer().get(values);
+		buf.position(buf.position() + 4 * n);
+		return values;
+	}
+
+	/*
+	 * Trigram -> frequency for trigrams with at least minFreq occurrences
+	 */
+	public HashMap<String, Integer> trigramMap(int minFreq) {
+		HashMap<String, Integer> map = new HashMap<String, Integer>(triIds.length * 2);
+		for(int i=0; i<triIds.length; i++) {
+			if(triFreqs[i] >= minFreq)
+				map.put(pool[triIds[i]], triFreqs[i]);
+		}
+		return map;
+	}
+
+	/*
+	 * Trigrams with at least minFreq occurrences, in file order
+	 */
+	public ArrayList<String> trigramList(int minFreq) {
+		ArrayList<String> list = new ArrayList<String>();
+		for(int i=0; i<triIds.length; i++) {
+			if(triFreqs[i] >= minFreq)
+				list.add(pool[triIds[i]]);
+		}
+		return list;
+	}
+
+	public HashSet<String> wordSet() {
+		HashSet<String> words = new HashSet<String>(wordIds.length * 2);
+		for(int id : wordIds)
+			words.add(pool[id]);
+		return words;
+	}
+
+	/*
+	 * Trigram transition frequencies from probabilities.txt
+	 */
+	public TransitionTable transitions() {
+		return table;
+	}
+
+	public static void main(String[] args) {
+		try {
+			long start = System.nanoTime();
+			CorrectorSnapshot snap = forCorrector();
+			System.out.println((snap.rebuilt ? "Built " : "Up to date: ") + CORRECTOR_FILE + " ("
+					+ snap.pool.length + " strings, " + snap.triIds.length + " trigrams, " + snap.wordIds.length + " words, "
+					+ snap.table.size() + " transitions) in " + (System.nanoTime() - start) / 1000000 + " ms");
+		} catch(IOException e) {
+			System.err.println("Error: " + e.getMessage());
+			System.exit(1);
+		}
+	}
+}
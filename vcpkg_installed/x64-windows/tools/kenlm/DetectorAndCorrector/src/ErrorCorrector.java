@@ -8,56 +8,79 @@ public class ErrorCorrector{
 	static int true_negative = 0;
 	static int false_positive = 0;
 	static String line;
-	static ArrayList<String> tempArr;
 	static ArrayList<String> triArray;
 	static HashMap<String, Integer> hashTri;
-	static HashMap<String, TriNext> hashAlt;
+	static TransitionTable triNext;
 	static Set<String> wordlist;
 	static DamerauLevenshtein DL;
+	static TrigramIndex triIndex;
 	static BinarySearch bs;
 	static boolean alternatives;
 	static int SA = 0;
 	static int accuracySugg = 0;
 	static ArrayList<String> suggestions;
 	static boolean alt;
+	//candidate search settings (-Dcorrector.beamWidth=..., -Dcorrector.maxSuggestions=...)
+	static int beamWidth = Integer.getInteger("corrector.beamWidth", 200);
+	static int maxSuggestions = Integer.getInteger("corrector.maxSuggestions", 3);
+	//search counters, over every word corrected so far
+	static long partialsExplored = 0;
+	static long partialsPruned = 0;
+	static int beamEarlyStops = 0;
+	//answers for recently corrected words, least recently used evicted first (-Dcorrector.cacheSize=..., 0 for none)
+	static int cacheSize = Integer.getInteger("corrector.cacheSize", 4096);
+	static LinkedHashMap<String, ArrayList<String>> correctionCache = new LinkedHashMap<String, ArrayList<String>>(16, 0.75f, true) {
+		protected boolean removeEldestEntry(Map.Entry<String, ArrayList<String>> eldest) {
+			if(size() > cacheSize) {
+				cacheEvictions++;
+				return true;
+			}
+			return false;
+		}
+	};
+	static long cacheHits = 0;
+	static long cacheMisses = 0;
+	static long cacheEvictions = 0;
 
 	public void initCorrector() {
 		try {
-			//create HashMap for Trigrams and arraylist for iterating through
-			hashTri = new HashMap<String, Integer>();
-			Probabilities prob = new Probabilities();
-			hashAlt = prob.getProbMap();
-			triArray = new ArrayList<String>();
 			File out = new File("corrected.txt");
 			
 			if(!out.exists())
 				out.createNewFile();
 			BufferedWriter bw = new BufferedWriter(new FileWriter(out, true));
-			Scanner sc = new Scanner(new FileInputStream(new File("trigrams2.txt")));
-			while(sc.hasNextLine()) {
-				String[] line = sc.nextLine().split(" ");
-				String tri = line[0];
-				int freq = Integer.parseInt(line[1]);
-				if(freq >= 45) {
-					hashTri.put(tri, freq);
-					triArray.add(tri);
-				}
-			}
-			sc.close();
+			//trigrams2.txt, wordlist.txt and probabilities.txt, from corrector.snapshot when it is up to date
+			CorrectorSnapshot snap = CorrectorSnapshot.forCorrector();
+			//create HashMap for Trigrams and arraylist for iterating through
+			hashTri = snap.trigramMap(45);
+			triArray = snap.trigramList(45);
+			triNext = snap.transitions();
 			//create hashset for wordlist
-			wordlist = new HashSet<String>();
-			sc = new Scanner(new FileInputStream(new File("wordlist.txt")));
-			while(sc.hasNextLine()) {
-				wordlist.add(sc.nextLine().trim());
-			}
-			sc.close();
+			wordlist = snap.wordSet();
 			DL = new DamerauLevenshtein(1, 1, 1, 2);
+			triIndex = new TrigramIndex(triArray, DL);
 			bs = new BinarySearch();
 		}catch(IOException e) {
 			e.printStackTrace();
 		}
 	}
+	//the corrector tables do not change after initCorrector, so an answer stays valid for the life of the JVM
 	public ArrayList<String> correct(String sword) {
+		if(cacheSize <= 0 || sword.isEmpty())
+			return findCorrections(sword);
+		String key = uppercase(sword);
+		ArrayList<String> cached = correctionCache.get(key);
+		if(cached != null) {
+			cacheHits++;
+			return new ArrayList<String>(cached);
+		}
+		cacheMisses++;
+		ArrayList<String> result = findCorrections(sword);
+		correctionCache.put(key, new ArrayList<String>(result));
+		return result;
+	}
+
+	ArrayList<String> findCorrections(String sword) {
 		try {
 			
 				
@@ -112,14 +135,9 @@ public class ErrorCorrector{
 							arrTrig.get(i).setAlt();
 							//System.out.println(arrTrig.get(i).getTri());
 							String prevTri = arrTrig.get(i-1).getTri();
-							//get TriNext object if the trigram occurs
-							if(hashAlt.containsKey(prevTri)) {
-								TriNext tn = hashAlt.get(prevTri);
-								ArrayList<String> nextTris = tn.getArray();
-								HashMap<String, Integer> probNext = tn.getMap();
-								if(probNext.containsKey(source)) {
-									arrTrig.get(i).setSugg(nextTris);
-								}
+							//offer the other trigrams that follow the previous one, most frequent first
+							if(triNext.contains(prevTri, source)) {
+								arrTrig.get(i).setSugg(triNext.successors(prevTri));
 							}
 						}
 					}
@@ -308,137 +326,130 @@ public class ErrorCorrector{
 		return temp;
 	}
 	
-	//method to find trigram suggestions for incorrect trigram
+	//method to find trigram suggestions for incorrect trigram (valid trigrams within distance 2, sorted)
 	public static ArrayList<String> find(String source){
-		ArrayList<String> tempArr = new ArrayList<String>();
-		for(String target : triArray) {
-			int dist = DL.execute(source, target);
-			if(dist <= 2) {
-				tempArr.add(target);
-			}
-		}
-		Collections.sort(tempArr);
-		return tempArr;
+		return triIndex.neighbours(source);
 	}
 	
 	//method to find candidate corrections
+	//beam search: partial words are extended one trigram at a time and only the best beamWidth survive each step
 	public static ArrayList<String> createSugg(ArrayList<Trigram> arrTrig) {
 		ArrayList<String> wordSugg = new ArrayList<String>();
-		ArrayList<String> suggCombo; //stores substrings from combining suggestions - done to find corrections for deletion errors
-		tempArr = new ArrayList<String>();
-		for(int i=0; i<arrTrig.size(); i++) {
-			Trigram trig = arrTrig.get(i);
-			int size = trig.getSugg().size();
-			if(i==0) {
-				if(size == 0) //if trigram is correct
-					tempArr.add(trig.getTri());
-				else {
-					for(String tri : trig.getSugg()) {
-						tempArr.add(tri);
-					}
-					suggCombo = combineSugg(trig.getSugg());
-					if(!suggCombo.isEmpty()) {
-						for(String s : suggCombo) {
-							tempArr.add(s);
-						}
-					}
-					for(String s : tempArr) {
-						if(wordlist.contains(s)){
-							if(s.length()!=3 && !wordSugg.contains(s))
-							wordSugg.add(s);
-						}
-					}
+		//the misspelt word, rebuilt from its trigrams, that partials are edit-compared against
+		String source = arrTrig.get(0).getTri();
+		for(int i=1; i<arrTrig.size(); i++)
+			source += arrTrig.get(i).getTri().substring(2);
+		int complete = 0; //suggestions at least as long as the misspelt word
+
+		ArrayList<Partial> beam = new ArrayList<Partial>();
+		Trigram first = arrTrig.get(0);
+		if(first.getSugg().isEmpty()) //if trigram is correct
+			beam.add(new Partial(source).extend(first.getTri(), 0.0));
+		else {
+			HashMap<String, Partial> start = new HashMap<String, Partial>();
+			ArrayList<String> cands = new ArrayList<String>(first.getSugg());
+			cands.addAll(combineSugg(first.getSugg()));
+			for(String s : cands) {
+				Partial p = new Partial(source).extend(s, transitions(s, 0));
+				partialsExplored++;
+				keepBest(start, p);
+				if(s.length()!=3 && wordlist.contains(s) && !wordSugg.contains(s)) {
+					wordSugg.add(s);
+					if(s.length() >= source.length())
+						complete++;
 				}
+			}
+			beam = prune(start);
+		}
 
+		for(int i=1; i<arrTrig.size() && !beam.isEmpty(); i++) {
+			if(complete >= maxSuggestions) {
+				beamEarlyStops++;
+				break;
 			}
+			Trigram trig = arrTrig.get(i);
+			//candidate continuations, by their first two characters
+			HashMap<String, ArrayList<String>> byStart = new HashMap<String, ArrayList<String>>();
+			if(trig.getSugg().isEmpty()) //if trigram is correct
+				addCandidate(byStart, trig.getTri());
 			else {
-				int tempSize = tempArr.size();
-				String tri = trig.getTri();
-				if(size == 0) { //if trigram is correct
-					for(int j=0; j<tempSize; j++) {
-						String str = tempArr.get(j);	
-						String str_combine = combine(str, tri);
-						if(!str_combine.isEmpty()) {
-							tempArr.add(str_combine);
-							//check if str_combine is in the wordlist, is it is store it as a suggestion
-							if(wordlist.contains(str_combine)){
-								//System.out.println(str_combine);
-								if(!wordSugg.contains(str_combine))
-									wordSugg.add(str_combine);
-							}
-						}
-					}
-				}
-				else { //if trigram is incorrect
-					//create combinations from suggestions and then combine these with strings in tempArr
-					suggCombo = combineSugg(trig.getSugg());
-					if(!suggCombo.isEmpty()) {
-						int len = suggCombo.size()-1;
-						for(int j=0; j<tempSize; j++) {
-							String str = tempArr.get(j);
-							
-							int start = bs.findStart(suggCombo, str, 0, len);
-							if(!(start<0)) {
-								int end = bs.findEnd(suggCombo, str, start, len);
-								if(end<0) {
-									System.out.println("Something wrong with suggCombo from createSugg method.");
-									System.exit(0);
-								}
-								//System.out.println("String: " + str);
-								for(int k = start; k<=end; k++) {
-									String str_combine = combine(str, suggCombo.get(k));
-									//System.out.println(str_combine);
-									if(!str_combine.isEmpty()) {
-										tempArr.add(str_combine);
-										if(wordlist.contains(str_combine)){
-											//System.out.println(str_combine);
-											if(!wordSugg.contains(str_combine))
-												wordSugg.add(str_combine);
-										}
-									}
-								}
-							}
-						}
-					}
-					//combine strings in tempArr with suggestions from trig.suggestions
-					ArrayList<String> sugg = trig.getSugg();
-					for(int j=0; j<tempSize; j++) {
-						String str = tempArr.get(j);
-						int start = bs.findStart(sugg, str, 0, size-1);
-						if(!(start<0)) {
-							int end = bs.findEnd(sugg, str, start, size-1);
-							if(end<0) {
-								System.out.println("Something wrong with suggCombo from createSugg method.");
-								System.exit(0);
-							}
-							//System.out.println("String: " + str);
-							for(int k=start; k<=end; k++) {
-								if(i==1){
-								//System.out.println(sugg.get(k));
-								}
-								String str_combine = combine(str, sugg.get(k));
-								if(!str_combine.isEmpty()) {
-									tempArr.add(str_combine);
-									if(wordlist.contains(str_combine)){
-										if(!wordSugg.contains(str_combine))
-											wordSugg.add(str_combine);
-									}
-								}
-							}
-						}
+				//combinations of suggestions cover deletion errors
+				for(String s : combineSugg(trig.getSugg()))
+					addCandidate(byStart, s);
+				for(String s : trig.getSugg())
+					addCandidate(byStart, s);
+			}
+
+			HashMap<String, Partial> next = new HashMap<String, Partial>();
+			for(Partial partial : beam) {
+				ArrayList<String> cands = byStart.get(partial.word.substring(partial.word.length()-2));
+				if(cands == null)
+					continue;
+				for(String c : cands) {
+					String tail = c.substring(2);
+					String str_combine = partial.word + tail;
+					//only the transitions into the appended characters are new: the first starts at the
+					//trigram three characters before the end of the partial word
+					Partial p = partial.extend(tail, partial.lmScore + transitions(str_combine, Math.max(0, partial.word.length()-3)));
+					partialsExplored++;
+					keepBest(next, p);
+					//check if str_combine is in the wordlist, if it is store it as a suggestion
+					if(wordlist.contains(str_combine) && !wordSugg.contains(str_combine)) {
+						wordSugg.add(str_combine);
+						if(str_combine.length() >= source.length())
+							complete++;
 					}
 				}
-				//remove strings that combinations have already been done on from tempArr
-				for(int m=0; m<tempSize; m++) {
-					tempArr.remove(0);
-				}
 			}
+			beam = prune(next);
 		}
-		/**for(String s: tempArr) {
-			System.out.println(s);
-		}*/
 		return wordSugg;
 	}
+
+	public static String searchStats() {
+		return "Candidate search: " + partialsExplored + " partials explored, " + partialsPruned
+				+ " pruned (beam width " + beamWidth + "), " + beamEarlyStops + " early stops; correction cache: "
+				+ cacheHits + " hits, " + cacheMisses + " misses, " + cacheEvictions + " evictions";
+	}
+
+	//log probability of the trigram transitions in word from position start onwards, from probabilities.txt
+	static double transitions(String word, int start) {
+		double score = 0.0;
+		for(int k=start; k+4<=word.length(); k++)
+			score += triNext.logProb(word.substring(k, k+3), word.substring(k+1, k+4));
+		return score;
+	}
+
+	static void addCandidate(HashMap<String, ArrayList<String>> byStart, String cand) {
+		String key = cand.substring(0, 2);
+		ArrayList<String> list = byStart.get(key);
+		if(list == null) {
+			list = new ArrayList<String>();
+			byStart.put(key, list);
+		}
+		list.add(cand);
+	}
+
+	static void keepBest(HashMap<String, Partial> partials, Partial p) {
+		Partial old = partials.get(p.word);
+		if(old == null || p.score() > old.score())
+			partials.put(p.word, p);
+	}
+
+	//keep the beamWidth best scoring partial words
+	static ArrayList<Partial> prune(HashMap<String, Partial> partials) {
+		ArrayList<Partial> beam = new ArrayList<Partial>(partials.values());
+		if(beam.size() > beamWidth) {
+			Collections.sort(beam, new Comparator<Partial>() {
+				public int compare(Partial a, Partial b) {
+					return Double.compare(b.score(), a.score());
+				}
+			});
+			partialsPruned += beam.size() - beamWidth;
+			beam = new ArrayList<Partial>(beam.subList(0, beamWidth));
+		}
+		return beam;
+	}
 	
 	static ArrayList<String> combineSugg(ArrayList<String> sugg){
 		ArrayList<String> combo = new ArrayList<String>();
@@ -524,4 +535,52 @@ class Trigram{
 		return alternatives;
 	}
 	
-}
\ No newline at end of file
+}
+
+//a partial word in the createSugg beam
+class Partial{
+	//log probability weight of one edit against the misspelt word
+	static final double EDIT_WEIGHT = 10.0;
+	final String source;
+	final String word;
+	final double lmScore;
+	final int[] row; //edit distances from word to every prefix of source
+	final int edits;
+	public Partial(String source) {
+		this.source = source;
+		this.word = "";
+		this.lmScore = 0.0;
+		this.row = new int[source.length()+1];
+		for(int j=0; j<row.length; j++)
+			row[j] = j;
+		this.edits = 0;
+	}
+	private Partial(String source, String word, double lmScore, int[] row) {
+		this.source = source;
+		this.word = word;
+		this.lmScore = lmScore;
+		this.row = row;
+		int min = row[0];
+		for(int d : row)
+			min = Math.min(min, d);
+		this.edits = min;
+	}
+	//this partial with tail appended and the given transition score
+	public Partial extend(String tail, double lmScore) {
+		int[] prev = row;
+		for(int i=0; i<tail.length(); i++) {
+			char c = tail.charAt(i);
+			int[] cur = new int[prev.length];
+			cur[0] = prev[0] + 1;
+			for(int j=1; j<cur.length; j++) {
+				int cost = source.charAt(j-1) == c ? 0 : 1;
+				cur[j] = Math.min(Math.min(prev[j] + 1, cur[j-1] + 1), prev[j-1] + cost);
+			}
+			prev = cur;
+		}
+		return new Partial(source, word + tail, lmScore, prev);
+	}
+	public double score() {
+		return lmScore - EDIT_WEIGHT * edits;
+	}
+}
@@ -19,7 +19,7 @@ import java.util.logging.Logger;
 public class Model extends ErrorCorrector{
 
     public HashMap<String, Integer> trigramMap = new HashMap<>();
-    private final HashSet<String> wordlist = new HashSet<>();
+    private HashSet<String> wordlist = new HashSet<>();
     public final HashSet<String> dictionary = new HashSet<>(); //Stores words added by the user
     private String dictDatabas = ""; //to make writing back to file easier
 
@@ -102,12 +102,6 @@ public class Model extends ErrorCorrector{
      */
     private void initialize() {
         try {
-            InputStream wdlist = Isizulu_Spellchecker.class.getResourceAsStream("resources/wordlist2.txt");
-            InputStream tri = Isizulu_Spellchecker.class.getResourceAsStream("resources/trigrams2.txt");
-
-            BufferedReader wdReader = new BufferedReader(new InputStreamReader(wdlist));
-            BufferedReader trigramReader = new BufferedReader(new InputStreamReader(tri));
-
             File dict = new File("user_dictionary");
 
             // Load user dictionary if it exists
@@ -122,24 +116,14 @@ public class Model extends ErrorCorrector{
                 }
                 dictReader.close();
             }
-            
-            //Load the wordlist
-            line = wdReader.readLine();
-            while (line != null) {
-                wordlist.add(line.trim());
-                line = wdReader.readLine();
-            }
-            wdlist.close();
-
-            //Load the trigram
-            line = trigramReader.readLine();
-            String[] entry;
-            while (line != null) {
-                entry = line.split(" ");//trigram and frequency
-                trigramMap.put(entry[0], Integer.parseInt(entry[1]));
-                line = trigramReader.readLine();
-            }
-            tri.close();
+
+            //Load the wordlist and the trigrams, from model.snapshot when it is up to date
+            CorrectorSnapshot snap = CorrectorSnapshot.load(new File("model.snapshot"),
+                    CorrectorSnapshot.read(Isizulu_Spellchecker.class.getResourceAsStream("resources/trigrams2.txt")),
+                    CorrectorSnapshot.read(Isizulu_Spellchecker.class.getResourceAsStream("resources/wordlist2.txt")),
+                    new byte[0]);
+            wordlist = snap.wordSet();
+            trigramMap = snap.trigramMap(0);
 
         } catch (FileNotFoundException e) {
             System.out.println("File not found");
@@ -3,42 +3,20 @@ import java.io.*;
 public class Probabilities{
 	static String next = "";
 	static ArrayList<TriFreq> arrNext;
-	static TriNext tn;
 
-	public HashMap<String, TriNext> getProbMap() {
-		HashMap<String, TriNext> mapTri = new HashMap<String, TriNext>(); //hashmap to store TriNext object;
+	public TransitionTable getProbMap() {
+		File file = new File("probabilities.txt");
+		if(! file.exists()) {
+			System.out.println("The file probabilitites.txt does not exist.");
+			System.exit(0);
+		}
 		try {
-			File file = new File("probabilities.txt");
-			if(! file.exists()) {
-				System.out.println("The file probabilitites.txt does not exist.");
-				System.exit(0);
-			}
-			HashMap<String, Integer> map;  //hashmap to get frequency of a trigram
-			ArrayList<String> triArr;
-			Scanner sc = new Scanner(new FileInputStream(file), "UTF-8");
-			while(sc.hasNextLine()) {
-				String line = sc.nextLine();
-				triArr = new ArrayList<String>();
-				map = new HashMap<String, Integer>();
-				Scanner scTri = new Scanner(line);
-				String tri;
-				tri = scTri.next();
-				while(scTri.hasNext()) {
-					String tNext = scTri.next().trim();
-					int freq = scTri.nextInt();
-					triArr.add(tNext);
-					map.put(tNext, freq);
-				}
-				scTri.close();
-				TriNext tn = new TriNext(triArr, map);
-				mapTri.put(tri, tn);
-			}
-			sc.close();
+			return CorrectorSnapshot.parse(new byte[0], new byte[0], CorrectorSnapshot.read(file)).transitions();
 		}
 		catch(Exception e) {
 			e.printStackTrace();
 		}
-		return mapTri;
+		return new TransitionTable(new String[0], new int[0], new int[1], new int[0], new int[0]);
 	}
 	
 	static boolean upperCase(String s) {
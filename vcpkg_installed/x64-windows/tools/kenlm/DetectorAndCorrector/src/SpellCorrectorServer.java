@@ -0,0 +1,149 @@
+import java.io.*;
+import java.nio.charset.StandardCharsets;
+import java.util.*;
+
+/*
+ * Long-lived correction worker.
+ * Loads the corrector tables once and then answers requests over stdin/stdout,
+ * one JSON message per line:
+ *   request:  ["word1", "word2", ...]
+ *   response: [["candidate", ...], [...], ...]   (one list per word, same order)
+ * A malformed request is answered with {"error": "..."} and the worker keeps running.
+ */
+public class SpellCorrectorServer {
+    public static void main(String[] args) {
+        try {
+            BufferedReader reader = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+            PrintStream out = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+            // ErrorCorrector prints debugging lines to System.out, keep them off the protocol stream
+            System.setOut(System.err);
+
+            ErrorCorrector corrector = new ErrorCorrector();
+            corrector.initCorrector();
+
+            String line;
+            while ((line = reader.readLine()) != null) {
+                line = line.trim();
+                if (line.isEmpty())
+                    continue;
+                List<String> words;
+                try {
+                    words = parseStringArray(line);
+                } catch (IllegalArgumentException e) {
+                    out.println("{\"error\":" + quote(e.getMessage()) + "}");
+                    continue;
+                }
+
+                StringBuilder sb = new StringBuilder("[");
+                for (int i = 0; i < words.size(); i++) {
+                    if (i > 0) sb.append(',');
+                    String word = words.get(i);
+                    ArrayList<String> corrections = word.isEmpty() ? new ArrayList<String>() : corrector.correct(word);
+                    sb.append('[');
+                    for (int j = 0; j < corrections.size(); j++) {
+                        if (j > 0) sb.append(',');
+                        sb.append(quote(corrections.get(j)));
+                    }
+                    sb.append(']');
+                }
+                sb.append(']');
+                out.println(sb.toString());
+            }
+            System.err.println(ErrorCorrector.searchStats());
+        } catch (Exception e) {
+            System.err.println("Error: " + e.getMessage());
+            System.exit(1);
+        }
+    }
+
+    /*
+     * Parses a JSON array of strings, e.g. ["abc", "déf"]
+     */
+    static List<String> parseStringArray(String json) {
+        List<String> result = new ArrayList<String>();
+        int pos = skipSpace(json, 0);
+        if (pos >= json.length() || json.charAt(pos) != '[')
+            throw new IllegalArgumentException("expected a JSON array of strings");
+        pos = skipSpace(json, pos + 1);
+        if (pos < json.length() && json.charAt(pos) == ']')
+            return result;
+        while (true) {
+            if (pos >= json.length() || json.charAt(pos) != '"')
+                throw new IllegalArgumentException("expected a string at position " + pos);
+            StringBuilder sb = new StringBuilder();
+            pos++;
+            while (true) {
+                if (pos >= json.length())
+                    throw new IllegalArgumentException("unterminated string");
+                char c = json.charAt(pos++);
+                if (c == '"')
+                    break;
+                if (c != '\\') {
+                    sb.append(c);
+                    continue;
+                }
+                if (pos >= json.length())
+                    throw new IllegalArgumentException("unterminated escape");
+                char e = json.charAt(pos++);
+                switch (e) {
+                case '"': sb.append('"'); break;
+                case '\\': sb.append('\\'); break;
+                case '/': sb.append('/'); break;
+                case 'b': sb.append('\b'); break;
+                case 'f': sb.append('\f'); break;
+                case 'n': sb.append('\n'); break;
+                case 'r': sb.append('\r'); break;
+                case 't': sb.append('\t'); break;
+                case 'u':
+                    if (pos + 4 > json.length())
+                        throw new IllegalArgumentException("bad unicode escape");
+                    try {
+                        sb.append((char) Integer.parseInt(json.substring(pos, pos + 4), 16));
+                    } catch (NumberFormatException ex) {
+                        throw new IllegalArgumentException("bad unicode escape");
+                    }
+                    pos += 4;
+                    break;
+                default:
+                    throw new IllegalArgumentException("bad escape \\" + e);
+                }
+            }
+            result.add(sb.toString());
+            pos = skipSpace(json, pos);
+            if (pos >= json.length())
+                throw new IllegalArgumentException("unterminated array");
+            char c = json.charAt(pos);
+            if (c == ']')
+                return result;
+            if (c != ',')
+                throw new IllegalArgumentException("expected ',' or ']' at position " + pos);
+            pos = skipSpace(json, pos + 1);
+        }
+    }
+
+    static int skipSpace(String s, int pos) {
+        while (pos < s.length() && Character.isWhitespace(s.charAt(pos)))
+            pos++;
+        return pos;
+    }
+
+    static String quote(String s) {
+        StringBuilder sb = new StringBuilder("\"");
+        for (int i = 0; i < s.length(); i++) {
+            char c = s.charAt(i);
+            switch (c) {
+            case '"': sb.append("\\\""); break;
+            case '\\': sb.append("\\\\"); break;
+            case '\n': sb.append("\\n"); break;
+            case '\r': sb.append("\\r"); break;
+            case '\t': sb.append("\\t"); break;
+            default:
+                if (c < 0x20)
+                    sb.append(String.format("\\u%04x", (int) c));
+                else
+                    sb.append(c);
+            }
+        }
+        return sb.append('"').toString();
+    }
+}
@@ -1,19 +1,215 @@
-import kenlm
+import multiprocessing
 import subprocess
-import json
 import os
+import re
+import sys
+
+import numpy as np
+
+# The shared scoring module lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 6)))
+
+from char_scorer import CharScorer
+from cascade_detector import CascadeDetector
+from correction_cache import CorrectionCache, DEFAULT_PATH as CORRECTION_CACHE_PATH, normalize, table_version
+from correction_worker import CorrectionPool
+from dawg import Dawg
+from dictionaries import LANGUAGE_DICTIONARIES
+from known_words import KnownWords
+from symspell_index import SymSpellIndex
+
+# Runs of letters; digits, punctuation and whitespace separate tokens
+TOKEN_RE = re.compile(r"[^\W\d_]+")
+
+
+def iter_chunks(source, chunk_size=1 << 16):
+    """Yield text chunks from a string, an open text file or an iterable of strings"""
+    if isinstance(source, str):
+        yield source
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        yield from source
+
+
+def tokenize_stream(chunks):
+    """
+    Yield (offset, token) for every token in a stream of text chunks.
+    Offsets are character offsets from the start of the stream; a token that
+    runs over a chunk boundary is held back until the next chunk arrives.
+    """
+    carry = ''
+    base = 0  # offset of the first character of carry
+    for chunk in chunks:
+        text = carry + chunk
+        pending = len(text)
+        for match in TOKEN_RE.finditer(text):
+            if match.end() == len(text):
+                pending = match.start()
+                break
+            yield base + match.start(), match.group()
+        carry = text[pending:]
+        base += pending
+    if carry:
+        yield base, carry
+
+
+def file_shards(path, shard_bytes=1 << 20):
+    """Split a file into (start, end) byte ranges that end on line boundaries"""
+    size = os.path.getsize(path)
+    shards = []
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + shard_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            shards.append((start, end))
+            start = end
+    return shards
+
+
+# Detector shared with forked check_files workers; set in the parent just before the pool forks
+_FORK_DETECTOR = None
+
+
+def _check_shard(task):
+    """Check one byte range of a file, returns (characters in shard, records)"""
+    path, start, end, flagged_only = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+    records = [tuple(result) for result in _FORK_DETECTOR.check_stream(text, flagged_only=flagged_only)]
+    return len(text), records
+
+
+class TokenResult:
+    """
+    One checked token. Unpacks as (offset, token, score, flagged);
+    corrections are only requested from the corrector when first read.
+    """
+    __slots__ = ('offset', 'token', 'score', 'flagged', '_detector', '_corrections')
+
+    def __init__(self, offset, token, score, flagged, detector):
+        self.offset = offset
+        self.token = token
+        self.score = score
+        self.flagged = flagged
+        self._detector = detector
+        self._corrections = None
+
+    def __iter__(self):
+        return iter((self.offset, self.token, self.score, self.flagged))
+
+    def __repr__(self):
+        return f"TokenResult({self.offset}, {self.token!r}, {self.score:.2f}, {self.flagged})"
+
+    @property
+    def corrections(self):
+        if not self.flagged:
+            return None
+        if self._corrections is None:
+            self._corrections = self._detector.get_corrections(self.token) or {}
+        return self._corrections or None
+
+
+class BatchPlan:
+    """
+    Distinct forms of a batch of tokens. Word frequencies are Zipfian, so a
+    batch has far fewer distinct forms than tokens: each form is looked up,
+    scored and corrected once and the answers are fanned back out to every
+    occurrence through codes.
+    """
+    __slots__ = ('forms', 'codes')
+
+    def __init__(self, tokens):
+        index = {}
+        self.codes = np.fromiter((index.setdefault(token, len(index)) for token in tokens),
+                                 dtype=np.intp, count=len(tokens))
+        self.forms = list(index)  # distinct tokens, in order of first occurrence
+
+    def __len__(self):
+        return len(self.codes)
+
+    def ratio(self):
+        """Tokens per distinct form"""
+        return len(self.codes) / len(self.forms) if self.forms else 1.0
+
 
 class SpellErrorDetector:
-    def __init__(self, model_path, threshold=-10):
+    def __init__(self, model_path, threshold=-10, correction_workers=1, dictionaries=None, known_words=None,
+                 cascade=None, early_exit=False, char_floor=None, correction_cache=None):
+        """
+        Args:
+            dictionaries: Dictionary files behind suggest(), lexicon and the
+                          default known_words, default this model's language's
+                          dictionaries.LANGUAGE_DICTIONARIES entry. Without
+                          any, suggest() and the get_corrections fallback
+                          answer nothing.
+            known_words: Words accepted without scoring, as in Model.check: a
+                         KnownWords, a list of dictionary files, or False for
+                         none. By default the dictionaries, if there are any.
+            cascade: CascadeDetector that decides the out-of-vocabulary words
+                     with cheap stages first, or True for one calibrated for
+                     this model's language. By default every word is scored
+                     with the full model.
+            early_exit: Score words a character at a time and stop once the
+                        decision is known (CharScorer.below_threshold). This
+                        saves model lookups, but each character is a call
+                        from Python, so it only pays off with a slow model.
+            char_floor: With early_exit, also accept a word early once its
+                        remaining characters could not reach the threshold at
+                        this log10 probability each
+            correction_cache: CorrectionCache answering repeated get_corrections
+                              words without the worker, True for one preloaded
+                              from and saved to model_cache/corrections.json,
+                              or False for none. By default an in-memory cache.
+        """
         # Convert to absolute path
         self.model_path = os.path.abspath(model_path)
-        self.model = kenlm.LanguageModel(self.model_path)
+        self.language = os.path.basename(self.model_path).split('UModel')[0]
+        self.scorer = CharScorer(self.model_path)
+        self.model = self.scorer.model
         self.threshold = threshold
+        self.early_exit = early_exit
+        self.char_floor = char_floor
+
+        # the isiZulu lists say nothing about the other languages' words
+        self.dictionaries = LANGUAGE_DICTIONARIES.get(self.language) if dictionaries is None else dictionaries
+        if known_words is None:
+            known_words = self.dictionaries is not None and KnownWords.for_dictionaries(self.dictionaries)
+        elif known_words is not False and not hasattr(known_words, 'contains_many'):
+            known_words = KnownWords.for_dictionaries(known_words)
+        self.known_words = known_words or None
+
+        if cascade is True:
+            cascade = CascadeDetector.for_language(self.language, self.model_path, threshold, scorer=self.scorer)
+        self.cascade = cascade or None
+
+        # Deletion index behind suggest() and the automaton behind lexicon, loaded on first use
+        self._suggester = None
+        self._lexicon = None
         
-        # Set up Java classpath
-        self.java_classpath = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        # Correction JVMs are started on the first get_corrections call and reused afterwards
+        self.corrector = CorrectionPool(size=correction_workers, workdir=os.path.dirname(os.path.abspath(__file__)))
+        if correction_cache is None or correction_cache is True:
+            correction_cache = CorrectionCache(path=CORRECTION_CACHE_PATH if correction_cache else None)
+        self.correction_cache = correction_cache if correction_cache is not False else None
+        # digest of the corrector tables, computed on the first get_corrections call
+        self._table_version = None
+        # batches, tokens, distinct forms and distinct flagged forms checked so far, and the
+        # smallest and largest tokens per form of a batch; totals only, so a long-lived
+        # detector (spellcheck_service.py) does not grow with every batch
+        self.batch_totals = [0, 0, 0, 0]
+        self.batch_ratio_range = None
         
-        self._compile_java()
+        # Set up Java classpath; the Java sources are compiled before the first correction request
+        self.java_classpath = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        self._java_compiled = False
 
     def _compile_java(self):
         """Compile Java files if needed"""
@@ -23,7 +219,10 @@ class SpellErrorDetector:
             'BinarySearch.java',
             'Probabilities.java',
             'TriFreq.java',
-            'TriNext.java'
+            'TransitionTable.java',
+            'TrigramIndex.java',
+            'CorrectorSnapshot.java',
+            'SpellCorrectorServer.java'
         ]
         
         # Check if compilation is needed
@@ -44,95 +243,322 @@ class SpellErrorDetector:
 
     def score_word(self, word):
         """Score a word by breaking it into individual characters"""
-        char_sequence = " ".join(list(word.strip()))
-        return self.model.score(char_sequence, bos=True, eos=True)
+        return self.scorer.score(word)
+
+    def score_words(self, words):
+        """Score a batch of words, returns a NumPy array of scores"""
+        return self.scorer.score_many(words)
 
     def detect_error(self, word):
-        """Detect if a word is likely incorrect based on its score"""
-        score = self.score_word(word)
-        print(f"Word: {word}, Score: {score}, Threshold: {self.threshold}")
-        return score < self.threshold
+        """Detect if a word is likely incorrect based on its score; dictionary words never are"""
+        if self.known_words is not None and word in self.known_words:
+            return False
+        if self.cascade is not None:
+            return bool(self.cascade.detect_many([word])[0][0])
+        if self.early_exit:
+            return self.scorer.below_threshold(word, self.threshold, self.char_floor)
+        return self.score_word(word) < self.threshold
+
+    def check_stream(self, source, chunk_size=1 << 16, batch_size=8192, flagged_only=False, corrections=False):
+        """
+        Check a whole document without loading it into memory.
+
+        Args:
+            source: Text, an open text file, or an iterable of text chunks
+            chunk_size: Characters read from a file per chunk
+            batch_size: Tokens planned together; repeated forms within a
+                        batch are only looked up, scored and corrected once
+            flagged_only: Only yield tokens scoring below the threshold
+            corrections: Correct the distinct flagged forms of each batch in
+                         one worker round trip, so TokenResult.corrections
+                         is already filled in
+
+        Yields:
+            TokenResult records in document order. Dictionary words are not
+            scored; their score is NaN and they are never flagged. With a
+            cascade, words it decides before the full model also score NaN,
+            and so does every word with early_exit.
+        """
+        batch = []
+        for offset, token in tokenize_stream(iter_chunks(source, chunk_size)):
+            batch.append((offset, token))
+            if len(batch) >= batch_size:
+                yield from self._check_batch(batch, flagged_only, corrections)
+                batch = []
+        if batch:
+            yield from self._check_batch(batch, flagged_only, corrections)
+
+    def check_many(self, texts, flagged_only=False, corrections=False):
+        """
+        Check several short texts, scoring the tokens of all of them together.
+
+        Returns:
+            One list of TokenResult per text, offsets relative to that text
+        """
+        batch, owners = [], []
+        for i, text in enumerate(texts):
+            for offset, token in tokenize_stream(iter_chunks(text)):
+                batch.append((offset, token))
+                owners.append(i)
+        results = [[] for _ in texts]
+        if batch:
+            for owner, result in zip(owners, self._check_batch(batch, False, corrections)):
+                if result.flagged or not flagged_only:
+                    results[owner].append(result)
+        return results
+
+    def check_files(self, paths, jobs=None, flagged_only=False, shard_bytes=1 << 20):
+        """
+        Check many files across several processes.
+
+        The model already loaded in this process is inherited copy-on-write by
+        forked workers, so no worker re-reads the ARPA file. Files are split into
+        line-aligned shards, and results come back in input order.
+
+        Args:
+            paths: Files to check (UTF-8 text)
+            jobs: Worker processes, defaults to the CPU count. Platforms without
+                  fork (Windows) always check in this process.
+            flagged_only: Only return tokens scoring below the threshold
+            shard_bytes: Approximate size of the work unit sent to a worker
+
+        Yields:
+            (path, records) per file, records being (offset, token, score, flagged) tuples
+        """
+        global _FORK_DETECTOR
+        paths = [os.fspath(path) for path in paths]
+        jobs = jobs or os.cpu_count() or 1
+        if jobs == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            for path in paths:
+                # no newline translation, so offsets match the byte-decoded shards of the fork path
+                with open(path, 'r', encoding='utf-8', newline='') as f:
+                    yield path, [tuple(result) for result in self.check_stream(f, flagged_only=flagged_only)]
+            return
+
+        tasks = []
+        for index, path in enumerate(paths):
+            for start, end in file_shards(path, shard_bytes):
+                tasks.append((index, (path, start, end, flagged_only)))
+
+        _FORK_DETECTOR = self
+        try:
+            with multiprocessing.get_context('fork').Pool(jobs) as pool:
+                shard_results = pool.imap(_check_shard, [task for _, task in tasks])
+                current, base, records = 0, 0, []
+                for (index, _), (length, shard_records) in zip(tasks, shard_results):
+                    while index > current:
+                        yield paths[current], records
+                        current, base, records = current + 1, 0, []
+                    # shard offsets are relative to the shard start, make them relative to the file
+                    records.extend((base + offset, token, score, flagged)
+                                   for offset, token, score, flagged in shard_records)
+                    base += length
+                while current < len(paths):
+                    yield paths[current], records
+                    current, base, records = current + 1, 0, []
+        finally:
+            _FORK_DETECTOR = None
+
+    def _check_batch(self, batch, flagged_only, corrections=False):
+        plan = BatchPlan([token for _, token in batch])
+        forms = plan.forms
+        flagged, scores = self.check_words(forms)
+        wrong = np.nonzero(flagged)[0].tolist()
+        for i, n in enumerate((1, len(plan), len(forms), len(wrong))):
+            self.batch_totals[i] += n
+        if forms:
+            low, high = self.batch_ratio_range or (plan.ratio(), plan.ratio())
+            self.batch_ratio_range = (min(low, plan.ratio()), max(high, plan.ratio()))
+
+        answers = [None] * len(forms)
+        if corrections and wrong:
+            # the corrector lowercases the first letter, so forms differing only there share one answer
+            by_key = {}
+            for i in wrong:
+                by_key.setdefault(normalize(forms[i]), []).append(i)
+            for indexes, answer in zip(by_key.values(), self.get_corrections_many([forms[i[0]] for i in by_key.values()])):
+                for i in indexes:
+                    answers[i] = answer or {}
+
+        scores, flagged = scores.tolist(), flagged.tolist()
+        for (offset, token), code in zip(batch, plan.codes.tolist()):
+            if flagged[code] or not flagged_only:
+                result = TokenResult(offset, token, scores[code], flagged[code], self)
+                result._corrections = answers[code]
+                yield result
+
+    def check_words(self, words):
+        """
+        Decide a batch of words without tokenizing.
+
+        Returns:
+            (flagged, scores) NumPy arrays; dictionary words and words decided
+            without a full score have NaN scores
+        """
+        if self.known_words is None:
+            return self._decide(words)
+        # only out-of-vocabulary words reach the model
+        flagged = np.zeros(len(words), dtype=bool)
+        scores = np.full(len(words), np.nan)
+        unknown = np.nonzero(~self.known_words.contains_many(words))[0]
+        if len(unknown):
+            flagged[unknown], scores[unknown] = self._decide([words[i] for i in unknown.tolist()])
+        return flagged, scores
+
+    def _decide(self, words):
+        """(flagged, scores) of a batch, through the cascade when there is one"""
+        if self.cascade is not None:
+            return self.cascade.detect_many(words)
+        if self.early_exit:
+            # the decision without a full score
+            return self.scorer.below_threshold_many(words, self.threshold, self.char_floor), np.full(len(words), np.nan)
+        scores = self.score_words(words)
+        return scores < self.threshold, scores
+
+    @property
+    def suggester(self):
+        """SymSpellIndex of the dictionaries, None when the language has none"""
+        if self._suggester is None and self.dictionaries is not None:
+            self._suggester = SymSpellIndex.for_dictionaries(self.dictionaries)
+        return self._suggester
+
+    @property
+    def lexicon(self):
+        """
+        Dawg of the dictionaries: membership (word in detector.lexicon),
+        prefix enumeration (iter_prefix) and fuzzy search (fuzzy). It answers
+        get_corrections when the correction workers cannot run. None when the
+        language has no dictionaries.
+        """
+        if self._lexicon is None and self.dictionaries is not None:
+            self._lexicon = Dawg.for_dictionaries(self.dictionaries)
+        return self._lexicon
+
+    def lexicon_corrections(self, word, k=5, max_distance=2):
+        """
+        Up to k dictionary words within max_distance edits of word, from the
+        lexicon's fuzzy search, closest first and then by model score
+        """
+        if self.lexicon is None:
+            return []
+        found = self.lexicon.fuzzy(normalize(word), max_distance)
+        if not found:
+            return []
+        scores = self.score_words([candidate for candidate, _ in found])
+        order = sorted(range(len(found)), key=lambda i: (found[i][1], -scores[i]))
+        return [found[i][0] for i in order[:k]]
+
+    def suggest(self, word, k=5):
+        """
+        Up to k in-process corrections for word, best first, from the
+        dictionary deletion index ranked with this detector's model.
+        No correction worker is involved; a language without dictionaries
+        gets no suggestions.
+        """
+        if self.suggester is None:
+            return []
+        return [candidate for candidate, _, _ in self.suggester.suggest(normalize(word), k, self.scorer)]
 
     def get_corrections(self, word):
+        return self.get_corrections_many([word])[0]
+
+    def get_corrections_many(self, words):
+        """
+        Correct a batch of words in one round trip to the correction worker;
+        words already in the correction cache, and repeats within the batch,
+        are answered without it
+        """
+        words = list(words)
+        candidates = [None] * len(words)
+        missing = {}  # key -> indexes of the words waiting for it
+        if self.correction_cache is not None:
+            if self._table_version is None:
+                self._table_version = table_version()
+            for i, word in enumerate(words):
+                key = self.correction_cache.key(self.language, self._table_version, word)
+                if key in missing:
+                    missing[key].append(i)
+                    continue
+                candidates[i] = self.correction_cache.get(key)
+                if candidates[i] is None:
+                    missing[key] = [i]
+        else:
+            missing = {i: [i] for i in range(len(words))}
         try:
-            print(f"Attempting to get corrections for: {word}")
-
-            result = subprocess.run(
-                ['javac', 'SpellCorrectorMain.java'], 
-                capture_output=True,
-                text=True,
-                cwd=os.path.dirname(__file__)
-            )
-            
-            if result.returncode != 0:
-                print(f"Compilation Error: {result.stderr}")
-                return None
-                
-            result = subprocess.run(
-                ['java', 
-                 '-cp', '.', 
-                 'SpellCorrectorMain'],
-                input=word,
-                capture_output=True,
-                text=True,
-                cwd=os.path.dirname(__file__)  
-            )
-                
-            # Find the JSON array in the output
-            json_start = result.stdout.find('[')
-            json_end = result.stdout.rfind(']') + 1
-            if json_start == -1 or json_end == 0:
-                print("No JSON array found in output")
-                return None
-                
-            json_str = result.stdout[json_start:json_end]
-            corrections = json.loads(json_str)
-            
+            if missing:
+                if not self._java_compiled:
+                    self._compile_java()
+                    self._java_compiled = True
+                keys = list(missing)
+                answers = self.corrector.correct_many([words[missing[key][0]] for key in keys])
+                for key, corrections in zip(keys, answers):
+                    if self.correction_cache is not None:
+                        self.correction_cache.put(key, corrections)
+                    for i in missing[key]:
+                        candidates[i] = corrections
+        except Exception as e:
+            # no JVM (or a failed worker): answer from the dictionary automaton, without caching
+            # the answers under the Java tables' version
+            print(f"Error getting corrections: {e}; using the dictionary automaton")
+            for key, indexes in missing.items():
+                corrections = self.lexicon_corrections(words[indexes[0]])
+                for i in indexes:
+                    candidates[i] = corrections
+        results = []
+        for corrections in candidates:
             if corrections:
-                return {
+                results.append({
                     'most_likely': corrections[0],
-                    'candidates': corrections
-                }
-            return None
-            
-        except Exception as e:
-            print(f"Error getting corrections: {e}")
-            return None
+                    'candidates': list(corrections)
+                })
+            else:
+                results.append(None)
+        return results
 
-def process_text(text, model_path="isiZuluUModel.arpa"):
+    def planner_report(self):
+        """Tokens per distinct form over the batches checked so far"""
+        batches, tokens, forms, flagged = self.batch_totals
+        if not batches:
+            return "Batch planner: no batches"
+        low, high = self.batch_ratio_range or (1.0, 1.0)
+        return (f"Batch planner: {batches} batches, {tokens} tokens, {forms} distinct forms "
+                f"({tokens / max(forms, 1):.2f} tokens per form; per batch min {low:.2f}, "
+                f"max {high:.2f}), {flagged} distinct flagged forms")
 
-    abs_model_path = os.path.abspath(model_path)
-    
-    detector = SpellErrorDetector(abs_model_path, threshold=-11)
-    words = text.split()
-    
-    for word in words:
+    def prefilter_report(self):
+        """Hit rate of the known-word filter and the model time it saved"""
+        if self.known_words is None:
+            return "Known-word filter: off"
+        return self.known_words.report(self.scorer.seconds / max(self.scorer.words_scored, 1))
 
-        score = detector.score_word(word)
-        is_incorrect = detector.detect_error(word)
-        
-        print(f"\nChecking word: {word}")
-        print(f"Score: {score:.2f}")
-        print(f"Threshold: {detector.threshold}")
-        print(f"Status: {'Incorrect' if is_incorrect else 'Correct'} spelling")
+    def close(self):
+        """Shut down the correction workers and save the correction cache when it has a file"""
+        self.corrector.close()
+        if self.correction_cache is not None:
+            self.correction_cache.save()
+
+def process_text(text, model_path="isiZuluUModel.arpa", detector=None):
+    """Check every word of text, returns a list of (TokenResult, corrections) for the misspelled ones"""
+    if detector is None:
+        abs_model_path = os.path.abspath(model_path)
+        detector = SpellErrorDetector(abs_model_path, threshold=-11)
+    
+    found = []
+    for result in detector.check_stream(text, flagged_only=True, corrections=True):
+        print(f"\nFound incorrect spelling: {result.token} at {result.offset} (score {result.score:.2f})")
+        corrections = result.corrections
         
-        if is_incorrect:
-            print(f"\nFound incorrect spelling: {word}")
-            corrections = detector.get_corrections(word)
-            
-            if corrections:
-                print(f"Most likely correction: {corrections['most_likely']}")
-                print("Other possible corrections:")
+        if corrections:
+            print(f"Most likely correction: {corrections['most_likely']}")
+            print("Other possible corrections:")
 
-                for i, candidate in enumerate(corrections['candidates'][:3], 1):
-                    print(f"{i}. {candidate}")
-                return corrections
-            else:
-                print("No corrections found")
-                return None
+            for i, candidate in enumerate(corrections['candidates'][:3], 1):
+                print(f"{i}. {candidate}")
         else:
-            print(f"Word '{word}' is correctly spelled")
-            return None
+            print("No corrections found")
+        found.append((result, corrections))
+    
+    return found
 
 if __name__ == "__main__":
     test_cases = [
@@ -167,11 +593,13 @@ if __name__ == "__main__":
     
     total_cases = len(test_cases)
     successful_cases = 0
+    detector = SpellErrorDetector(model_path, threshold=-11)
     
     for incorrect, expected in test_cases:
         print(f"\nChecking: {incorrect}")
         print(f"Expected correction: {expected}")
-        corrections = process_text(incorrect, model_path)
+        found = process_text(incorrect, model_path, detector)
+        corrections = found[0][1] if found else None
         
         if corrections:
             most_likely = corrections['most_likely']
@@ -195,4 +623,5 @@ if __name__ == "__main__":
     print(f"Spell Checker Performance Summary:")
     print(f"Total test cases: {total_cases}")
     print(f"Successful first-choice corrections: {successful_cases}")
-    print(f"Success rate: {success_rate:.2f}%")
\ No newline at end of file
+    print(f"Success rate: {success_rate:.2f}%")
+    detector.close()
\ No newline at end of file
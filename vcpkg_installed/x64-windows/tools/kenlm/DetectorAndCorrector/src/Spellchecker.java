@@ -10,6 +10,8 @@ import org.apache.poi.xwpf.usermodel.XWPFRun;
 
 import javax.swing.*;
 import javax.swing.border.LineBorder;
+import javax.swing.event.DocumentEvent;
+import javax.swing.event.DocumentListener;
 import javax.swing.filechooser.FileFilter;
 import javax.swing.text.*;
 import javax.swing.text.Highlighter.HighlightPainter;
@@ -19,7 +21,15 @@ import java.awt.event.MouseEvent;
 import java.io.*;
 import java.util.ArrayList;
 import java.util.Collections;
+import java.util.HashMap;
+import java.util.IdentityHashMap;
+import java.util.LinkedHashSet;
 import java.util.List;
+import java.util.Map;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.ThreadFactory;
 import java.util.logging.Level;
 import java.util.logging.Logger;
 
@@ -36,9 +46,7 @@ public class Spellchecker extends javax.swing.JFrame {
     boolean language = true;
 
     //Markers
-    int sentNo = 0;//Which sentence
-    int wordNo = 0;//Which word in a sentence
-    int pos = 0; //The word position in the text area
+    int pos = 0; //Where stepping to the next error resumes in the text
     boolean endOfText = false;
     boolean highlightSet = false; //Used to clear text area
 
@@ -46,12 +54,46 @@ public class Spellchecker extends javax.swing.JFrame {
     ArrayList<String> once = new ArrayList<>();
     ArrayList<String> all = new ArrayList<>();
 
+    //check-as-you-type: the session follows the text pane's edits, its errors are highlighted
+    CheckSession session;
+    HighlightPainter errorPainter = new DefaultHighlighter.DefaultHighlightPainter(new Color(255, 210, 210));
+    IdentityHashMap<CheckSession.Token, Object> errorHighlights = new IdentityHashMap<>();
+
+    //checking and corrections run on one background thread so the window stays responsive;
+    //Model keeps its working state in static fields, so every call into it holds its lock
+    static final int HIGHLIGHT_BATCH = 200; //words decided per published batch of highlights
+    ExecutorService background = Executors.newSingleThreadExecutor(new ThreadFactory() {
+        public Thread newThread(Runnable r) {
+            Thread thread = new Thread(r, "spellcheck");
+            thread.setDaemon(true);
+            return thread;
+        }
+    });
+    CheckWorker checkWorker;
+    SuggestionWorker suggestionWorker;
+    Runnable afterCheck; //button action waiting for the check to decide every word
+    ConcurrentHashMap<String, ArrayList<String>> suggestionCache = new ConcurrentHashMap<>();
+
     /**
      * Creates new form Spell checker
      */
     public Spellchecker() {
         m = new Model();
         initComponents();
+        watchDocument();
+        //JEditorPane.read installs a new document
+        textPane.addPropertyChangeListener("document", new java.beans.PropertyChangeListener() {
+            public void propertyChange(java.beans.PropertyChangeEvent evt) {
+                watchDocument();
+            }
+        });
+        //work out the suggestions for the errors that scroll into view
+        jScrollPane1.getViewport().addChangeListener(new javax.swing.event.ChangeListener() {
+            public void stateChanged(javax.swing.event.ChangeEvent evt) {
+                if (checkWorker == null || checkWorker.isDone())
+                    precomputeSuggestions();
+            }
+        });
         FileFilter docFilter = new MyCustomFilter(".docx", "Microsoft Word Documents");
         FileFilter txtFilter = new MyCustomFilter(".txt", "Text Documents");
 
@@ -521,92 +563,13 @@ public class Spellchecker extends javax.swing.JFrame {
             }
             instruction.setForeground(Color.red);
             return;
-        } else if (noErrors()) {
-            if (language) {
-                instruction.setText("No immediate errors detected!");
-            } else {
-                instruction.setText("Akukho maphutha atholakele");
-            }
-            instruction.setForeground(Color.BLUE);
-            return;
-        } else {
-            if (language) {
-                instruction.setText("Double click on incorrect word to view corrections.");
-            } else {
-                instruction.setText("Ufuna ukwenzani ngaleli phutha?");
-            }
-            instruction.setForeground(Color.BLUE);
-            pos = 0;
-            wordNo = 0;
-            sentNo = 0;
-
         }
-
-        String[] sentences = text.split("\n");
-		String[] words;
-		int start = 0;
-		int end = 0;
-		boolean active = true;
-
-		//Input is just a sentence or word
-		if (sentences.length < 2) {
-		    words = text.split(" ");
-
-		    //iterate through words
-		    for (int i = wordNo; i < words.length; i++) {
-		        String word = words[i];
-		        if (!all.contains(word) && !m.check(word)) {//incorrect word
-		        	ArrayList<String> suggest = m.correct(word);
-		        	addSugg(word, suggest);
-		            start = text.indexOf(word, pos);
-		            end = start + word.length();
-		            doc.setCharacterAttributes(start, word.length(), fore_red, true);
-		            currentWord = text.substring(start, end);
-		            pos += word.length() + 1; //move to next word then stop
-		            wordNo += 1;
-		            break;
-		        }
-		        wordNo += 1;
-		        pos += word.length() + 1;
-		    }
-
-		    //Input is a two or more lines
-		} else {
-		    while (sentNo < sentences.length && active) {
-		        words = sentences[sentNo].split(" ");
-		        //iterate through words
-		        for (int i = wordNo; i < words.length; i++) {
-		            String word = words[i];
-		            if (!all.contains(word) && !m.check(word)) { //incorrect word
-		            	ArrayList<String> suggest = m.correct(word);
-			        	addSugg(word, suggest);
-		                start = text.indexOf(word, pos);
-		                end = start + word.length();
-		                //need to change the highlighter to hyperlink of text
-		             
-		                start = text.indexOf(word, pos);
-		                end = start + word.length();
-		                doc.setCharacterAttributes(start, word.length(), fore_red, true);
-		                currentWord = text.substring(start, end);
-		                pos += word.length() + 1; //move to next word then stop
-		                wordNo += 1;
-		                active = false;
-		                break;
-		            }
-		            wordNo += 1;
-		            pos += word.length() + 1;
-		        }
-
-		        //Jump to next sentence
-		        if (wordNo >= words.length) {
-		            wordNo = 0;
-		            sentNo++;
-		        }
-		    }
-
-		}
-        highlightSet = true;
-
+        //the first error is only known once every word before it is decided
+        whenChecked(new Runnable() {
+            public void run() {
+                runChecked();
+            }
+        });
     }//GEN-LAST:event_runActionPerformed
     public void addSugg(String word, ArrayList<String> arr) {
     	Collections.sort(arr, Collections.reverseOrder());
@@ -720,11 +683,6 @@ public class Spellchecker extends javax.swing.JFrame {
         Style defaultStyle = StyleContext.getDefaultStyleContext().
         		getStyle(StyleContext.DEFAULT_STYLE);
         doc.setCharacterAttributes(0, doc.getLength(), defaultStyle, true); 
-        String[] sentences = text.split("\n");
-        String[] words;
-		int start = 0;
-		int end = 0;
-		boolean active = true;
 
 		if (text.length() == 0) {
 		    if (language) {
@@ -742,7 +700,7 @@ public class Spellchecker extends javax.swing.JFrame {
 		    }
 		    instruction.setForeground(Color.red);
 		    return;
-		} else if (pos >= text.length()) {
+		} else if (pos >= session.length()) {
 		    if(language)
 		        instruction.setText("You reached the end of your text. Click run to check again");
 		    else
@@ -753,66 +711,7 @@ public class Spellchecker extends javax.swing.JFrame {
 		    once.add(currentWord);
 		}
 
-		//Input is just a sentence or word
-		if (sentences.length < 2) {
-		    words = text.split(" ");
-
-		    //iterate through words
-		    for (int i = wordNo; i < words.length; i++) {
-		        String word = words[i];
-		        if (!all.contains(word) && !m.check(word)) {//incorrect word
-		            start = text.indexOf(word, pos);
-		            end = start + word.length();
-		            doc.setCharacterAttributes(start, word.length(), fore_red, true);
-		            currentWord = text.substring(start, end);
-		            pos += word.length() + 1; //move to next word then stop
-		            wordNo += 1;
-		            break;
-		        }
-		        wordNo += 1;
-		        pos += word.length() + 1;
-		    }
-
-		    //Input is a two or more lines
-		} else {
-		    while (sentNo < sentences.length && active) {
-		        words = sentences[sentNo].split(" ");
-		        //iterate through words
-		        for (int i = wordNo; i < words.length; i++) {
-		            String word = words[i];
-		            if (!all.contains(word) && !m.check(word)) {
-		                start = text.indexOf(word, pos);
-		                end = start + word.length();
-		                doc.setCharacterAttributes(start, word.length(), fore_red, true);
-		                currentWord = text.substring(start, end);
-		                pos += word.length() + 1; //move to next word then stop
-		                wordNo += 1;
-		                active = false;
-		                break;
-		            }
-		            wordNo += 1;
-		            pos += word.length() + 1;
-
-		        }
-
-		        //Jump to next sentence
-		        if (wordNo >= words.length) {
-		            wordNo = 0;
-		            sentNo++;
-		        }
-		    }
-
-		}
-        if (pos >= text.length() && sentNo >= sentences.length) {
-            if(language)
-                    instruction.setText("You reached the end of your text. Click run to check again");
-                else
-                    instruction.setText("Usufike esiphethweni sombhalo wakho. Cofa usebenzisa ukuze uhlole futhi");
-            instruction.setForeground(Color.BLUE);
-            currentWord = "";
-            return;
-        }
-        highlightSet = true;
+		stepOn();
     }//GEN-LAST:event_ignoreOnceActionPerformed
 
     private void ignoreAllActionPerformed(java.awt.event.ActionEvent evt) {//GEN-FIRST:event_ignoreAllActionPerformed
@@ -821,11 +720,6 @@ public class Spellchecker extends javax.swing.JFrame {
         Style defaultStyle = StyleContext.getDefaultStyleContext().
         		getStyle(StyleContext.DEFAULT_STYLE);
         doc.setCharacterAttributes(0, doc.getLength(), defaultStyle, true); 
-        String[] sentences = text.split("\n");
-        String[] words;
-		int start = 0;
-		int end = 0;
-		boolean active = true;
 
 		if (text.length() == 0) {
 		    if (language) {
@@ -843,7 +737,7 @@ public class Spellchecker extends javax.swing.JFrame {
 		    }
 		    instruction.setForeground(Color.red);
 		    return;
-		} else if (pos >= text.length()) {
+		} else if (pos >= session.length()) {
 		    if(language)
 		        instruction.setText("You reached the end of your text. Click run to check again");
 		    else
@@ -852,73 +746,17 @@ public class Spellchecker extends javax.swing.JFrame {
 		    if (highlightSet) {
 		        if (!all.contains(currentWord)) {
 		            all.add(currentWord);
+		            showDiff(session.recheck(currentWord));
 		        }
 		        highlightSet = false;
 		    }
 		    return;
 		} else {
 		    all.add(currentWord);
+		    showDiff(session.recheck(currentWord));
 		}
 
-		//Input is just a sentence or word
-		if (sentences.length < 2) {
-		    words = text.split(" ");
-
-		    //iterate through words
-		    for (int i = wordNo; i < words.length; i++) {
-		        String word = words[i];
-		        if (!all.contains(word) && !m.check(word)) {//incorrect word
-		            start = text.indexOf(word, pos);
-		            end = start + word.length();
-		            doc.setCharacterAttributes(start, word.length(), fore_red, true);
-		            currentWord = text.substring(start, end);
-		            pos += word.length() + 1; //move to next word then stop
-		            wordNo += 1;
-		            break;
-		        }
-		        wordNo += 1;
-		        pos += word.length() + 1;
-		    }
-
-		    //Input is a two or more lines
-		} else {
-		    while (sentNo < sentences.length && active) {
-		        words = sentences[sentNo].split(" ");
-		        //iterate through words
-		        for (int i = wordNo; i < words.length; i++) {
-		            String word = words[i];
-		            if (!all.contains(word) && !m.check(word)) {
-		                start = text.indexOf(word, pos);
-		                end = start + word.length();
-		                doc.setCharacterAttributes(start, word.length(), fore_red, true);
-		                currentWord = text.substring(start, end);
-		                pos += word.length() + 1; //move to next word then stop
-		                wordNo += 1;
-		                active = false;
-		                break;
-		            }
-		            wordNo += 1;
-		            pos += word.length() + 1;
-		        }
-
-		        //Jump to next sentence
-		        if (wordNo >= words.length) {
-		            wordNo = 0;
-		            sentNo++;
-		        }
-		    }
-
-		}
-        if (pos >= text.length() && sentNo >= sentences.length) {
-            if(language)
-                    instruction.setText("You reached the end of your text. Click run to check again");
-                else
-                    instruction.setText("Usufike esiphethweni sombhalo wakho. Cofa usebenzisa ukuze uhlole futhi");
-            instruction.setForeground(Color.BLUE);
-            currentWord = "";
-            return;
-        }
-        highlightSet = true;
+		stepOn();
     }//GEN-LAST:event_ignoreAllActionPerformed
 
     private void addActionPerformed(java.awt.event.ActionEvent evt) {//GEN-FIRST:event_addActionPerformed
@@ -927,11 +765,6 @@ public class Spellchecker extends javax.swing.JFrame {
         Style defaultStyle = StyleContext.getDefaultStyleContext().
         		getStyle(StyleContext.DEFAULT_STYLE);
         doc.setCharacterAttributes(0, doc.getLength(), defaultStyle, true); 
-        String[] sentences = text.split("\n");
-        String[] words;
-		int start = 0;
-		int end = 0;
-		boolean active = true;
 
 		if (text.length() == 0) {
 		    if (language) {
@@ -949,7 +782,7 @@ public class Spellchecker extends javax.swing.JFrame {
 		    }
 		    instruction.setForeground(Color.red);
 		    return;
-		} else if (pos >= text.length()) {
+		} else if (pos >= session.length()) {
 		    if(language)
 		        instruction.setText("You reached the end of your text. Click run to check again");
 		    else
@@ -957,73 +790,17 @@ public class Spellchecker extends javax.swing.JFrame {
 		    instruction.setForeground(Color.BLUE);
 		    if (highlightSet) {//one word text
 
-		        m.addWord(currentWord);
+		        addToDictionary(currentWord);
+		        showDiff(session.recheck(currentWord, true));
 		        highlightSet = false;
 		    }
 		    return;
 		} else {
-		    m.addWord(currentWord);//Writes the word to the user's dictionary
+		    addToDictionary(currentWord);//Writes the word to the user's dictionary
+		    showDiff(session.recheck(currentWord, true));
 		}
 
-		//Input is just a sentence or word
-		if (sentences.length < 2) {
-		    words = text.split(" ");
-
-		    //iterate through words
-		    for (int i = wordNo; i < words.length; i++) {
-		        String word = words[i];
-		        if (!all.contains(word) && !m.check(word)) {//incorrect word
-		            start = text.indexOf(word, pos);
-		            end = start + word.length();
-		            doc.setCharacterAttributes(start, word.length(), fore_red, true);
-		            currentWord = text.substring(start, end);
-		            pos += word.length() + 1; //move to next word then stop
-		            wordNo += 1;
-		            break;
-		        }
-		        wordNo += 1;
-		        pos += word.length() + 1;
-		    }
-
-		    //Input is a two or more lines
-		} else {
-		    while (sentNo < sentences.length && active) {
-		        words = sentences[sentNo].split(" ");
-		        //iterate through words
-		        for (int i = wordNo; i < words.length; i++) {
-		            String word = words[i];
-		            if (!all.contains(word) && !m.check(word)) {
-		                start = text.indexOf(word, pos);
-		                end = start + word.length();
-		                doc.setCharacterAttributes(start, word.length(), fore_red, true);
-		                currentWord = text.substring(start, end);
-		                pos += word.length() + 1; //move to next word then stop
-		                wordNo += 1;
-		                active = false;
-		                break;
-		            }
-		            wordNo += 1;
-		            pos += word.length() + 1;
-		        }
-
-		        //Jump to next sentence
-		        if (wordNo >= words.length) {
-		            wordNo = 0;
-		            sentNo++;
-		        }
-		    }
-
-		}
-        if (pos >= text.length() && sentNo >= sentences.length) {
-            if(language)
-                    instruction.setText("You reached the end of your text. Click run to check again");
-                else
-                    instruction.setText("Usufike esiphethweni sombhalo wakho. Cofa usebenzisa ukuze uhlole futhi");
-            instruction.setForeground(Color.BLUE);
-            currentWord = "";
-            return;
-        }
-        highlightSet = true;
+		stepOn();
     }//GEN-LAST:event_addActionPerformed
 
     private void closeActionPerformed(java.awt.event.ActionEvent evt) {//GEN-FIRST:event_closeActionPerformed
@@ -1048,8 +825,6 @@ public class Spellchecker extends javax.swing.JFrame {
                 instruction.setText("Umbhalo usucishiwe! Qala kabusha.");
             instruction.setForeground(Color.BLUE);
             pos = 0;
-            sentNo = 0;
-            wordNo = 0;
             textPane.setText("");
         }
 
@@ -1073,65 +848,13 @@ public class Spellchecker extends javax.swing.JFrame {
             }
             instruction.setForeground(Color.red);
             return;
-        } else if (noErrors()) {
-            if(language)
-                instruction.setText("No errors detected!");
-            else
-                instruction.setText("Akukho maphutha atholakele");
-            instruction.setForeground(Color.BLUE);
-            return;
-        } else {
-            if(language)
-                instruction.setText("Click Run to process errors one at a time");
-            else
-                instruction.setText("Cofa uSebenzisa ukuze ubheke iphutha ngalinye ngesikhathi");
-            instruction.setForeground(Color.BLUE);
         }
-        String[] sentences = text.split("\n");
-		String[] words;
-		int start;
-		//int end;
-		int position = 0;
-		int sentence = 0;
-
-		//Input is just a sentence or word
-		if (sentences.length < 2) {
-		    words = text.split(" ");
-
-		    //iterate through words
-		    for (String word : words) {
-		        //System.out.println(word);
-		        if (!all.contains(word) && !m.check(word)) {//incorrect word
-		            start = text.indexOf(word, position);
-		            //end = start + word.length();
-		            StyledDocument doc = textPane.getStyledDocument();
-  	                doc.setCharacterAttributes(start, word.length(), fore_red, true);
-		        }
-		        position += word.length() + 1;
-		    }
-		    //Input is a two or more lines
-		} else {
-		    while (sentence < sentences.length) {
-		        words = sentences[sentence].split(" ");
-		        //iterate through words
-		        for (String word : words) {
-		            if (!all.contains(word) && !m.check(word)) {
-		                start = text.indexOf(word, position);
-		                //end = start + word.length();
-		                StyledDocument doc = textPane.getStyledDocument();
-		                doc.setCharacterAttributes(start, word.length(), fore_red, true);
-		            }
-		            position += word.length() + 1;
-		        }
-		        sentence++;
-		    }
-
-		}
-        highlightSet = true;
-        //Resets globals used by other buttons such as ignoreAll
-        pos = 0;
-        sentNo = 0;
-        wordNo = 0;
+        //words still pending (just opened or pasted) would be missing from the errors
+        whenChecked(new Runnable() {
+            public void run() {
+                showAllErrors();
+            }
+        });
     }//GEN-LAST:event_checkAllActionPerformed
 
     private void openActionPerformed(java.awt.event.ActionEvent evt) {//GEN-FIRST:event_openActionPerformed        
@@ -1176,8 +899,6 @@ public class Spellchecker extends javax.swing.JFrame {
         }
         //Resets globals used by other buttons such as ignoreAll
         pos = 0;
-        sentNo = 0;
-        wordNo = 0;
     }//GEN-LAST:event_openActionPerformed
 
     private void exitActionPerformed(java.awt.event.ActionEvent evt) {//GEN-FIRST:event_exitActionPerformed
@@ -1366,32 +1087,363 @@ public class Spellchecker extends javax.swing.JFrame {
      * Checks for all errors
      */
     private boolean noErrors() {
-        String[] sentences = textPane.getText().split("\n");
-        String[] words;
-        int sentence = 0;
+        return session.errorCount() == 0 && session.isComplete();
+    }
 
-        if (sentences.length < 2) {
-            words = textPane.getText().split(" ");
-            //iterate through words
-            for (String word : words) {
-                if (!all.contains(word) && !m.check(word)) {//incorrect word
-                    return false;
+    /*
+     * Run, once every word is decided: highlights the first error
+     */
+    private void runChecked() {
+        if (noErrors()) {
+            if (language) {
+                instruction.setText("No immediate errors detected!");
+            } else {
+                instruction.setText("Akukho maphutha atholakele");
+            }
+            instruction.setForeground(Color.BLUE);
+            return;
+        }
+        if (language) {
+            instruction.setText("Double click on incorrect word to view corrections.");
+        } else {
+            instruction.setText("Ufuna ukwenzani ngaleli phutha?");
+        }
+        instruction.setForeground(Color.BLUE);
+        stepToError(0);
+        showSuggestions(currentWord);
+        highlightSet = true;
+    }
+
+    /*
+     * Check All, once every word is decided: the session knows every error and where it is
+     */
+    private void showAllErrors() {
+        if (noErrors()) {
+            if(language)
+                instruction.setText("No errors detected!");
+            else
+                instruction.setText("Akukho maphutha atholakele");
+            instruction.setForeground(Color.BLUE);
+            return;
+        }
+        if(language)
+            instruction.setText("Click Run to process errors one at a time");
+        else
+            instruction.setText("Cofa uSebenzisa ukuze ubheke iphutha ngalinye ngesikhathi");
+        instruction.setForeground(Color.BLUE);
+        StyledDocument doc = textPane.getStyledDocument();
+        for (CheckSession.Token token : session.errors()) {
+            doc.setCharacterAttributes(token.start, token.word.length(), fore_red, true);
+        }
+        highlightSet = true;
+        //Resets globals used by other buttons such as ignoreAll
+        pos = 0;
+    }
+
+    /*
+     * Ignore and Add: moves on to the next error after the current one, once every word is decided
+     */
+    private void stepOn() {
+        whenChecked(new Runnable() {
+            public void run() {
+                if (!stepToError(pos)) {
+                    if (language)
+                        instruction.setText("You reached the end of your text. Click run to check again");
+                    else
+                        instruction.setText("Usufike esiphethweni sombhalo wakho. Cofa usebenzisa ukuze uhlole futhi");
+                    instruction.setForeground(Color.BLUE);
+                    currentWord = "";
+                    return;
                 }
+                highlightSet = true;
             }
-            //Input is a two or more lines
+        });
+    }
+
+    /*
+     * Highlights the first error token at or after offset and makes it the current word
+     * returns: false if there is none
+     */
+    private boolean stepToError(int offset) {
+        CheckSession.Token token = session.nextError(offset);
+        if (token == null) {
+            pos = session.length();
+            return false;
+        }
+        textPane.getStyledDocument().setCharacterAttributes(token.start, token.word.length(), fore_red, true);
+        currentWord = token.word;
+        pos = token.end;
+        return true;
+    }
+
+    /*
+     * Runs action now if the session has decided every word, otherwise once the background check has
+     */
+    private void whenChecked(Runnable action) {
+        if (session.isComplete()) {
+            afterCheck = null;
+            action.run();
+            return;
+        }
+        afterCheck = action;
+        if (language) {
+            instruction.setText("Still checking the text...");
         } else {
-            while (sentence < sentences.length) {
-                words = sentences[sentence].split(" ");
-                //iterate through words
-                for (String word : words) {
-                    if (!all.contains(word) && !m.check(word)) {
-                        return false;
+            instruction.setText("Umbhalo usahlolwa...");
+        }
+        instruction.setForeground(Color.BLUE);
+    }
+
+    private void runWhenChecked() {
+        if (afterCheck != null && session.isComplete()) {
+            Runnable action = afterCheck;
+            afterCheck = null;
+            action.run();
+        }
+    }
+
+    /*
+     * Starts a check session on the text pane's current document and keeps it in step with the edits
+     */
+    private void watchDocument() {
+        final Document doc = textPane.getDocument();
+        String current = "";
+        try {
+            current = doc.getText(0, doc.getLength());
+        } catch (BadLocationException e) {
+            e.printStackTrace();
+        }
+        for (Object tag : errorHighlights.values()) {
+            textPane.getHighlighter().removeHighlight(tag);
+        }
+        errorHighlights.clear();
+        afterCheck = null;
+        //deferred: edits only tokenize, the new words are decided in the background
+        session = new CheckSession(new CheckSession.Checker() {
+            public boolean isCorrect(String word) {
+                return all.contains(word) || checkModel(word);
+            }
+        }, current, true);
+        scheduleCheck();
+
+        doc.addDocumentListener(new DocumentListener() {
+            public void insertUpdate(DocumentEvent e) {
+                if (doc != textPane.getDocument())
+                    return;
+                try {
+                    showDiff(session.edit(e.getOffset(), 0, doc.getText(e.getOffset(), e.getLength())));
+                } catch (BadLocationException ex) {
+                    ex.printStackTrace();
+                }
+                scheduleCheck();
+            }
+
+            public void removeUpdate(DocumentEvent e) {
+                if (doc != textPane.getDocument())
+                    return;
+                showDiff(session.edit(e.getOffset(), e.getLength(), ""));
+                scheduleCheck();
+            }
+
+            public void changedUpdate(DocumentEvent e) {
+                //style changes only, the text is the same
+            }
+        });
+    }
+
+    /*
+     * Updates the error highlights after an edit; highlights of untouched errors move with the text
+     */
+    private void showDiff(CheckSession.Diff diff) {
+        for (CheckSession.Token token : diff.removed) {
+            Object tag = errorHighlights.remove(token);
+            if (tag != null)
+                textPane.getHighlighter().removeHighlight(tag);
+        }
+        showErrors(diff.added);
+    }
+
+    private void showErrors(List<CheckSession.Token> errors) {
+        for (CheckSession.Token token : errors) {
+            try {
+                errorHighlights.put(token, textPane.getHighlighter().addHighlight(token.start, token.end, errorPainter));
+            } catch (BadLocationException e) {
+                e.printStackTrace();
+            }
+        }
+    }
+
+    private boolean checkModel(String word) {
+        synchronized (m) {
+            return m.check(word);
+        }
+    }
+
+    /*
+     * Adds word to the user's dictionary on the background thread, where the model's lock is free
+     * between checks; the caller marks it correct in the session meanwhile
+     */
+    private void addToDictionary(final String word) {
+        background.execute(new Runnable() {
+            public void run() {
+                synchronized (m) {
+                    m.addWord(word);
+                }
+                //suggestions come from the corrector's wordlist, which the user dictionary does not
+                //change, so only the added word's own entry is stale
+                suggestionCache.remove(word);
+            }
+        });
+    }
+
+    /*
+     * Shows the suggestions for a word: at once when they were worked out ahead of time (it was in
+     * view), otherwise once the background thread has, as the corrector's beam search is slow
+     */
+    private void showSuggestions(final String word) {
+        ArrayList<String> suggestions = suggestionCache.get(word);
+        if (suggestions != null) {
+            //addSugg sorts the list it is given
+            addSugg(word, new ArrayList<>(suggestions));
+            return;
+        }
+        background.execute(new Runnable() {
+            public void run() {
+                ArrayList<String> found = suggestionCache.get(word);
+                if (found == null) {
+                    synchronized (m) {
+                        found = m.correct(word);
                     }
+                    suggestionCache.put(word, found);
                 }
-                sentence++;
+                final ArrayList<String> copy = new ArrayList<>(found);
+                SwingUtilities.invokeLater(new Runnable() {
+                    public void run() {
+                        //the user may have moved on to another error meanwhile
+                        if (word.equals(currentWord))
+                            addSugg(word, copy);
+                    }
+                });
             }
+        });
+    }
+
+    /*
+     * Replaces any check still running with one for the session's undecided words
+     */
+    private void scheduleCheck() {
+        if (checkWorker != null)
+            checkWorker.cancel(false);
+        if (suggestionWorker != null)
+            suggestionWorker.cancel(false);
+        List<String> pending = session.pendingWords();
+        if (pending.isEmpty()) {
+            checkWorker = null;
+            runWhenChecked();
+            precomputeSuggestions();
+            return;
+        }
+        checkWorker = new CheckWorker(session, pending);
+        background.execute(checkWorker);
+    }
+
+    /*
+     * Starts working out the suggestions for the errors in view
+     */
+    private void precomputeSuggestions() {
+        if (suggestionWorker != null)
+            suggestionWorker.cancel(false);
+        Rectangle view = textPane.getVisibleRect();
+        int from = textPane.viewToModel(view.getLocation());
+        int to = textPane.viewToModel(new Point(view.x + view.width, view.y + view.height));
+        LinkedHashSet<String> words = new LinkedHashSet<>();
+        for (CheckSession.Token token = session.nextError(Math.max(from, 0)); token != null && token.start <= to;
+                token = session.nextError(token.end)) {
+            if (!suggestionCache.containsKey(token.word))
+                words.add(token.word);
+        }
+        if (words.isEmpty())
+            return;
+        suggestionWorker = new SuggestionWorker(new ArrayList<>(words));
+        background.execute(suggestionWorker);
+    }
+
+    /*
+     * Decides undecided words off the event dispatch thread and publishes the answers in batches,
+     * so the highlights appear progressively; a newer edit cancels it and starts another
+     */
+    private class CheckWorker extends SwingWorker<Void, HashMap<String, Boolean>> {
+        private final CheckSession target;
+        private final List<String> words;
+
+        CheckWorker(CheckSession target, List<String> words) {
+            this.target = target;
+            this.words = words;
+        }
+
+        protected Void doInBackground() {
+            HashMap<String, Boolean> batch = new HashMap<>();
+            for (String word : words) {
+                if (isCancelled())
+                    return null;
+                batch.put(word, checkModel(word));
+                if (batch.size() == HIGHLIGHT_BATCH) {
+                    publish(batch);
+                    batch = new HashMap<>();
+                }
+            }
+            if (!batch.isEmpty())
+                publish(batch);
+            return null;
+        }
+
+        protected void process(List<HashMap<String, Boolean>> batches) {
+            //answers depend only on the word, so a cancelled worker's are still good for the same document
+            if (target != session)
+                return;
+            for (HashMap<String, Boolean> batch : batches) {
+                for (Map.Entry<String, Boolean> entry : batch.entrySet()) {
+                    if (all.contains(entry.getKey()))
+                        entry.setValue(true);
+                }
+                showDiff(session.resolve(batch));
+            }
+            //done() can run before the last batches are processed
+            runWhenChecked();
+        }
+
+        protected void done() {
+            if (!isCancelled() && target == session) {
+                runWhenChecked();
+                precomputeSuggestions();
+            }
+        }
+    }
+
+    /*
+     * Works out suggestions for errors before they are clicked
+     */
+    private class SuggestionWorker extends SwingWorker<Void, Void> {
+        private final List<String> words;
+
+        SuggestionWorker(List<String> words) {
+            this.words = words;
+        }
+
+        protected Void doInBackground() {
+            for (String word : words) {
+                if (isCancelled())
+                    return null;
+                if (suggestionCache.containsKey(word))
+                    continue;
+                ArrayList<String> suggestions;
+                synchronized (m) {
+                    suggestions = m.correct(word);
+                }
+                suggestionCache.put(word, suggestions);
+            }
+            return null;
         }
-        return true;
     }
 
     private class PopupListener extends MouseAdapter {
@@ -0,0 +1,174 @@
+import java.util.*;
+
+/*
+ * Trigram transition frequencies from probabilities.txt in compressed sparse row form.
+ *
+ * Trigrams get integer ids (their rank in sorted order). The successors of
+ * trigram p are next[rowOffsets[p] .. rowOffsets[p+1]), sorted by id so a
+ * (prev, next) lookup is two binary searches, with their frequencies in the
+ * parallel counts array; byFreq holds the same positions ordered by
+ * descending frequency for iteration. This replaces a HashMap of per-trigram
+ * ArrayLists and HashMaps of boxed Integers.
+ *
+ * Parsed text is sorted and merged into this form once; corrector.snapshot
+ * stores the finished arrays, and the snapshot constructor takes them as they are.
+ */
+public class TransitionTable {
+	//log probability of a transition out of a trigram with no recorded successors
+	static final double UNSEEN = Math.log(0.5);
+
+	final String[] names;    //trigram for each id, sorted
+	final int[] rowOffsets;  //per id, start of its successors; length names.length+1
+	final int[] next;        //successor ids, ascending within each row
+	final int[] counts;      //frequency of each successor
+	final int[] byFreq;      //positions in next, each row by descending frequency
+	final int[] totals;      //sum of the counts in each row
+	final BitSet hasRow;     //ids that had a line in probabilities.txt
+
+	/*
+	 * Wraps arrays already in this table's form, as CorrectorSnapshot stores them
+	 */
+	TransitionTable(String[] names, int[] rowOffsets, int[] next, int[] counts, int[] byFreq, int[] totals, BitSet hasRow) {
+		this.names = names;
+		this.rowOffsets = rowOffsets;
+		this.next = next;
+		this.counts = counts;
+		this.byFreq = byFreq;
+		this.totals = totals;
+		this.hasRow = hasRow;
+	}
+
+	/*
+	 * Builds the table from rows of ids into pool: row r lists the successors of
+	 * pool[prevIds[r]] at nextIds[rowOffsets[r] .. rowOffsets[r+1]) with their counts.
+	 * A successor listed twice in a row keeps its last count.
+	 */
+	public TransitionTable(String[] pool, int[] prevIds, int[] rowOffsets, int[] nextIds, int[] counts) {
+		TreeSet<String> distinct = new TreeSet<String>();
+		for(int id : prevIds)
+			distinct.add(pool[id]);
+		for(int k=0; k<rowOffsets[prevIds.length]; k++)
+			distinct.add(pool[nextIds[k]]);
+		names = distinct.toArray(new String[0]);
+		int n = names.length;
+
+		//successor id -> count for every trigram that has a row
+		ArrayList<TreeMap<Integer, Integer>> rows = new ArrayList<TreeMap<Integer, Integer>>(Collections.nCopies(n, (TreeMap<Integer, Integer>) null));
+		hasRow = new BitSet(n);
+		int total = 0;
+		for(int r=0; r<prevIds.length; r++) {
+			int p = id(pool[prevIds[r]]);
+			TreeMap<Integer, Integer> row = new TreeMap<Integer, Integer>();
+			for(int k=rowOffsets[r]; k<rowOffsets[r+1]; k++)
+				row.put(id(pool[nextIds[k]]), counts[k]);
+			if(rows.get(p) != null)
+				total -= rows.get(p).size();
+			rows.set(p, row);
+			hasRow.set(p);
+			total += row.size();
+		}
+
+		this.rowOffsets = new int[n + 1];
+		this.next = new int[total];
+		this.counts = new int[total];
+		this.byFreq = new int[total];
+		this.totals = new int[n];
+		int k = 0;
+		for(int p=0; p<n; p++) {
+			this.rowOffsets[p] = k;
+			TreeMap<Integer, Integer> row = rows.get(p);
+			if(row == null)
+				continue;
+			for(Map.Entry<Integer, Integer> e : row.entrySet()) {
+				this.next[k] = e.getKey();
+				this.counts[k] = e.getValue();
+				this.totals[p] += e.getValue();
+				k++;
+			}
+		}
+		this.rowOffsets[n] = k;
+
+		for(int p=0; p<n; p++) {
+			final int start = this.rowOffsets[p];
+			Integer[] order = new Integer[this.rowOffsets[p+1] - start];
+			for(int i=0; i<order.length; i++)
+				order[i] = start + i;
+			Arrays.sort(order, new Comparator<Integer>() {
+				public int compare(Integer a, Integer b) {
+					int diff = TransitionTable.this.counts[b] - TransitionTable.this.counts[a];
+					return diff != 0 ? diff : a - b;
+				}
+			});
+			for(int i=0; i<order.length; i++)
+				this.byFreq[start + i] = order[i];
+		}
+	}
+
+	/*
+	 * Id of a trigram, or a negative number if it never occurs in the table
+	 */
+	public int id(String tri) {
+		return Arrays.binarySearch(names, tri);
+	}
+
+	/*
+	 * True if probabilities.txt had a line for prev
+	 */
+	public boolean hasRow(String prev) {
+		int p = id(prev);
+		return p >= 0 && hasRow.get(p);
+	}
+
+	//position of the (prev, next) transition in next/counts, or -1
+	private int find(String prev, String nextTri) {
+		int p = id(prev);
+		int n = id(nextTri);
+		if(p < 0 || n < 0)
+			return -1;
+		int pos = Arrays.binarySearch(next, rowOffsets[p], rowOffsets[p+1], n);
+		return pos < 0 ? -1 : pos;
+	}
+
+	public boolean contains(String prev, String nextTri) {
+		return find(prev, nextTri) >= 0;
+	}
+
+	/*
+	 * Frequency of nextTri following prev, 0 if it was never seen
+	 */
+	public int count(String prev, String nextTri) {
+		int pos = find(prev, nextTri);
+		return pos < 0 ? 0 : counts[pos];
+	}
+
+	/*
+	 * Add-one smoothed log probability that nextTri follows prev
+	 */
+	public double logProb(String prev, String nextTri) {
+		int p = id(prev);
+		if(p < 0 || !hasRow.get(p))
+			return UNSEEN;
+		int row = rowOffsets[p+1] - rowOffsets[p];
+		return Math.log((count(prev, nextTri) + 1.0) / (totals[p] + row + 1.0));
+	}
+
+	/*
+	 * Successors of prev, most frequent first
+	 */
+	public ArrayList<String> successors(String prev) {
+		ArrayList<String> result = new ArrayList<String>();
+		int p = id(prev);
+		if(p < 0)
+			return result;
+		for(int k=rowOffsets[p]; k<rowOffsets[p+1]; k++)
+			result.add(names[next[byFreq[k]]]);
+		return result;
+	}
+
+	/*
+	 * Number of distinct transitions
+	 */
+	public int size() {
+		return next.length;
+	}
+}
@@ -0,0 +1,141 @@
+import java.util.*;
+
+/*
+ * Neighbourhood index over the valid trigrams, used by ErrorCorrector.find().
+ *
+ * With the corrector's costs (delete 1, insert 1, replace 1, swap 2) two
+ * 3-character strings are within Damerau-Levenshtein distance 2 exactly when
+ * they agree in at least one position (at most two replacements, or one swap)
+ * or one is the other shifted by a character (a delete plus an insert). So the
+ * valid trigrams near any source trigram are the union of five inverted lists:
+ * same first, second or third character, first two characters equal to the
+ * source's last two, and last two characters equal to the source's first two.
+ * The lists hold positions in the sorted trigram array, so the union comes out
+ * already sorted, the way find() used to return it. Answers are memoized per
+ * source trigram. Sources that are not 3 characters long fall back to a scan.
+ */
+public class TrigramIndex {
+	static final int MEMO_SIZE = 20000;
+
+	private final String[] sorted; // valid trigrams in String order, duplicates kept
+	private final ArrayList<HashMap<Character, int[]>> byChar;
+	private final HashMap<String, int[]> byPrefix;
+	private final HashMap<String, int[]> bySuffix;
+	private final DamerauLevenshtein dl;
+	private final LinkedHashMap<String, String[]> memo;
+	int lookups = 0;
+	int memoHits = 0;
+
+	public TrigramIndex(List<String> trigrams, DamerauLevenshtein dl) {
+		this.dl = dl;
+		sorted = trigrams.toArray(new String[0]);
+		Arrays.sort(sorted);
+
+		ArrayList<HashMap<Character, ArrayList<Integer>>> charLists = new ArrayList<HashMap<Character, ArrayList<Integer>>>();
+		for(int p=0; p<3; p++)
+			charLists.add(new HashMap<Character, ArrayList<Integer>>());
+		HashMap<String, ArrayList<Integer>> prefixLists = new HashMap<String, ArrayList<Integer>>();
+		HashMap<String, ArrayList<Integer>> suffixLists = new HashMap<String, ArrayList<Integer>>();
+		for(int r=0; r<sorted.length; r++) {
+			String tri = sorted[r];
+			if(tri.length() != 3)
+				continue;
+			for(int p=0; p<3; p++)
+				add(charLists.get(p), tri.charAt(p), r);
+			add(prefixLists, tri.substring(0, 2), r);
+			add(suffixLists, tri.substring(1), r);
+		}
+
+		byChar = new ArrayList<HashMap<Character, int[]>>();
+		for(int p=0; p<3; p++)
+			byChar.add(toArrays(charLists.get(p)));
+		byPrefix = toArrays(prefixLists);
+		bySuffix = toArrays(suffixLists);
+
+		memo = new LinkedHashMap<String, String[]>(1024, 0.75f, true) {
+			protected boolean removeEldestEntry(Map.Entry<String, String[]> eldest) {
+				return size() > MEMO_SIZE;
+			}
+		};
+	}
+
+	private static <K> void add(HashMap<K, ArrayList<Integer>> lists, K key, int r) {
+		ArrayList<Integer> list = lists.get(key);
+		if(list == null) {
+			list = new ArrayList<Integer>();
+			lists.put(key, list);
+		}
+		list.add(r);
+	}
+
+	private static <K> HashMap<K, int[]> toArrays(HashMap<K, ArrayList<Integer>> lists) {
+		HashMap<K, int[]> arrays = new HashMap<K, int[]>(lists.size() * 2);
+		for(Map.Entry<K, ArrayList<Integer>> e : lists.entrySet()) {
+			ArrayList<Integer> list = e.getValue();
+			int[] arr = new int[list.size()];
+			for(int i=0; i<arr.length; i++)
+				arr[i] = list.get(i);
+			e.setValue(null);
+			arrays.put(e.getKey(), arr);
+		}
+		return arrays;
+	}
+
+	/*
+	 * Valid trigrams within distance 2 of source, sorted
+	 */
+	public ArrayList<String> neighbours(String source) {
+		lookups++;
+		String[] found = memo.get(source);
+		if(found != null)
+			memoHits++;
+		else {
+			found = source.length() == 3 ? union(source) : scan(source);
+			memo.put(source, found);
+		}
+		return new ArrayList<String>(Arrays.asList(found));
+	}
+
+	private String[] union(String source) {
+		int[][] lists = {
+			byChar.get(0).get(source.charAt(0)),
+			byChar.get(1).get(source.charAt(1)),
+			byChar.get(2).get(source.charAt(2)),
+			byPrefix.get(source.substring(1)),
+			bySuffix.get(source.substring(0, 2))
+		};
+		int total = 0;
+		for(int[] list : lists)
+			if(list != null)
+				total += list.length;
+		int[] ranks = new int[total];
+		int n = 0;
+		for(int[] list : lists) {
+			if(list != null) {
+				System.arraycopy(list, 0, ranks, n, list.length);
+				n += list.length;
+			}
+		}
+		Arrays.sort(ranks);
+		String[] result = new String[n];
+		int count = 0;
+		for(int i=0; i<n; i++) {
+			if(i == 0 || ranks[i] != ranks[i-1])
+				result[count++] = sorted[ranks[i]];
+		}
+		return Arrays.copyOf(result, count);
+	}
+
+	private String[] scan(String source) {
+		ArrayList<String> result = new ArrayList<String>();
+		for(String target : sorted) {
+			if(dl.execute(source, target) <= 2)
+				result.add(target);
+		}
+		return result.toArray(new String[0]);
+	}
+
+	public int size() {
+		return sorted.length;
+	}
+}
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Detection cascade: cheap checks first, the 5-gram model only for borderline words.
+
+Stages, in order:
+    trigram  lowest frequency of the word's trigrams in resources/trigrams2.txt,
+             the check Model.errorDetection does in the Java GUI
+    3-gram   score under the 3-gram model contained in the 5-gram ARPA file
+             (char_lm.load_model(..., max_order=3))
+    5-gram   the full model against the detector threshold
+
+Each stage but the last has an accept/reject band: a word whose value is at or
+above the accept bound is accepted, one below the reject bound is flagged, and
+only the words in between go on to the next stage. The bands are calibrated
+against the decisions of the full model on a sample of corpus words and half
+of the test pairs, so that each stage disagrees with it on at most a set
+fraction of the sample; main() reports accuracy on the other half and
+agreement on the tokens outside the sample. All stages are vectorized over a
+batch of words.
+
+Usage:
+    python cascade_detector.py                          # calibrate, then compare with the 5-gram model alone
+    python cascade_detector.py --language isiXhosa --max-disagreement 0.0005
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# The shared scoring module lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 6)))
+
+from calibration import sample_corpus_words
+from char_lm import HashIndex, load_model
+from char_scorer import CharScorer, load_test_pairs
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+KENLM_DIR = os.path.join(SRC_DIR, 'kenlm')
+TEST_DATA_DIR = os.path.abspath(os.path.join(SRC_DIR, *[os.pardir] * 6, 'test_data'))
+DEFAULT_TRIGRAMS = os.path.join(SRC_DIR, 'resources', 'trigrams2.txt')
+
+# code point bits per character in a packed trigram key
+CHAR_BITS = 21
+# fraction of the test pairs kept out of calibration for evaluation
+HELD_OUT = 0.5
+
+
+def _codepoints(words):
+    """Concatenated code points of words, with each word's length and start."""
+    lengths = np.fromiter(map(len, words), dtype=np.intp, count=len(words))
+    codepoints = np.frombuffer(''.join(words).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    return codepoints, lengths, np.cumsum(lengths) - lengths
+
+
+def _pack(codepoints):
+    """Packed key of the trigram starting at every position but the last two."""
+    return ((codepoints[:-2] << np.uint64(2 * CHAR_BITS))
+            | (codepoints[1:-1] << np.uint64(CHAR_BITS))
+            | codepoints[2:])
+
+
+class TrigramTable:
+    """Trigram frequencies of a "trigram frequency" file, looked up by packed key through a HashIndex."""
+
+    def __init__(self, path=DEFAULT_TRIGRAMS):
+        freqs = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and len(parts[0]) == 3:
+                    freqs[parts[0]] = int(parts[1])
+        # the trigrams laid end to end; every third position starts one
+        keys = _pack(_codepoints([''.join(freqs)])[0])[::3]
+        order = np.argsort(keys)
+        self.keys = keys[order]
+        self.freqs = np.fromiter(freqs.values(), dtype=np.float64, count=len(freqs))[order]
+        self._index = HashIndex(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def min_frequency(self, words):
+        """
+        Lowest frequency among each word's trigrams, 0 for a trigram not in
+        the table, NaN for words shorter than three characters.
+        """
+        result = np.full(len(words), np.nan)
+        codepoints, lengths, starts = _codepoints(words)
+        if len(codepoints) < 3 or not len(self.keys):
+            return result
+        keys = _pack(codepoints)
+        rows = self._index.lookup(keys)
+        freqs = np.where(rows >= 0, self.freqs[rows], 0.0)
+        # positions whose trigram runs past the end of their word never count
+        freqs = np.append(freqs, [np.inf, np.inf])
+        word_of = np.repeat(np.arange(len(words)), lengths)
+        freqs[np.arange(len(codepoints)) - starts[word_of] > lengths[word_of] - 3] = np.inf
+        nonempty = lengths > 0
+        result[nonempty] = np.minimum.reduceat(freqs, starts[nonempty])
+        result[np.isinf(result)] = np.nan
+        return result
+
+
+class Stage:
+    """One cascade stage: words scoring below reject are flagged, at or above accept accepted."""
+
+    def __init__(self, name, reject=-np.inf, accept=np.inf):
+        self.name = name
+        self.reject = reject
+        self.accept = accept
+        self.seen = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, reject={self.reject}, accept={self.accept})"
+
+    def decide(self, values):
+        """(accepted, rejected) masks; NaN values are neither."""
+        with np.errstate(invalid='ignore'):
+            return values >= self.accept, values < self.reject
+
+    def report(self, total):
+        passed = self.seen - self.accepted - self.rejected
+        return (f"{self.name:>8}: {self.seen:7d} in ({self.seen / max(total, 1) * 100:5.1f}%), "
+                f"{self.accepted} accepted, {self.rejected} flagged, {passed} passed on, "
+                f"{self.seconds:.3f}s ({self.seconds / max(self.seen, 1) * 1e6:.2f} us/word)")
+
+
+def calibrate_band(values, flagged, reject_budget, accept_budget):
+    """
+    Widest (reject, accept) band whose decisions disagree with flagged on at
+    most reject_budget unflagged words scoring below reject and at most
+    accept_budget flagged words at or above accept.
+    Words with a NaN value are ignored.
+    """
+    known = ~np.isnan(values)
+    order = np.argsort(values[known], kind='stable')
+    v = values[known][order]
+    f = flagged[known][order]
+    n = len(v)
+    if not n:
+        return -np.inf, np.inf
+
+    # reject the lowest i words, i as large as the unflagged words among them allow
+    unflagged_below = np.concatenate(([0], np.cumsum(~f)))
+    i = int(np.searchsorted(unflagged_below, reject_budget, side='right')) - 1
+    reject = v[i] if i < n else np.inf
+
+    # accept the highest j words, j as large as the flagged words among them allow
+    flagged_above = np.concatenate(([0], np.cumsum(f[::-1])))
+    j = int(np.searchsorted(flagged_above, accept_budget, side='right')) - 1
+    if j == 0:
+        accept = np.inf
+    else:
+        accept = v[n - j]
+        if j < n and v[n - j - 1] == accept:
+            # ties below the cut would be accepted too, move to the next distinct value
+            k = int(np.searchsorted(v, accept, side='right'))
+            accept = v[k] if k < n else np.inf
+    return float(min(reject, accept)), float(accept)
+
+
+def split_test_pairs(language, held_out=HELD_OUT, seed=0):
+    """
+    The language's test pairs split at random into a calibration part and a
+    held-out part, each a (wrong_words, correct_words) pair of lists.
+    """
+    pairs_path = os.path.join(TEST_DATA_DIR, f'{language}_test_pairs.txt')
+    if not os.path.exists(pairs_path):
+        return ([], []), ([], [])
+    wrong_words, correct_words = load_test_pairs(pairs_path)
+    order = np.random.default_rng(seed).permutation(len(wrong_words))
+    cut = len(order) - int(round(held_out * len(order)))
+    return tuple(([wrong_words[i] for i in part], [correct_words[i] for i in part])
+                 for part in (order[:cut].tolist(), order[cut:].tolist()))
+
+
+def calibration_words(language, samples=5000, seed=0):
+    """Corpus words and the calibration part of the test pairs, for calibrating the bands."""
+    words = sample_corpus_words(os.path.join(KENLM_DIR, f'{language}Corpus.txt'), samples, min_length=1, seed=seed)
+    wrong_words, correct_words = split_test_pairs(language, seed=seed)[0]
+    return words + wrong_words + correct_words
+
+
+class CascadeDetector:
+    def __init__(self, model_path, threshold=-10, trigram_path=DEFAULT_TRIGRAMS, low_order=3, scorer=None):
+        """
+        Args:
+            model_path: ARPA file of the full model; the low-order stage uses
+                        the n-grams up to low_order from the same file
+            threshold: Full model score below which a word is flagged
+            trigram_path: Trigram frequency file of the first stage
+            scorer: CharScorer of the full model, to share a loaded model
+
+        The cheap stages pass everything on until calibrate() sets their bands.
+        """
+        self.model_path = os.path.abspath(model_path)
+        self.threshold = threshold
+        self.scorer = scorer or CharScorer(self.model_path)
+        self.low_scorer = CharScorer(load_model(self.model_path, max_order=low_order))
+        self.trigrams = TrigramTable(trigram_path)
+        self.stages = [
+            Stage('trigram'),
+            Stage(f'{low_order}-gram'),
+            Stage('full', reject=threshold, accept=threshold),
+        ]
+        self._features = [self.trigrams.min_frequency, self.low_scorer.score_many, self.scorer.score_many]
+
+    def calibrate(self, words, max_disagreement=0.001):
+        """
+        Set the bands of the cheap stages from the full model's decisions on words.
+
+        Args:
+            words: Calibration words, correct and misspelled
+            max_disagreement: Fraction of the words the full model accepts
+                              that each band may flag, and of the words it
+                              flags that each band may accept. Flagged words
+                              are a small minority, so each side gets its own
+                              budget.
+
+        Returns:
+            The stages, with their new bands
+        """
+        flagged = self.scorer.score_many(words) < self.threshold
+        reject_budget = int(max_disagreement * (~flagged).sum())
+        accept_budget = int(max_disagreement * flagged.sum())
+        for stage, feature in zip(self.stages[:-1], self._features):
+            stage.reject, stage.accept = calibrate_band(feature(words), flagged, reject_budget, accept_budget)
+        return self.stages
+
+    @classmethod
+    def for_language(cls, language, model_path=None, threshold=-10, max_disagreement=0.001, **kwargs):
+        """Cascade for one of the kenlm/*UModel.arpa models, calibrated on its corpus and half its test pairs."""
+        model_path = model_path or os.path.join(KENLM_DIR, f'{language}UModel.arpa')
+        cascade = cls(model_path, threshold, **kwargs)
+        cascade.calibrate(calibration_words(language), max_disagreement)
+        return cascade
+
+    def detect_many(self, words):
+        """
+        Flag a batch of words, each stage seeing only the words the ones before
+        it could not decide.
+
+        Returns:
+            (flagged bool array, full model scores with NaN where it did not run)
+        """
+        if not isinstance(words, (list, tuple)):
+            words = list(words)
+        # each distinct word goes through the cascade once; the stage counts
+        # are weighted by how often it occurs
+        index = {}
+        codes = np.fromiter((index.setdefault(word, len(index)) for word in words), dtype=np.intp, count=len(words))
+        distinct = list(index)
+        weights = np.bincount(codes, minlength=len(distinct))
+        flagged = np.zeros(len(distinct), dtype=bool)
+        scores = np.full(len(distinct), np.nan)
+        pending = np.arange(len(distinct))
+        for stage, feature in zip(self.stages, self._features):
+            if not len(pending):
+                break
+            start = time.perf_counter()
+            values = feature([distinct[i] for i in pending.tolist()])
+            if stage is self.stages[-1]:
+                scores[pending] = values
+            accepted, rejected = stage.decide(values)
+            flagged[pending[rejected]] = True
+            stage.seen += int(weights[pending].sum())
+            stage.accepted += int(weights[pending[accepted]].sum())
+            stage.rejected += int(weights[pending[rejected]].sum())
+            pending = pending[~(accepted | rejected)]
+            stage.seconds += time.perf_counter() - start
+        return flagged[codes], scores[codes]
+
+    def report(self):
+        """Per-stage pass-through and time, one line per stage."""
+        total = self.stages[0].seen
+        lines = [stage.report(total) for stage in self.stages]
+        lines.append(f"   total: {sum(stage.seconds for stage in self.stages):.3f}s for {total} words")
+        return '\n'.join(lines)
+
+
+def main():
+    from SpellDetectorCorrector import TOKEN_RE
+
+    parser = argparse.ArgumentParser(description="Calibrate the detection cascade and compare it with the full model.")
+    parser.add_argument('--language', default='isiZulu')
+    parser.add_argument('--threshold', type=float, default=-10)
+    parser.add_argument('--max-disagreement', type=float, default=0.001,
+                        help="fraction of the full model's accepted (flagged) calibration words each band "
+                             "may flag (accept)")
+    parser.add_argument('--text', help="running text to check (default: the language's corpus)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    calibration = calibration_words(args.language)
+    cascade = CascadeDetector(os.path.join(KENLM_DIR, f'{args.language}UModel.arpa'), args.threshold)
+    cascade.calibrate(calibration, args.max_disagreement)
+    print(f"Calibrated in {time.perf_counter() - start:.2f}s on {len(calibration)} words")
+    for stage in cascade.stages:
+        print(f"  {stage}")
+
+    text_path = args.text or os.path.join(KENLM_DIR, f'{args.language}Corpus.txt')
+    with open(text_path, 'r', encoding='utf-8') as f:
+        tokens = TOKEN_RE.findall(f.read())
+    full = CharScorer(cascade.model_path)
+    full.score_many(tokens[:1])
+    start = time.perf_counter()
+    expected = full.score_many(tokens) < args.threshold
+    full_seconds = time.perf_counter() - start
+
+    flagged, _ = cascade.detect_many(tokens)
+    print(f"\n{len(tokens)} tokens of {os.path.basename(text_path)}")
+    print(cascade.report())
+    print(f"Full model alone: {full_seconds:.3f}s")
+    print(f"Agreement with the full model: {(flagged == expected).mean() * 100:.2f}% "
+          f"({int((flagged & ~expected).sum())} extra flags, {int((~flagged & expected).sum())} missed)")
+    calibrated = set(calibration)
+    unseen = np.fromiter((token not in calibrated for token in tokens), dtype=bool, count=len(tokens))
+    if unseen.any():
+        print(f"Agreement on the {int(unseen.sum())} tokens outside the calibration sample: "
+              f"{(flagged[unseen] == expected[unseen]).mean() * 100:.2f}%")
+
+    wrong_words, correct_words = split_test_pairs(args.language)[1]
+    if wrong_words:
+        for name, words, target in (('misspellings flagged', wrong_words, True),
+                                    ('corrections accepted', correct_words, False)):
+            cascade_rate = (cascade.detect_many(words)[0] == target).mean() * 100
+            full_rate = ((full.score_many(words) < args.threshold) == target).mean() * 100
+            print(f"Held-out test pairs ({len(words)}), {name}: cascade {cascade_rate:.1f}%, full model {full_rate:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for SpellErrorDetector.check_files.
+Checks each language's corpus with its own *UModel.arpa model using
+1..N worker processes and prints throughput per job count.
+"""
+
+import argparse
+import os
+import time
+
+from SpellDetectorCorrector import SpellErrorDetector
+
+KENLM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kenlm')
+
+LANGUAGES = [
+    ('isiZulu', 'isiZuluUModel.arpa', 'isiZuluCorpus.txt'),
+    ('isiXhosa', 'isiXhosaUModel.arpa', 'isiXhosaCorpus.txt'),
+    ('isiNdebele', 'isiNdebeleUModel.arpa', 'isiNdebeleCorpus.txt'),
+    ('siSwati', 'siSwatiUModel.arpa', 'siSwatiCorpus.txt'),
+]
+
+
+def benchmark_language(name, model_path, corpus_path, max_jobs, repeat, shard_bytes):
+    print(f"\n{name}")
+    print('-' * 60)
+    detector = SpellErrorDetector(model_path, threshold=-10)
+    paths = [corpus_path] * repeat
+
+    print(f"{'Jobs':>6s} {'Tokens':>10s} {'Seconds':>10s} {'Tokens/sec':>14s} {'Speedup':>9s}")
+    baseline = None
+    for jobs in range(1, max_jobs + 1):
+        start = time.perf_counter()
+        tokens = 0
+        for _, records in detector.check_files(paths, jobs=jobs, shard_bytes=shard_bytes):
+            tokens += len(records)
+        seconds = time.perf_counter() - start
+        rate = tokens / seconds if seconds > 0 else 0.0
+        if baseline is None:
+            baseline = rate
+        print(f"{jobs:6d} {tokens:10d} {seconds:10.3f} {rate:14,.0f} {rate / baseline:8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=4, help="times each corpus is listed, to give the workers enough work")
+    parser.add_argument('--shard-bytes', type=int, default=1 << 18)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("check_files Scaling Benchmark")
+    print("=" * 60)
+
+    for name, model_file, corpus_file in LANGUAGES:
+        model_path = os.path.join(KENLM_DIR, model_file)
+        corpus_path = os.path.join(KENLM_DIR, corpus_file)
+        if not os.path.exists(model_path) or not os.path.exists(corpus_path):
+            print(f"\n[WARN] {name}: missing {model_file} or {corpus_file}")
+            continue
+        benchmark_language(name, model_path, corpus_path, args.max_jobs, args.repeat, args.shard_bytes)
+
+
+if __name__ == '__main__':
+    main()
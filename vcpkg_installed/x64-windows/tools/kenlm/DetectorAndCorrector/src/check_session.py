@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Incremental checking session for editors.
+
+A CheckSession holds a document's tokens and their results and is kept up
+to date with edit events, (offset, deleted length, inserted text), instead
+of re-checking the document after every keystroke. An edit only
+re-tokenizes the tokens it touched: it widens the edited span to the
+enclosing token boundaries, runs TOKEN_RE over that span alone, and splices
+the new tokens in, shifting the offsets of the later ones with one NumPy
+add. Results are cached per word form for the life of the session, so only
+forms never seen before reach the detector.
+
+Each edit returns an EditDiff: the error tokens it removed (in offsets
+before the edit) and the ones it added (after it), which is what an editor
+needs to update its squiggles. Errors elsewhere in the document are
+unchanged and have only moved by the length change.
+
+CheckSession.java does the same for the Swing GUI.
+
+Usage:
+    python check_session.py                   # simulated typing on the isiZulu corpus
+    python check_session.py --text isiZulu.txt --edits 2000
+"""
+
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from SpellDetectorCorrector import SpellErrorDetector, TokenResult, TOKEN_RE
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TEXT = os.path.join(SRC_DIR, 'kenlm', 'isiZuluCorpus.txt')
+DEFAULT_MODEL = os.path.join(SRC_DIR, 'kenlm', 'isiZuluUModel.arpa')
+
+
+class EditDiff:
+    """
+    Errors an edit changed. start:end is the re-tokenized span in the text
+    after the edit; removed are (offset, token) pairs in offsets before the
+    edit, added are TokenResult records in offsets after it.
+    """
+    __slots__ = ('start', 'end', 'removed', 'added')
+
+    def __init__(self, start, end, removed, added):
+        self.start = start
+        self.end = end
+        self.removed = removed
+        self.added = added
+
+    def __bool__(self):
+        return bool(self.removed or self.added)
+
+    def __repr__(self):
+        return f"EditDiff({self.start}, {self.end}, removed={self.removed!r}, added={self.added!r})"
+
+
+class CheckSession:
+    def __init__(self, detector, text=''):
+        """
+        Args:
+            detector: SpellErrorDetector deciding the words
+            text: Initial document, checked as one edit
+        """
+        self.detector = detector
+        self.text = ''
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._ends = np.zeros(0, dtype=np.int64)
+        self._tokens = []
+        self._flagged = np.zeros(0, dtype=bool)
+        self._scores = np.zeros(0, dtype=np.float64)
+        self._results = {}  # form -> (flagged, score)
+        self.edits = 0
+        self.tokens_retokenized = 0
+        self.forms_checked = 0
+        self.seconds = 0.0
+        if text:
+            self.edit(0, 0, text)
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def _check(self, words):
+        """(flagged, scores) of words, deciding only the forms not cached yet"""
+        new = [word for word in dict.fromkeys(words) if word not in self._results]
+        if new:
+            flagged, scores = self.detector.check_words(new)
+            self._results.update(zip(new, zip(flagged.tolist(), scores.tolist())))
+            self.forms_checked += len(new)
+        results = [self._results[word] for word in words]
+        return (np.array([f for f, _ in results], dtype=bool),
+                np.array([s for _, s in results], dtype=np.float64))
+
+    def edit(self, offset, deleted, inserted):
+        """
+        Apply one edit: replace text[offset:offset + deleted] with inserted.
+
+        Returns:
+            EditDiff of the errors that disappeared and appeared
+        """
+        if not 0 <= offset <= offset + deleted <= len(self.text):
+            raise ValueError(f"edit {offset}+{deleted} outside a text of length {len(self.text)}")
+        start_time = time.perf_counter()
+        end = offset + deleted
+        delta = len(inserted) - deleted
+        # tokens ending at or after the edit and starting at or before its end can change;
+        # the characters just outside them are separators the edit did not touch
+        lo = int(np.searchsorted(self._ends, offset, 'left'))
+        hi = int(np.searchsorted(self._starts, end, 'right'))
+        start = min(offset, int(self._starts[lo])) if lo < hi else offset
+        old_end = max(end, int(self._ends[hi - 1])) if lo < hi else end
+
+        self.text = self.text[:offset] + inserted + self.text[end:]
+        matches = list(TOKEN_RE.finditer(self.text, start, old_end + delta))
+        words = [match.group() for match in matches]
+        if words:
+            flagged, scores = self._check(words)
+        else:
+            flagged, scores = np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float64)
+        starts = np.array([match.start() for match in matches], dtype=np.int64)
+
+        removed = [(int(self._starts[i]), self._tokens[i]) for i in (lo + np.nonzero(self._flagged[lo:hi])[0]).tolist()]
+        added = [TokenResult(int(starts[i]), words[i], float(scores[i]), True, self.detector)
+                 for i in np.nonzero(flagged)[0].tolist()]
+
+        self._starts = np.concatenate((self._starts[:lo], starts, self._starts[hi:] + delta))
+        self._ends = np.concatenate((self._ends[:lo], starts + [len(word) for word in words], self._ends[hi:] + delta))
+        self._tokens[lo:hi] = words
+        self._flagged = np.concatenate((self._flagged[:lo], flagged, self._flagged[hi:]))
+        self._scores = np.concatenate((self._scores[:lo], scores, self._scores[hi:]))
+
+        self.edits += 1
+        self.tokens_retokenized += len(words)
+        self.seconds += time.perf_counter() - start_time
+        return EditDiff(start, old_end + delta, removed, added)
+
+    def recheck(self, words=None):
+        """
+        Decide words again (default every form), e.g. after they were added
+        to the user dictionary, and update their occurrences.
+
+        Returns:
+            EditDiff over the whole text
+        """
+        if words is None:
+            self._results.clear()
+            indexes = list(range(len(self._tokens)))
+        else:
+            words = set(words)
+            for word in words:
+                self._results.pop(word, None)
+            indexes = [i for i, token in enumerate(self._tokens) if token in words]
+        if not indexes:
+            return EditDiff(0, len(self.text), [], [])
+        flagged, scores = self._check([self._tokens[i] for i in indexes])
+        indexes = np.array(indexes)
+        was = self._flagged[indexes]
+        removed = [(int(self._starts[i]), self._tokens[i]) for i in indexes[was & ~flagged].tolist()]
+        self._flagged[indexes] = flagged
+        self._scores[indexes] = scores
+        added = [TokenResult(int(self._starts[i]), self._tokens[i], float(self._scores[i]), True, self.detector)
+                 for i in indexes[flagged & ~was].tolist()]
+        return EditDiff(0, len(self.text), removed, added)
+
+    def errors(self):
+        """Current error tokens as TokenResult records, in document order"""
+        return [TokenResult(int(self._starts[i]), self._tokens[i], float(self._scores[i]), True, self.detector)
+                for i in np.nonzero(self._flagged)[0].tolist()]
+
+    def report(self):
+        """One-line summary of the edits so far."""
+        return (f"Check session: {len(self._tokens)} tokens, {int(self._flagged.sum())} errors; {self.edits} edits "
+                f"re-tokenized {self.tokens_retokenized} tokens and decided {self.forms_checked} new forms "
+                f"in {self.seconds:.3f}s")
+
+
+def simulate_typing(text, n_edits, seed=0):
+    """Random keystroke-sized edits: typing letters and spaces, backspaces and selection deletes"""
+    rng = random.Random(seed)
+    length = len(text)
+    cursor = rng.randrange(length + 1)
+    for _ in range(n_edits):
+        if rng.random() < 0.02:
+            cursor = rng.randrange(length + 1)
+        action = rng.random()
+        if action < 0.7:
+            char = rng.choice('aeiouabhklmnstuzwy ') if rng.random() < 0.95 else ','
+            yield cursor, 0, char
+            cursor += 1
+            length += 1
+        elif action < 0.95 and cursor > 0:
+            yield cursor - 1, 1, ''
+            cursor -= 1
+            length -= 1
+        else:
+            deleted = min(rng.randrange(1, 20), length - cursor)
+            yield cursor, deleted, ''
+            length -= deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure incremental re-checking against full re-checks.")
+    parser.add_argument('--text', default=DEFAULT_TEXT, help="UTF-8 document to edit")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--chars', type=int, default=200_000, help="characters of the document to use")
+    parser.add_argument('--edits', type=int, default=1000)
+    parser.add_argument('--verify-every', type=int, default=250, help="compare with a full check every n edits")
+    args = parser.parse_args()
+
+    with open(args.text, 'r', encoding='utf-8') as f:
+        text = f.read(args.chars)
+    detector = SpellErrorDetector(args.model)
+
+    start = time.perf_counter()
+    session = CheckSession(detector, text)
+    print(f"Initial check: {len(session)} tokens, {len(session.errors())} errors in {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    for i, (offset, deleted, inserted) in enumerate(simulate_typing(text, args.edits), 1):
+        session.edit(offset, deleted, inserted)
+        if i % args.verify_every == 0:
+            paused = time.perf_counter()
+            expected = [(r.offset, r.token) for r in detector.check_stream(session.text, flagged_only=True)]
+            assert [(r.offset, r.token) for r in session.errors()] == expected, f"errors differ after edit {i}"
+            start += time.perf_counter() - paused
+    per_edit = (time.perf_counter() - start) / args.edits
+
+    start = time.perf_counter()
+    list(detector.check_stream(session.text, flagged_only=True))
+    full = time.perf_counter() - start
+    print(session.report())
+    print(f"Per edit: {per_edit * 1e6:.0f} us incremental, {full * 1e3:.1f} ms for a full re-check "
+          f"({full / per_edit:.0f}x); errors matched a full check every {args.verify_every} edits")
+    detector.close()
+
+
+if __name__ == '__main__':
+    main()
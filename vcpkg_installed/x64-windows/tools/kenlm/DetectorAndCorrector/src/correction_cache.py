@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Bounded LRU cache of corrector answers.
+
+Misspellings in real text repeat: the same typo of a common word turns up
+many times in a document and across a day of requests, and each time the
+Java corrector searches for the same candidates again. CorrectionCache keeps
+the candidate lists keyed by (language, table version, normalized word),
+evicts the least recently used entries once either the entry count or the
+estimated byte size is over its bound, and counts hits, misses and
+evictions.
+
+The table version is a digest of the files the corrector reads
+(trigrams2.txt, wordlist.txt and probabilities.txt), so answers from edited
+tables are never reused. A cache with a path is preloaded from it at startup
+and written back, least recently used first, by save() (SpellErrorDetector
+calls it from close()).
+
+Usage:
+    python correction_cache.py                # what is stored in the default file
+    python correction_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import OrderedDict
+
+# The shared scoring module lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 6)))
+
+from char_lm import DEFAULT_CACHE_DIR, file_digest
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# the tables SpellCorrectorServer loads from its working directory
+CORRECTOR_TABLES = [os.path.join(SRC_DIR, name) for name in ('trigrams2.txt', 'wordlist.txt', 'probabilities.txt')]
+DEFAULT_PATH = os.path.join(DEFAULT_CACHE_DIR, 'corrections.json')
+
+FORMAT_VERSION = 1
+# rough per-entry overhead of the dict slot, key tuple and list objects
+ENTRY_OVERHEAD = 200
+
+
+def normalize(word):
+    """Lowercase the way the Java corrector does: all-caps words entirely, others only the first letter"""
+    return word.lower() if word.isupper() else word[:1].lower() + word[1:]
+
+
+def table_version(paths=None):
+    """Short digest of the corrector's table files"""
+    h = hashlib.sha256(str(FORMAT_VERSION).encode())
+    for path in CORRECTOR_TABLES if paths is None else paths:
+        if os.path.exists(path):
+            h.update(file_digest(path))
+    return h.hexdigest()[:16]
+
+
+def _entry_bytes(key, candidates):
+    return ENTRY_OVERHEAD + sum(len(part) for part in key) + sum(len(c) + 50 for c in candidates)
+
+
+class CorrectionCache:
+    def __init__(self, max_entries=100_000, max_bytes=32 << 20, path=None):
+        """
+        Args:
+            max_entries: Most entries kept
+            max_bytes: Most estimated bytes kept
+            path: JSON file preloaded now and written by save(), None for an
+                  in-memory cache
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path and os.path.abspath(path)
+        self._entries = OrderedDict()  # key -> candidate list, least recently used first
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.preloaded = 0
+        if self.path and os.path.exists(self.path):
+            self.preloaded = self.load(self.path)
+
+    @staticmethod
+    def key(language, version, word):
+        return language, version, normalize(word)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Cached candidates for key (marked as recently used), or None"""
+        candidates = self._entries.get(key)
+        if candidates is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return candidates
+
+    def put(self, key, candidates):
+        candidates = list(candidates)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= _entry_bytes(key, old)
+        self._entries[key] = candidates
+        self.nbytes += _entry_bytes(key, candidates)
+        while self._entries and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+            evicted, evicted_candidates = self._entries.popitem(last=False)
+            self.nbytes -= _entry_bytes(evicted, evicted_candidates)
+            self.evictions += 1
+
+    def load(self, path):
+        """Add the entries saved in path, oldest first; returns how many were read"""
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('format') != FORMAT_VERSION:
+            return 0
+        for language, version, word, candidates in saved['entries']:
+            self.put((language, version, word), candidates)
+        return len(saved['entries'])
+
+    def save(self, path=None):
+        """Write the entries, least recently used first, to path (default the cache's own)"""
+        path = path or self.path
+        if not path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': FORMAT_VERSION,
+                       'entries': [[*key, candidates] for key, candidates in self._entries.items()]},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.nbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'preloaded': self.preloaded,
+        }
+
+    def report(self):
+        """One-line hit/miss summary."""
+        return (f"Correction cache: {self.hits} hits, {self.misses} misses ({self.hit_rate() * 100:.1f}% hit rate), "
+                f"{len(self._entries)} entries, ~{self.nbytes / 1e6:.2f} MB, {self.evictions} evictions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the saved correction cache.")
+    parser.add_argument('--path', default=DEFAULT_PATH)
+    parser.add_argument('--clear', action='store_true', help="delete the saved entries")
+    args = parser.parse_args()
+
+    if args.clear:
+        if os.path.exists(args.path):
+            os.remove(args.path)
+        print(f"Cleared {args.path}")
+        return
+    cache = CorrectionCache(max_entries=sys.maxsize, max_bytes=sys.maxsize, path=args.path)
+    current = table_version()
+    by_version = {}
+    for language, version, _ in cache._entries:
+        by_version[language, version] = by_version.get((language, version), 0) + 1
+    print(f"{args.path}: {len(cache)} entries, ~{cache.nbytes / 1e6:.2f} MB")
+    for (language, version), count in sorted(by_version.items()):
+        print(f"  {language} tables {version}: {count}{' (current)' if version == current else ''}")
+
+
+if __name__ == '__main__':
+    main()
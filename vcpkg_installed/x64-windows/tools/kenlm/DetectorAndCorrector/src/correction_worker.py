@@ -0,0 +1,157 @@
+import json
+import os
+import queue
+import subprocess
+import threading
+
+
+class CorrectionWorkerError(RuntimeError):
+    """Raised when the Java correction worker dies or answers with an error"""
+
+
+class CorrectionWorkerTimeout(CorrectionWorkerError):
+    """Raised when the Java correction worker does not answer in time; the worker is killed"""
+
+
+class CorrectionWorker:
+    """
+    One long-lived SpellCorrectorServer JVM.
+    The corrector tables are loaded once when the JVM starts; after that each
+    round trip sends a JSON array of words and reads back one JSON array of
+    candidate lists.
+    """
+
+    def __init__(self, workdir=None, java='java', timeout=30.0, word_timeout=1.0):
+        """
+        Args:
+            timeout, word_timeout: A round trip of n words that takes longer
+                                   than timeout + n * word_timeout seconds
+                                   kills the JVM
+        """
+        # SpellCorrectorServer reads trigrams2.txt, wordlist.txt and probabilities.txt from its working directory
+        self.workdir = workdir or os.path.dirname(os.path.abspath(__file__))
+        self.java = java
+        self.timeout = timeout
+        self.word_timeout = word_timeout
+        self.process = None
+        self._lines = None
+        self.restarts = 0
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [self.java, '-cp', '.', 'SpellCorrectorServer'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self.workdir,
+            text=True,
+            encoding='utf-8',
+            bufsize=1
+        )
+        # stdout is read on a thread so a hung JVM cannot block the caller past its deadline
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_lines, args=(self.process.stdout, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _read_lines(stdout, lines):
+        try:
+            for line in stdout:
+                lines.put(line)
+        except (OSError, ValueError):
+            pass
+        lines.put('')
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def restart(self):
+        self.close()
+        self.restarts += 1
+        self.start()
+
+    def correct_many(self, words):
+        """Return a list of candidate lists, one per word"""
+        if not self.alive():
+            self.start()
+        try:
+            self.process.stdin.write(json.dumps(list(words)) + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise CorrectionWorkerError(f"correction worker pipe failed: {e}") from e
+        deadline = self.timeout + self.word_timeout * len(words)
+        try:
+            line = self._lines.get(timeout=deadline)
+        except queue.Empty:
+            self.process.kill()
+            self.process.wait()
+            raise CorrectionWorkerTimeout(f"correction worker did not answer within {deadline:.0f}s")
+        if not line:
+            try:
+                code = self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                code = self.process.wait()
+            raise CorrectionWorkerError(f"correction worker exited with code {code}")
+        response = json.loads(line)
+        if isinstance(response, dict):
+            raise CorrectionWorkerError(response.get('error', 'unknown worker error'))
+        return response
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+
+class CorrectionPool:
+    """
+    Small pool of correction workers shared by the detector.
+    Workers start lazily on first use and are restarted automatically when one
+    crashes or hangs mid-request.
+    """
+
+    def __init__(self, size=1, workdir=None, java='java', max_retries=2):
+        self.size = size
+        self.max_retries = max_retries
+        self._workers = [CorrectionWorker(workdir, java) for _ in range(size)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    def correct_many(self, words):
+        """Correct a batch of words on the next idle worker"""
+        words = list(words)
+        if not words:
+            return []
+        worker = self._idle.get()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return worker.correct_many(words)
+                except CorrectionWorkerTimeout:
+                    # the same words would likely hang again: restart for the next caller, don't retry
+                    worker.restart()
+                    raise
+                except CorrectionWorkerError:
+                    if worker.alive() or attempt == self.max_retries:
+                        raise
+                    worker.restart()
+        finally:
+            self._idle.put(worker)
+
+    def correct(self, word):
+        return self.correct_many([word])[0]
+
+    @property
+    def restarts(self):
+        return sum(worker.restarts for worker in self._workers)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Dictionary compiled into a minimal acyclic automaton (DAWG).
+
+Words that share prefixes share the path to them, and words that share
+suffixes share the states after the point where they meet, which suits the
+noun-class and verb prefixes and the common endings of the Nguni wordlists.
+The automaton is built with Daciuk's incremental algorithm for sorted input
+and stored as flat NumPy arrays (edge offsets per state, edge labels and
+targets, final flags), saved as .npy files under model_cache/ so later runs
+memory-map it.
+
+Besides membership and prefix enumeration it supports fuzzy search: a
+depth-first walk that carries the edit-distance row of a Levenshtein
+automaton for the query (with adjacent swaps), pruning every branch whose
+row has no entry within the distance. The work done follows the part of the
+automaton near the query, not the size of the dictionary.
+
+Usage:
+    python dawg.py                            # build, report size and timings
+    python dawg.py --fuzzy izizahtu --prefix ngiya
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from dictionaries import (DEFAULT_DICTIONARIES, cache_directory, has_arrays, load_arrays, read_dictionaries,
+                          save_arrays)
+
+FORMAT_VERSION = 1
+ARRAYS = ('first', 'labels', 'targets', 'final')
+
+
+class _State:
+    __slots__ = ('edges', 'final')
+
+    def __init__(self):
+        self.edges = {}
+        self.final = False
+
+    def signature(self):
+        return self.final, tuple(sorted((label, id(child)) for label, child in self.edges.items()))
+
+
+class Dawg:
+    def __init__(self, arrays):
+        """Use build() or load(); arrays is a dict of the ARRAYS NumPy arrays."""
+        # plain ndarray views of memory-mapped arrays skip np.memmap's per-slice overhead
+        self.first = np.asarray(arrays['first'])      # edges of state s are first[s]:first[s + 1]
+        self.labels = np.asarray(arrays['labels'])    # edge labels (code points), ascending per state
+        self.targets = np.asarray(arrays['targets'])  # edge target states
+        self.final = np.asarray(arrays['final'])      # 1 if a word ends in the state
+        self.states_visited = 0
+
+    @classmethod
+    def build(cls, words):
+        """Minimal automaton accepting exactly words."""
+        root = _State()
+        register = {}
+        unchecked = []  # (parent, label, child) along the path of the previous word
+        previous = ''
+
+        def minimize(down_to):
+            while len(unchecked) > down_to:
+                parent, label, child = unchecked.pop()
+                signature = child.signature()
+                if signature in register:
+                    parent.edges[label] = register[signature]
+                else:
+                    register[signature] = child
+
+        for word in sorted(set(words)):
+            common = 0
+            while common < min(len(word), len(previous)) and word[common] == previous[common]:
+                common += 1
+            minimize(common)
+            node = unchecked[-1][2] if unchecked else root
+            for label in word[common:]:
+                child = _State()
+                node.edges[label] = child
+                unchecked.append((node, label, child))
+                node = child
+            node.final = True
+            previous = word
+        minimize(0)
+
+        # number the states breadth-first, root first, and lay their edges out contiguously
+        ids = {id(root): 0}
+        order = [root]
+        for state in order:
+            for child in state.edges.values():
+                if id(child) not in ids:
+                    ids[id(child)] = len(order)
+                    order.append(child)
+        first = np.zeros(len(order) + 1, dtype=np.int32)
+        labels, targets = [], []
+        for s, state in enumerate(order):
+            for label in sorted(state.edges):
+                labels.append(ord(label))
+                targets.append(ids[id(state.edges[label])])
+            first[s + 1] = len(labels)
+        return cls({
+            'first': first,
+            'labels': np.array(labels, dtype=np.uint32),
+            'targets': np.array(targets, dtype=np.int32),
+            'final': np.array([state.final for state in order], dtype=np.uint8),
+        })
+
+    def save(self, directory):
+        save_arrays(directory, {name: getattr(self, name) for name in ARRAYS})
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map a saved automaton."""
+        return cls(load_arrays(directory, ARRAYS))
+
+    @classmethod
+    def for_dictionaries(cls, paths=None, cache_dir=None):
+        """
+        Automaton of the dictionary files, loaded from the cache when it was
+        built from the same file contents, otherwise built and cached.
+
+        Args:
+            paths: Dictionary files (one word per line), default
+                   dictionaries.DEFAULT_DICTIONARIES
+        """
+        paths = DEFAULT_DICTIONARIES if paths is None else paths
+        directory = cache_directory('dawg', paths, FORMAT_VERSION, cache_dir)
+        if has_arrays(directory, ARRAYS):
+            return cls.load(directory)
+        dawg = cls.build(read_dictionaries(paths))
+        dawg.save(directory)
+        return dawg
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def __len__(self):
+        return len(self.final)
+
+    def step(self, state, char):
+        """State reached from state over char, or -1."""
+        start, end = self.first[state:state + 2].tolist()
+        code = ord(char)
+        labels = self.labels[start:end].tolist()
+        # most states have one or two edges, where a scan beats a binary search
+        for i, label in enumerate(labels):
+            if label == code:
+                return int(self.targets[start + i])
+            if label > code:
+                break
+        return -1
+
+    def walk(self, prefix):
+        """State reached by reading prefix from the root, or -1."""
+        state = 0
+        for char in prefix:
+            state = self.step(state, char)
+            if state < 0:
+                break
+        return state
+
+    def __contains__(self, word):
+        state = self.walk(word)
+        return state >= 0 and bool(self.final[state])
+
+    def _edges(self, state):
+        start, end = self.first[state:state + 2].tolist()
+        return zip(self.labels[start:end].tolist(), self.targets[start:end].tolist())
+
+    def iter_prefix(self, prefix, limit=None):
+        """Dictionary words that start with prefix, in code point order."""
+        state = self.walk(prefix)
+        if state < 0:
+            return
+        count = 0
+        stack = [(state, prefix)]
+        while stack:
+            state, word = stack.pop()
+            self.states_visited += 1
+            if self.final[state]:
+                yield word
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            stack.extend((target, word + chr(label)) for label, target in reversed(list(self._edges(state))))
+
+    def fuzzy(self, word, max_distance=2):
+        """
+        Dictionary words within max_distance edits of word (insertions,
+        deletions, substitutions and adjacent swaps).
+
+        Returns:
+            List of (candidate, distance), closest first
+        """
+        found = []
+        n = len(word)
+        big = max_distance + 1
+        # only cells within max_distance of the diagonal can stay within max_distance
+        first_row = [j if j <= max_distance else big for j in range(n + 1)]
+        # (state, text so far, current row, previous row, last label)
+        stack = [(0, '', first_row, None, '')]
+        while stack:
+            state, text, row, prev_row, last = stack.pop()
+            self.states_visited += 1
+            if self.final[state] and row[n] <= max_distance:
+                found.append((text, row[n]))
+            i = len(text) + 1
+            lo, hi = max(1, i - max_distance), min(n, i + max_distance)
+            for code, target in self._edges(state):
+                char = chr(code)
+                new = [big] * (n + 1)
+                if i <= max_distance:
+                    new[0] = i
+                best = new[0]
+                for j in range(lo, hi + 1):
+                    d = row[j - 1] + (word[j - 1] != char)
+                    if row[j] + 1 < d:
+                        d = row[j] + 1
+                    if new[j - 1] + 1 < d:
+                        d = new[j - 1] + 1
+                    if prev_row is not None and j > 1 and word[j - 1] == last and word[j - 2] == char and prev_row[j - 2] + 1 < d:
+                        d = prev_row[j - 2] + 1
+                    new[j] = d
+                    if d < best:
+                        best = d
+                if best <= max_distance:
+                    stack.append((target, text + char, new, row, char))
+        found.sort(key=lambda item: (item[1], item[0]))
+        return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the dictionary automaton and try it out.")
+    parser.add_argument('--fuzzy', nargs='+', help="words to search within --distance edits")
+    parser.add_argument('--prefix', nargs='+', help="prefixes to enumerate")
+    parser.add_argument('--distance', type=int, default=2)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dawg = Dawg.for_dictionaries()
+    print(f"Automaton: {len(dawg)} states, {len(dawg.labels)} edges, {dawg.nbytes / 1e6:.2f} MB, "
+          f"ready in {time.perf_counter() - start:.3f}s")
+    words = read_dictionaries(DEFAULT_DICTIONARIES)
+    set_bytes = sys.getsizeof(words) + sum(sys.getsizeof(w) for w in words)
+    print(f"Same {len(words)} words as a Python set: {set_bytes / 1e6:.2f} MB")
+
+    for prefix in args.prefix or []:
+        matches = list(dawg.iter_prefix(prefix, limit=20))
+        print(f"{prefix}*: {', '.join(matches)}")
+    for word in args.fuzzy or []:
+        dawg.states_visited = 0
+        start = time.perf_counter()
+        matches = dawg.fuzzy(word, args.distance)
+        print(f"{word} ~{args.distance}: {', '.join(f'{c} ({d})' for c, d in matches[:20])}  "
+              f"[{len(matches)} matches, {dawg.states_visited} states, {(time.perf_counter() - start) * 1000:.1f} ms]")
+    if not args.fuzzy and not args.prefix:
+        sample = sorted(words)[::97][:500]
+        start = time.perf_counter()
+        assert all(w in dawg for w in sample)
+        print(f"Membership: {(time.perf_counter() - start) / len(sample) * 1e6:.1f} us per word")
+
+
+if __name__ == '__main__':
+    main()
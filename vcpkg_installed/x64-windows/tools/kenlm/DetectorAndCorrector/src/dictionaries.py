@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Dictionary files and the on-disk cache shared by the dictionary structures.
+
+KnownWords (known_words.py), Dawg (dawg.py) and SymSpellIndex
+(symspell_index.py) are all built from the same one-word-per-line files and
+saved as .npy arrays under model_cache/, in a directory named after a digest
+of the files' paths and contents and of the structure's settings, so an
+edited dictionary is never answered from a stale cache and later runs
+memory-map the arrays instead of rebuilding them.
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import threading
+
+import numpy as np
+
+# The shared scoring module lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 6)))
+
+from char_lm import DEFAULT_CACHE_DIR
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# The isiZulu lists; there are no wordlists for the other languages yet
+DEFAULT_DICTIONARIES = [
+    os.path.join(SRC_DIR, 'wordlist.txt'),
+    os.path.join(SRC_DIR, 'resources', 'wordlist.txt'),
+    os.path.join(SRC_DIR, 'resources', 'wordlist2.txt'),
+    os.path.join(SRC_DIR, 'unique.txt'),
+    os.path.join(SRC_DIR, 'user_dictionary'),
+]
+# Dictionary files of each language; a language without an entry has none
+LANGUAGE_DICTIONARIES = {'isiZulu': DEFAULT_DICTIONARIES}
+
+
+def read_dictionaries(paths):
+    """Distinct words of the dictionary files; lines with spaces (e.g. unique.txt's header) are skipped."""
+    words = set()
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                word = line.strip()
+                if word and not any(c.isspace() for c in word):
+                    words.add(word)
+    return words
+
+
+def cache_directory(prefix, paths, settings, cache_dir=None):
+    """
+    model_cache/<prefix>-<digest>, the digest covering settings and every
+    path with its contents (missing files count by name only).
+    """
+    h = hashlib.sha256(str(settings).encode())
+    for path in paths:
+        h.update(os.path.abspath(path).encode('utf-8'))
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"{prefix}-{h.hexdigest()[:16]}")
+
+
+def has_arrays(directory, names):
+    return all(os.path.exists(os.path.join(directory, name + '.npy')) for name in names)
+
+
+def save_arrays(directory, arrays):
+    """
+    Save a dict of NumPy arrays as directory/<name>.npy. The arrays are written
+    to a temporary directory that is then renamed into place, so a concurrent
+    reader never maps a half-written file; if another writer got there first
+    its (identical) arrays are kept.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(directory)), exist_ok=True)
+    tmp_dir = f"{directory}.tmp{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, name + '.npy'), array)
+    try:
+        os.replace(tmp_dir, directory)
+    except OSError:
+        if not has_arrays(directory, arrays):
+            raise
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_arrays(directory, names):
+    """Memory-map the saved arrays, as a dict by name."""
+    return {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r') for name in names}
@@ -1,15 +1,24 @@
-import kenlm
 import subprocess
-import json
 import os
+import sys
+
+# The shared scoring module lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 6)))
+
+from char_scorer import CharScorer
+from correction_worker import CorrectionPool
 
 class SpellErrorDetector:
-    def __init__(self, model_path, threshold=-10):
+    def __init__(self, model_path, threshold=-10, correction_workers=1):
         # Convert to absolute path
         self.model_path = os.path.abspath(model_path)
-        self.model = kenlm.LanguageModel(self.model_path)
+        self.scorer = CharScorer(self.model_path)
+        self.model = self.scorer.model
         self.threshold = threshold
         
+        # Correction JVMs are started on the first get_corrections call and reused afterwards
+        self.corrector = CorrectionPool(size=correction_workers, workdir=os.path.dirname(os.path.abspath(__file__)))
+        
         # Set up Java classpath
         self.java_classpath = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
         
@@ -24,7 +33,10 @@ class SpellErrorDetector:
             'BinarySearch.java',
             'Probabilities.java',
             'TriFreq.java',
-            'TriNext.java'
+            'TransitionTable.java',
+            'TrigramIndex.java',
+            'CorrectorSnapshot.java',
+            'SpellCorrectorServer.java'
         ]
         
         # Check if compilation is needed
@@ -43,64 +55,47 @@ class SpellErrorDetector:
             compile_cmd.extend([os.path.join(self.java_classpath, 'src', f) for f in java_files])
             subprocess.run(compile_cmd, check=True)
 
+    def score_word(self, word):
+        """Score a word by breaking it into individual characters"""
+        return self.scorer.score(word)
+
+    def score_words(self, words):
+        """Score a batch of words, returns a NumPy array of scores"""
+        return self.scorer.score_many(words)
+
     def detect_error(self, word):
-        score = self.model.score(word, bos=True, eos=True)
-        print(f"Word: {word}, Score: {score}, Threshold: {self.threshold}")
-        return score < self.threshold
+        """Detect if a word is likely incorrect based on its score"""
+        return self.score_word(word) < self.threshold
+
+    def detect_errors(self, words):
+        """detect_error for a batch of words, returns a NumPy boolean array"""
+        return self.score_words(words) < self.threshold
 
     def get_corrections(self, word):
+        return self.get_corrections_many([word])[0]
+
+    def get_corrections_many(self, words):
+        """Correct a batch of words in one round trip to the correction worker"""
+        words = list(words)
         try:
-            print(f"Attempting to get corrections for: {word}")
-            # Run Java with correct classpath
-            result = subprocess.run(
-                ['javac', 'SpellCorrectorMain.java'],  # Compile the new class
-                capture_output=True,
-                text=True,
-                cwd=os.path.dirname(__file__)
-            )
-            
-            if result.returncode != 0:
-                print(f"Compilation Error: {result.stderr}")
-                return None
-                
-            result = subprocess.run(
-                ['java', 
-                 '-cp', '.',  # Use current directory for classpath
-                 'SpellCorrectorMain'],
-                input=word,
-                capture_output=True,
-                text=True,
-                cwd=os.path.dirname(__file__)  # Set working directory to script location
-            )
-            
-            print(f"Java return code: {result.returncode}")
-            print(f"Java stdout: {result.stdout}")
-            print(f"Java stderr: {result.stderr}")
-            
-            if result.returncode != 0:
-                print(f"Java Error: {result.stderr}")
-                return None
-                
-            # Find the JSON array in the output
-            json_start = result.stdout.find('[')
-            json_end = result.stdout.rfind(']') + 1
-            if json_start == -1 or json_end == 0:
-                print("No JSON array found in output")
-                return None
-                
-            json_str = result.stdout[json_start:json_end]
-            corrections = json.loads(json_str)
-            
-            if corrections:
-                return {
-                    'most_likely': corrections[0],
-                    'candidates': corrections
-                }
-            return None
+            results = []
+            for corrections in self.corrector.correct_many(words):
+                if corrections:
+                    results.append({
+                        'most_likely': corrections[0],
+                        'candidates': corrections
+                    })
+                else:
+                    results.append(None)
+            return results
             
         except Exception as e:
             print(f"Error getting corrections: {e}")
-            return None
+            return [None] * len(words)
+
+    def close(self):
+        """Shut down the correction workers"""
+        self.corrector.close()
 
 def process_text(text, model_path="isiZuluModel.arpa"):
     # Convert model path to absolute
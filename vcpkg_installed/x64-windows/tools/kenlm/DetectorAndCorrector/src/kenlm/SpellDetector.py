@@ -1,12 +1,18 @@
-import kenlm
+import os
+import sys
+
+# The shared scoring module lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 7)))
+
+from char_scorer import CharScorer
 
 class SpellDetector:
     def __init__(self, model_path):
-        self.model = kenlm.LanguageModel(model_path)
+        self.scorer = CharScorer(model_path)
+        self.model = self.scorer.model
 
     def score_word(self, word):
-        char_sequence = " ".join(list(word.strip()))
-        return self.model.score(char_sequence, bos=True, eos=True)
+        return self.scorer.score(word)
     
     #def check
     # make it rely on a threshold you can yet, expriement to find the correct value
@@ -1,14 +1,22 @@
-import kenlm
+import os
+import sys
+
 import numpy as np
 
+# The shared scoring module lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 7)))
+
+from calibration import pair_accuracy_sweep
+from char_scorer import CharScorer, load_test_pairs
+
 class SpellDetector:
     def __init__(self, model_path, threshold=-10.0):
-        self.model = kenlm.LanguageModel(model_path)
+        self.scorer = CharScorer(model_path)
+        self.model = self.scorer.model
         self.threshold = threshold
 
     def score_word(self, word):
-        char_sequence = " ".join(list(word.strip()))
-        return self.model.score(char_sequence, bos=True, eos=True)
+        return self.scorer.score(word)
 
     def is_error(self, word):
         score = self.score_word(word)
@@ -60,37 +68,28 @@ def evaluate_from_test_file(detector, test_file_path):
     
     return accuracy
 
-def find_optimal_threshold(model_path, test_file_path, threshold_range=(-15.0, -5.0), step=0.1):
+def find_optimal_threshold(model_path, test_file_path, threshold_range=(-15.0, -5.0)):
     print("\n=== Finding Optimal Threshold ===")
 
-    scores_wrong = []
-    scores_correct = []
-    
-    with open(test_file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    for line in lines:
-        if "-" not in line:
-            continue
-        wrong, correct = [w.strip() for w in line.strip().split("-")]
-        detector = SpellDetector(model_path)
-        scores_wrong.append(detector.score_word(wrong))
-        scores_correct.append(detector.score_word(correct))
-    
-
-    best_threshold = None
-    best_accuracy = 0
-    thresholds = np.arange(threshold_range[0], threshold_range[1], step)
-    
-    print("\nTesting thresholds...")
-    for threshold in thresholds:
-        detector = SpellDetector(model_path, threshold=threshold)
-        accuracy = evaluate_from_test_file(detector, test_file_path)
-        
-        if accuracy > best_accuracy:
-            best_accuracy = accuracy
-            best_threshold = threshold
-    
+    # Score every word once; pair accuracy at every candidate threshold then
+    # comes from the sorted scores instead of re-running the evaluation
+    detector = SpellDetector(model_path)
+    wrong_words, correct_words = load_test_pairs(test_file_path)
+    scores_wrong = detector.scorer.score_many(wrong_words)
+    scores_correct = detector.scorer.score_many(correct_words)
+
+    thresholds, accuracy = pair_accuracy_sweep(scores_wrong, scores_correct)
+    in_range = (thresholds >= threshold_range[0]) & (thresholds < threshold_range[1])
+    if not in_range.any():
+        print(f"No candidate thresholds in {threshold_range}")
+        return None
+    thresholds, accuracy = thresholds[in_range], accuracy[in_range] * 100
+
+    best = int(np.argmax(accuracy))
+    best_threshold = float(thresholds[best])
+    best_accuracy = float(accuracy[best])
+
+    print(f"Tested {len(thresholds)} thresholds in [{threshold_range[0]}, {threshold_range[1]})")
     print(f"\n=== Optimal Threshold Found ===")
     print(f"Best threshold: {best_threshold:.2f}")
     print(f"Best accuracy: {best_accuracy:.2f}%")
@@ -103,6 +102,9 @@ if __name__ == "__main__":
     
     # First find the optimal threshold
     optimal_threshold = find_optimal_threshold(MODEL_PATH, TEST_FILE_PATH)
+    if optimal_threshold is None:
+        optimal_threshold = -10.0
+        print(f"Using the default threshold {optimal_threshold:.2f}")
     
     print("\n=== Final Evaluation with Optimal Threshold ===")
     detector = SpellDetector(MODEL_PATH, threshold=optimal_threshold)
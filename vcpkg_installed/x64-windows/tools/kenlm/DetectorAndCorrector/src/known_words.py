@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Known-word pre-filter for the detector.
+
+Model.check in the Java GUI accepts a word found in the wordlist or the user
+dictionary before it runs trigram detection; KnownWords does the same for
+SpellErrorDetector so that only out-of-vocabulary tokens reach the language
+model. On running text most tokens are common words, so the model only sees
+the long tail.
+
+The dictionary is held as a frozen hash set: the sorted 64-bit hashes of its
+words in one NumPy array, probed for a whole batch of tokens with
+np.searchsorted. An optional Bloom filter in front of it rejects most unknown
+tokens with a few bit tests; with the 1.4 MB hash array in memory the binary
+search is already cheap, so the filter is off by default. Both arrays are saved as .npy files under
+model_cache/, keyed by the contents of the dictionary files, and memory-mapped
+on later runs.
+
+Usage:
+    python known_words.py                     # hit rate and time saved on the isiZulu corpus
+    python known_words.py --text isiZulu.txt --bloom-bits 10
+"""
+
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+
+from dictionaries import (DEFAULT_DICTIONARIES, SRC_DIR, cache_directory, has_arrays, load_arrays,
+                          read_dictionaries, save_arrays)
+
+DEFAULT_TEXT = os.path.join(SRC_DIR, 'kenlm', 'isiZuluCorpus.txt')
+DEFAULT_MODEL = os.path.join(SRC_DIR, 'kenlm', 'isiZuluUModel.arpa')
+
+FORMAT_VERSION = 1
+ARRAYS = ('hashes', 'bloom')
+
+
+HASH_BASE = np.uint64(0x100000001B3)
+# words longer than this are hashed one at a time rather than widening the whole batch
+MAX_COLUMNS = 64
+
+
+def _powers(n):
+    """HASH_BASE ** j mod 2**64 for j < n."""
+    powers = np.full(n, HASH_BASE, dtype=np.uint64)
+    powers[:1] = 1
+    return np.cumprod(powers)
+
+
+def _finalize(h):
+    """splitmix64 finalizer, so the Bloom filter positions are well spread."""
+    with np.errstate(over='ignore'):
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+    return h
+
+
+def hash_words(words):
+    """
+    Stable 64-bit hashes of a batch of words (Python's str hash changes
+    between runs): the polynomial sum of the code points, mod 2**64, computed
+    over the batch's fixed-width UTF-32 array in one product. The zero padding
+    of shorter words adds nothing to the sum.
+    """
+    h = np.zeros(len(words), dtype=np.uint64)
+    long_words = [i for i, word in enumerate(words) if len(word) > MAX_COLUMNS]
+    if long_words:
+        short = np.ones(len(words), dtype=bool)
+        short[long_words] = False
+        h[short] = hash_words([words[i] for i in np.nonzero(short)[0].tolist()])
+        for i in long_words:
+            codes = np.frombuffer(words[i].encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+            h[i] = _finalize(np.array([(codes * _powers(len(codes))).sum()], dtype=np.uint64))[0]
+        return h
+    if words:
+        chars = np.array(words, dtype=str)
+        width = chars.dtype.itemsize // 4
+        codes = chars.view(np.uint32).reshape(len(chars), width).astype(np.uint64)
+        h = (codes * _powers(width)).sum(axis=1, dtype=np.uint64)
+    return _finalize(h)
+
+
+def _bloom_positions(hashes, n_bits, n_probes):
+    """Bit positions probed for each hash, shape (len(hashes), n_probes), by double hashing."""
+    low = hashes & np.uint64(0xFFFFFFFF)
+    step = (hashes >> np.uint64(32)) | np.uint64(1)
+    probes = np.arange(n_probes, dtype=np.uint64)
+    return (low[:, None] + probes[None, :] * step[:, None]) & np.uint64(n_bits - 1)
+
+
+class KnownWords:
+    def __init__(self, arrays):
+        """Use build() or load(); arrays is a dict of the ARRAYS NumPy arrays."""
+        self.hashes = np.asarray(arrays['hashes'])  # sorted word hashes
+        self.bloom = np.asarray(arrays['bloom'])    # Bloom filter bits, empty when there is none
+        n_bits = len(self.bloom) * 8
+        # optimal probe count for the bits per word the filter was built with
+        self.n_probes = max(1, round(n_bits / max(len(self.hashes), 1) * math.log(2))) if n_bits else 0
+        self.lookups = 0
+        self.hits = 0
+        self.bloom_rejects = 0
+        self.seconds = 0.0
+
+    @classmethod
+    def build(cls, words, bloom_bits=0):
+        """
+        Args:
+            words: Dictionary words
+            bloom_bits: Bloom filter bits per word (rounded up to a power of two
+                        in total), 0 for no filter
+        """
+        words = sorted(words)
+        # hash in blocks so the UTF-32 array of a long word list stays small
+        blocks = [hash_words(words[i:i + (1 << 16)]) for i in range(0, len(words), 1 << 16)]
+        hashes = np.unique(np.concatenate(blocks)) if blocks else np.zeros(0, dtype=np.uint64)
+        bloom = np.zeros(0, dtype=np.uint8)
+        if bloom_bits:
+            n_bits = 64
+            while n_bits < bloom_bits * len(hashes):
+                n_bits <<= 1
+            known = cls({'hashes': hashes, 'bloom': np.zeros(n_bits // 8, dtype=np.uint8)})
+            positions = _bloom_positions(hashes, n_bits, known.n_probes).ravel()
+            bits = np.zeros(n_bits, dtype=np.uint8)
+            bits[positions.astype(np.intp)] = 1
+            bloom = np.packbits(bits, bitorder='little')
+        return cls({'hashes': hashes, 'bloom': bloom})
+
+    def save(self, directory):
+        save_arrays(directory, {name: getattr(self, name) for name in ARRAYS})
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map a saved set."""
+        return cls(load_arrays(directory, ARRAYS))
+
+    @classmethod
+    def for_dictionaries(cls, paths=None, bloom_bits=0, cache_dir=None):
+        """
+        Set of the dictionary files, loaded from the cache when it was built
+        from the same file contents and settings, otherwise built and cached.
+
+        Args:
+            paths: Dictionary files (one word per line), default
+                   dictionaries.DEFAULT_DICTIONARIES
+        """
+        paths = DEFAULT_DICTIONARIES if paths is None else paths
+        directory = cache_directory('known', paths, f"{FORMAT_VERSION}:{bloom_bits}", cache_dir)
+        if has_arrays(directory, ARRAYS):
+            return cls.load(directory)
+        known = cls.build(read_dictionaries(paths), bloom_bits)
+        known.save(directory)
+        return known
+
+    @property
+    def nbytes(self):
+        return self.hashes.nbytes + self.bloom.nbytes
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _contains_hashes(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        candidates = np.arange(len(hashes))
+        if self.n_probes:
+            positions = _bloom_positions(hashes, len(self.bloom) * 8, self.n_probes).astype(np.intp)
+            bits = (self.bloom[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1
+            candidates = np.nonzero(bits.all(axis=1))[0]
+            self.bloom_rejects += len(hashes) - len(candidates)
+        if len(candidates) and len(self.hashes):
+            wanted = hashes[candidates]
+            rows = np.minimum(np.searchsorted(self.hashes, wanted), len(self.hashes) - 1)
+            found[candidates] = self.hashes[rows] == wanted
+        return found
+
+    def contains_many(self, words):
+        """
+        Membership of a batch of words. A capitalised word also counts as known
+        when its lowercase-initial form is, as at the start of a sentence.
+
+        Returns:
+            NumPy bool array, one per input word
+        """
+        start = time.perf_counter()
+        if not isinstance(words, (list, tuple)):
+            words = list(words)
+        found = self._contains_hashes(hash_words(words))
+        retry = [i for i in np.nonzero(~found)[0].tolist() if words[i][:1].isupper()]
+        if retry:
+            found[retry] = self._contains_hashes(hash_words([words[i][:1].lower() + words[i][1:] for i in retry]))
+        self.lookups += len(words)
+        self.hits += int(found.sum())
+        self.seconds += time.perf_counter() - start
+        return found
+
+    def __contains__(self, word):
+        return bool(self.contains_many([word])[0])
+
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def report(self, seconds_per_score=None):
+        """
+        One-line summary of the lookups so far.
+
+        Args:
+            seconds_per_score: Model time per word, to estimate the time saved
+                               by the hits that skipped the model
+        """
+        summary = (f"Known-word filter: {self.hits}/{self.lookups} tokens known ({self.hit_rate() * 100:.1f}%), "
+                   f"{self.bloom_rejects} probes rejected by the Bloom filter, {self.seconds:.3f}s in lookups")
+        if seconds_per_score is not None:
+            saved = self.hits * seconds_per_score - self.seconds
+            summary += f", ~{saved:.3f}s of model time saved"
+        return summary
+
+
+def main():
+    from SpellDetectorCorrector import SpellErrorDetector
+
+    parser = argparse.ArgumentParser(description="Measure the known-word pre-filter on a text.")
+    parser.add_argument('--text', default=DEFAULT_TEXT, help="UTF-8 text to check")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--bloom-bits', type=int, default=0, help="Bloom filter bits per word, 0 for none")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    known = KnownWords.for_dictionaries(bloom_bits=args.bloom_bits)
+    print(f"Known words: {len(known)} hashes, {known.nbytes / 1e6:.2f} MB, ready in {time.perf_counter() - start:.3f}s")
+
+    with open(args.text, 'r', encoding='utf-8') as f:
+        text = f.read()
+    flagged = {}
+    seconds_per_score = None
+    for name, dictionary in (('model only', False), ('with filter', known)):
+        detector = SpellErrorDetector(args.model, known_words=dictionary)
+        start = time.perf_counter()
+        results = list(detector.check_stream(text))
+        elapsed = time.perf_counter() - start
+        flagged[name] = {(r.offset, r.token) for r in results if r.flagged}
+        print(f"{name}: {len(results)} tokens in {elapsed:.3f}s, {detector.scorer.words_scored} scored, "
+              f"{len(flagged[name])} flagged")
+        if seconds_per_score is None:
+            seconds_per_score = detector.scorer.seconds / max(detector.scorer.words_scored, 1)
+        detector.close()
+    print(known.report(seconds_per_score))
+    print(f"Flagged by the model alone but known to the dictionary: "
+          f"{len(flagged['model only'] - flagged['with filter'])}")
+
+
+if __name__ == '__main__':
+    main()
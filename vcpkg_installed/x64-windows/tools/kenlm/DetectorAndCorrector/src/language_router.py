@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Pick the language of mixed isiZulu/isiXhosa/isiNdebele/siSwati input.
+
+Every *UModel.arpa model scores the text one character at a time through its
+own KenLM state. Evidence accumulates over the tokens of the sentence or
+document, and routing stops as soon as one language leads the runner-up by
+the configured margin; a language that falls that far behind is dropped
+earlier. Most documents are decided after a few tokens instead of scoring
+every word against all four models.
+
+Usage:
+    python language_router.py                 # routing accuracy and cost on test_data words
+    python language_router.py --words 5 --margin 5
+"""
+
+import argparse
+import os
+import time
+
+import kenlm
+
+from SpellDetectorCorrector import SpellErrorDetector, iter_chunks, tokenize_stream
+from char_scorer import load_test_pairs
+
+KENLM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kenlm')
+TEST_DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 6, 'test_data'))
+
+LANGUAGES = ['isiZulu', 'isiXhosa', 'isiNdebele', 'siSwati']
+
+
+class RouteResult:
+    """Outcome of routing one text: the chosen language and the evidence behind it"""
+    __slots__ = ('language', 'scores', 'tokens', 'chars', 'calls', 'decided')
+
+    def __init__(self, language, scores, tokens, chars, calls, decided):
+        self.language = language
+        # language -> log10 probability of the text read while that language was still in the running
+        self.scores = scores
+        self.tokens = tokens      # tokens read before stopping
+        self.chars = chars        # characters read (including one </s> per token)
+        self.calls = calls        # character scores computed over all models
+        self.decided = decided    # True if every other language fell behind by the margin
+
+    def __repr__(self):
+        return (f"RouteResult({self.language!r}, tokens={self.tokens}, chars={self.chars}, "
+                f"calls={self.calls}, decided={self.decided})")
+
+
+class LanguageRouter:
+    def __init__(self, model_paths=None, margin=8.0, max_tokens=None, threshold=-10):
+        """
+        Args:
+            model_paths: Dict of language -> character model path, defaults to
+                         the four kenlm/<language>UModel.arpa files
+            margin: Log10 gap behind the leader at which a language is dropped
+            max_tokens: Stop after this many tokens even without a clear lead
+            threshold: Threshold for the detectors handed out by detector_for
+        """
+        if model_paths is None:
+            model_paths = {lang: os.path.join(KENLM_DIR, f'{lang}UModel.arpa') for lang in LANGUAGES}
+        self.model_paths = {lang: os.path.abspath(path) for lang, path in model_paths.items()}
+        self.models = {lang: kenlm.Model(path) for lang, path in self.model_paths.items()}
+        self.margin = margin
+        self.max_tokens = max_tokens
+        self.threshold = threshold
+        self._detectors = {}
+
+    def route_tokens(self, tokens):
+        """
+        Choose a language from a stream of tokens.
+
+        Each model keeps its own KenLM state while a token is scored character
+        by character (with sentence start and end, exactly as the detector scores
+        words). After every character, any language trailing the leader by the
+        margin is dropped and no longer scored; routing ends when one is left.
+        """
+        languages = list(self.models)
+        models = [self.models[lang] for lang in languages]
+        totals = [0.0] * len(models)
+        out = kenlm.State()
+        states = [kenlm.State() for _ in models]
+        active = list(range(len(models)))
+        count = chars = calls = 0
+
+        for token in tokens:
+            count += 1
+            for i in active:
+                models[i].BeginSentenceWrite(states[i])
+            for symbol in list(token) + ['</s>']:
+                for i in active:
+                    totals[i] += models[i].BaseScore(states[i], symbol, out)
+                    states[i], out = out, states[i]
+                chars += 1
+                calls += len(active)
+                best = totals[max(active, key=totals.__getitem__)]
+                active = [i for i in active if best - totals[i] < self.margin]
+                if len(active) == 1:
+                    return RouteResult(languages[active[0]], dict(zip(languages, totals)), count, chars, calls, True)
+            if self.max_tokens and count >= self.max_tokens:
+                break
+
+        best = max(active, key=totals.__getitem__)
+        return RouteResult(languages[best], dict(zip(languages, totals)), count, chars, calls, False)
+
+    def route(self, source, chunk_size=1 << 16):
+        """
+        Choose a language for a sentence or document.
+
+        Args:
+            source: Text, an open text file, or an iterable of text chunks
+        """
+        return self.route_tokens(token for _, token in tokenize_stream(iter_chunks(source, chunk_size)))
+
+    def detector_for(self, language):
+        """SpellErrorDetector for a language (or a RouteResult), created once and reused"""
+        if isinstance(language, RouteResult):
+            language = language.language
+        if language not in self._detectors:
+            self._detectors[language] = SpellErrorDetector(self.model_paths[language], threshold=self.threshold)
+        return self._detectors[language]
+
+    def check_text(self, text, **kwargs):
+        """
+        Route a text and check it with the chosen language's detector.
+
+        Returns:
+            (RouteResult, iterator of TokenResult); kwargs go to check_stream
+        """
+        result = self.route(text)
+        return result, self.detector_for(result).check_stream(text, **kwargs)
+
+    def close(self):
+        for detector in self._detectors.values():
+            detector.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing accuracy and cost on documents built from the test pairs.")
+    parser.add_argument('--words', type=int, default=10, help="correct words per routed document")
+    parser.add_argument('--margin', type=float, default=8.0)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Language Routing")
+    print("=" * 80)
+    router = LanguageRouter(margin=args.margin)
+
+    print(f"\n{'Language':12s} {'Docs':>6s} {'Correct':>8s} {'Early':>7s} {'Tokens':>8s} {'Scored':>11s} {'Full cost':>10s} {'Seconds':>8s}")
+    print('-' * 80)
+    for lang in router.models:
+        test_path = os.path.join(TEST_DATA_DIR, f'{lang}_test_pairs.txt')
+        if not os.path.exists(test_path):
+            print(f"[WARN] {lang}: missing {test_path}")
+            continue
+        _, correct_words = load_test_pairs(test_path)
+        documents = [' '.join(correct_words[i:i + args.words]) for i in range(0, len(correct_words), args.words)]
+
+        correct = early = tokens = calls = full = 0
+        start = time.perf_counter()
+        for document in documents:
+            result = router.route(document)
+            correct += result.language == lang
+            early += result.decided
+            tokens += result.tokens
+            calls += result.calls
+            # scoring every token with every model: each character plus </s>
+            full += len(router.models) * sum(len(token) + 1 for _, token in tokenize_stream([document]))
+        seconds = time.perf_counter() - start
+        print(f"{lang:12s} {len(documents):6d} {correct / len(documents) * 100:7.1f}% "
+              f"{early / len(documents) * 100:6.1f}% {tokens:8d} {calls:11d} {full:10d} {seconds:8.3f}")
+    print("\nScored / Full cost: character scores computed while routing vs scoring every token with every model.")
+
+
+if __name__ == '__main__':
+    main()
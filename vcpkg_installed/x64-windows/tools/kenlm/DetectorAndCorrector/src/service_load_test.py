@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Load test for spellcheck_service.py.
+
+Replays the words of test_data (the misspelled/correct pairs and the
+*_with_errors lists) against a running service at a fixed request rate.
+Requests are sent open-loop, on schedule whether or not earlier ones have
+answered, over a pool of keep-alive connections, so queueing in the service
+shows up as latency and 503s rather than as a lower send rate. Latency is
+measured from each request's scheduled send time, so time spent waiting for
+a free connection counts too.
+
+Usage:
+    python spellcheck_service.py &
+    python service_load_test.py --qps 200 --duration 10
+    python service_load_test.py --endpoint score --qps 100 --language siSwati
+    python service_load_test.py --endpoint suggest --qps 20     # isiZulu only
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+
+from spellcheck_service import LANGUAGES, LatencyHistogram
+
+TEST_DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 6, 'test_data'))
+
+
+def read_test_words(language):
+    """(misspelled, correct) pairs of a language followed by its with_errors words as (word, None)"""
+    pairs = []
+    with open(os.path.join(TEST_DATA_DIR, f'{language}_test_pairs.txt'), 'r', encoding='utf-8') as f:
+        for line in f:
+            if ' - ' in line:
+                wrong, right = line.strip().split(' - ', 1)
+                pairs.append((wrong, right))
+    # the isiZulu list is named in lowercase
+    for name in (f'{language}_with_errors', f'{language.lower()}_with_errors'):
+        path = os.path.join(TEST_DATA_DIR, name)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                pairs.extend((line.strip(), None) for line in f if line.strip())
+            break
+    return pairs
+
+
+def make_requests(endpoint, language, pairs, words_per_request, seed=0):
+    """Endless stream of request bodies built from the test words"""
+    rng = random.Random(seed)
+    words = [word for pair in pairs for word in pair if word]
+    misspelled = [wrong for wrong, _ in pairs]
+    while True:
+        if endpoint == 'suggest':
+            body = {'language': language, 'word': rng.choice(misspelled), 'k': 5}
+        elif endpoint == 'score':
+            body = {'language': language, 'words': rng.sample(words, words_per_request)}
+        else:
+            body = {'language': language, 'text': ' '.join(rng.sample(words, words_per_request))}
+        yield json.dumps(body, ensure_ascii=False).encode('utf-8')
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection, one request at a time"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, path, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write((f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode('latin-1')
+                          + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        await self.reader.readexactly(length)
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+async def fetch_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /stats HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+    data = await reader.read()
+    writer.close()
+    return json.loads(data.split(b'\r\n\r\n', 1)[1])
+
+
+async def run(args):
+    pairs = read_test_words(args.language)
+    bodies = make_requests(args.endpoint, args.language, pairs, args.words)
+    idle = asyncio.Queue()
+    for _ in range(args.connections):
+        idle.put_nowait(Connection(args.host, args.port))
+    histogram = LatencyHistogram()
+    statuses = {}
+    failures = 0
+
+    async def send(body, scheduled):
+        nonlocal failures
+        connection = await idle.get()
+        try:
+            status = await connection.request(f'/{args.endpoint}', body)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            connection.close()
+            failures += 1
+        else:
+            histogram.add((loop.time() - scheduled) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            idle.put_nowait(connection)
+
+    print(f"{args.endpoint} x {args.language}: {args.qps} requests/s for {args.duration}s "
+          f"over {args.connections} connections, {len(pairs)} test words")
+    loop = asyncio.get_running_loop()
+    tasks = []
+    total = int(args.qps * args.duration)
+    start = loop.time()
+    for i in range(total):
+        scheduled = start + i / args.qps
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(loop.create_task(send(next(bodies), scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    while not idle.empty():
+        idle.get_nowait().close()
+
+    summary = histogram.summary()
+    print(f"Sent {total} requests in {elapsed:.2f}s ({total / elapsed:.1f}/s achieved), "
+          f"statuses {dict(sorted(statuses.items()))}, {failures} connection failures")
+    print(f"Latency: mean {summary['mean_ms']:.2f} ms, p50 <= {summary['p50_ms']} ms, "
+          f"p95 <= {summary['p95_ms']} ms, p99 <= {summary['p99_ms']} ms")
+    stats = await fetch_stats(args.host, args.port)
+    batching = stats['batching'].get(f"{args.endpoint}/{args.language}")
+    if batching:
+        print(f"Service: {batching['batches']} batches, {batching['mean_batch']:.1f} requests per batch, "
+              f"{batching['rejected']} rejected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay test_data against the spellcheck service.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--endpoint', choices=['check', 'score', 'suggest'], default='check')
+    parser.add_argument('--language', choices=LANGUAGES, default='isiZulu')
+    parser.add_argument('--qps', type=float, default=100, help="target requests per second")
+    parser.add_argument('--duration', type=float, default=10, help="seconds to send for")
+    parser.add_argument('--connections', type=int, default=32, help="keep-alive connections")
+    parser.add_argument('--words', type=int, default=8, help="words per check or score request")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Local HTTP/JSON spellcheck service holding one warm detector per language.
+
+Editor plugins and batch jobs POST to it instead of each loading the models:
+
+    POST /check    {"language": "isiZulu", "text": "...", "flagged_only": false}
+                   -> {"tokens": [{"offset", "token", "score", "flagged"}, ...]}
+    POST /score    {"language": "isiZulu", "words": ["...", ...]}  -> {"scores": [...]}
+    POST /suggest  {"language": "isiZulu", "word": "...", "k": 5}  -> {"suggestions": [...]}
+                   (only for languages with dictionaries; 400 for the others)
+    GET  /stats    batching, backpressure and per-endpoint latency histograms
+    GET  /health
+
+Concurrent requests for the same language and endpoint are coalesced into
+micro-batches (up to --max-batch requests, waiting at most --max-wait-ms for
+more after the first) and each batch runs on a worker thread, so the event
+loop keeps accepting connections while the models score. Each batcher queues
+at most --max-pending requests; past that the service answers 503 with
+Retry-After instead of letting latency grow without bound.
+
+Usage:
+    python spellcheck_service.py                          # all four languages on 127.0.0.1:8765
+    python spellcheck_service.py --languages isiZulu --port 9000 --max-wait-ms 2
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from SpellDetectorCorrector import SpellErrorDetector
+
+KENLM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kenlm')
+
+LANGUAGES = ['isiZulu', 'isiXhosa', 'isiNdebele', 'siSwati']
+
+# upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = [0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, math.inf]
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+MAX_BODY = 1 << 20
+
+
+class Overloaded(Exception):
+    """Raised when a batcher's queue is full"""
+
+
+class RequestError(Exception):
+    """Raised for a malformed request; answered with status 400"""
+
+
+class LatencyHistogram:
+    """Request latencies counted in fixed log-spaced buckets"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.bounds[-1]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': {('+inf' if math.isinf(b) else str(b)): c for b, c in zip(self.bounds, self.counts) if c},
+        }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent submissions into batches for a handler that takes a
+    list of items and returns a list of results, run on an executor. A result
+    that is an exception fails only its own item's future.
+    """
+
+    def __init__(self, handler, executor, max_batch=64, max_wait=0.005, max_pending=1024):
+        self.handler = handler
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self._task = None
+
+    def submit(self, item):
+        """Queue an item; returns a future for its result. Raises Overloaded when the queue is full."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded() from None
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = await loop.run_in_executor(self.executor, self.handler, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch': self.items / self.batches if self.batches else 0.0,
+            'queued': self.queue.qsize(),
+            'rejected': self.rejected,
+        }
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+
+
+def _score(value):
+    """JSON has no NaN; unscored tokens (dictionary words) get null"""
+    return None if math.isnan(value) else value
+
+
+class SpellcheckService:
+    def __init__(self, languages=None, threshold=-10, max_batch=64, max_wait=0.005, max_pending=1024, workers=None):
+        """
+        Args:
+            languages: Languages to serve, each with its kenlm/<language>UModel.arpa model
+            max_batch: Requests per micro-batch
+            max_wait: Seconds a batch waits for more requests after its first
+            max_pending: Requests queued per language and endpoint before 503s
+            workers: Executor threads, default one per language
+        """
+        languages = languages or LANGUAGES
+        self.detectors = {}
+        for language in languages:
+            model_path = os.path.join(KENLM_DIR, f'{language}UModel.arpa')
+            self.detectors[language] = SpellErrorDetector(model_path, threshold=threshold)
+        self.executor = ThreadPoolExecutor(max_workers=workers or len(self.detectors))
+        handlers = {'check': self._check_batch, 'score': self._score_batch, 'suggest': self._suggest_batch}
+        self.batchers = {
+            (endpoint, language): MicroBatcher(self._bind(handler, language), self.executor,
+                                               max_batch, max_wait, max_pending)
+            for endpoint, handler in handlers.items() for language in self.detectors
+        }
+        self.latency = {endpoint: LatencyHistogram() for endpoint in list(handlers) + ['stats', 'health']}
+        self.errors = 0
+        self.started = time.time()
+
+    @staticmethod
+    def _bind(handler, language):
+        def run(items):
+            try:
+                return handler(language, items)
+            except Exception:
+                if len(items) == 1:
+                    raise
+            # retry the requests one at a time so only the one that fails gets the error
+            results = []
+            for item in items:
+                try:
+                    results.extend(handler(language, [item]))
+                except Exception as e:
+                    results.append(e)
+            return results
+        return run
+
+    def _check_batch(self, language, items):
+        detector = self.detectors[language]
+        texts = [item['text'] for item in items]
+        results = detector.check_many(texts)
+        return [{'tokens': [{'offset': r.offset, 'token': r.token, 'score': _score(r.score), 'flagged': r.flagged}
+                            for r in tokens if r.flagged or not item.get('flagged_only')]}
+                for item, tokens in zip(items, results)]
+
+    def _score_batch(self, language, items):
+        # one scorer call for the words of every request in the batch
+        words = [word for item in items for word in item['words']]
+        scores = self.detectors[language].score_words(words).tolist()
+        results, start = [], 0
+        for item in items:
+            results.append({'scores': scores[start:start + len(item['words'])]})
+            start += len(item['words'])
+        return results
+
+    def _suggest_batch(self, language, items):
+        detector = self.detectors[language]
+        results = []
+        for item in items:
+            try:
+                results.append({'suggestions': detector.suggest(item['word'], item.get('k', 5))})
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _validate(self, endpoint, request):
+        if not isinstance(request, dict):
+            raise RequestError("request body must be a JSON object")
+        language = request.get('language', 'isiZulu')
+        if language not in self.detectors:
+            raise RequestError(f"language must be one of {sorted(self.detectors)}")
+        field, kind = {'check': ('text', str), 'score': ('words', list), 'suggest': ('word', str)}[endpoint]
+        if not isinstance(request.get(field), kind):
+            raise RequestError(f"{endpoint} needs a {kind.__name__} '{field}'")
+        if endpoint == 'score' and not all(isinstance(word, str) for word in request['words']):
+            raise RequestError("words must be strings")
+        if endpoint == 'suggest' and self.detectors[language].dictionaries is None:
+            raise RequestError(f"no dictionary for {language}; suggest serves "
+                               f"{sorted(l for l, d in self.detectors.items() if d.dictionaries is not None)}")
+        if endpoint == 'suggest' and 'k' in request:
+            k = request['k']
+            if not isinstance(k, int) or isinstance(k, bool) or k < 1:
+                raise RequestError("k must be a positive integer")
+        return language
+
+    async def handle(self, method, path, body):
+        """Answer one request; returns (status, JSON-serializable payload)"""
+        endpoint = path.strip('/').split('?', 1)[0]
+        if endpoint == 'health':
+            return 200, {'status': 'ok', 'languages': sorted(self.detectors)}
+        if endpoint == 'stats':
+            return 200, self.stats()
+        if endpoint not in ('check', 'score', 'suggest'):
+            return 404, {'error': f"no endpoint {path}"}
+        if method != 'POST':
+            return 405, {'error': f"{path} takes POST"}
+        try:
+            request = json.loads(body or b'null')
+            language = self._validate(endpoint, request)
+        except (ValueError, RequestError) as e:
+            return 400, {'error': str(e)}
+        try:
+            return 200, await self.batchers[endpoint, language].submit(request)
+        except Overloaded:
+            return 503, {'error': "overloaded, retry later"}
+
+    def stats(self):
+        return {
+            'uptime_s': time.time() - self.started,
+            'errors': self.errors,
+            'latency': {endpoint: histogram.summary() for endpoint, histogram in self.latency.items()
+                        if histogram.count},
+            'batching': {f"{endpoint}/{language}": batcher.stats()
+                         for (endpoint, language), batcher in self.batchers.items() if batcher.items or batcher.rejected},
+        }
+
+    async def serve_connection(self, reader, writer):
+        """HTTP/1.1 with keep-alive: one request after another on the connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "malformed request line"}, close=True)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {'error': "body too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                start = time.perf_counter()
+                try:
+                    status, payload = await self.handle(method, path, body)
+                except Exception as e:
+                    self.errors += 1
+                    status, payload = 500, {'error': str(e)}
+                endpoint = path.strip('/').split('?', 1)[0]
+                if endpoint in self.latency:
+                    self.latency[endpoint].add((time.perf_counter() - start) * 1000)
+                close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+                await self._respond(writer, status, payload, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, close=False):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                "Content-Type: application/json; charset=utf-8",
+                f"Content-Length: {len(data)}"]
+        if status == 503:
+            head.append("Retry-After: 1")
+        if close:
+            head.append("Connection: close")
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+        await writer.drain()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        print(f"Serving {', '.join(sorted(self.detectors))} on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        for batcher in self.batchers.values():
+            batcher.close()
+        self.executor.shutdown(wait=False)
+        for detector in self.detectors.values():
+            detector.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the spellchecker over local HTTP/JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--languages', nargs='+', default=LANGUAGES, choices=LANGUAGES)
+    parser.add_argument('--threshold', type=float, default=-10)
+    parser.add_argument('--max-batch', type=int, default=64, help="requests per micro-batch")
+    parser.add_argument('--max-wait-ms', type=float, default=5, help="wait for more requests after the first of a batch")
+    parser.add_argument('--max-pending', type=int, default=1024, help="queued requests per batcher before 503s")
+    parser.add_argument('--workers', type=int, default=None, help="executor threads (default: one per language)")
+    args = parser.parse_args()
+
+    service = SpellcheckService(args.languages, args.threshold, args.max_batch, args.max_wait_ms / 1000,
+                                args.max_pending, args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(service.stats(), indent=2))
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
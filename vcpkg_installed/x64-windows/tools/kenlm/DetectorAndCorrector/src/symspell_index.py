@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+In-process spelling suggestions from a SymSpell-style deletion index.
+
+Every dictionary word is filed under each string obtained by deleting up to
+max_distance characters from its first prefix_length characters. A
+misspelling reaches its corrections through its own deletions: any word
+within max_distance edits shares at least one of them. The candidates are
+checked with an exact (restricted) Damerau-Levenshtein distance and ranked by
+distance, then by the character LM score plus a corpus frequency prior.
+
+The index is stored under model_cache/ as plain .npy arrays (sorted 64-bit
+deletion hashes, their word ids, and the words as one UTF-8 blob), keyed by
+the contents of the dictionary files, so it is memory-mapped on later runs
+instead of rebuilt.
+
+Usage:
+    python symspell_index.py                  # build the index, report top-1/top-5 on test_data
+    python symspell_index.py --word izizahtu
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+# The shared scoring module lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 6)))
+
+from char_scorer import CharScorer, load_test_pairs
+from dictionaries import (DEFAULT_DICTIONARIES, SRC_DIR, cache_directory, has_arrays, load_arrays,
+                          read_dictionaries, save_arrays)
+
+DEFAULT_CORPUS = os.path.join(SRC_DIR, 'kenlm', 'isiZuluCorpus.txt')
+DEFAULT_MODEL = os.path.join(SRC_DIR, 'kenlm', 'isiZuluUModel.arpa')
+TEST_DATA_DIR = os.path.abspath(os.path.join(SRC_DIR, *[os.pardir] * 6, 'test_data'))
+
+FORMAT_VERSION = 4
+ARRAYS = ('keys', 'ids', 'offsets', 'blob', 'lengths', 'letters', 'counts')
+# letter histograms fold the alphabet into this many buckets
+LETTER_BUCKETS = 32
+WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def _hash(s):
+    return int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def letter_histogram(word):
+    """Letter counts of word, folded into LETTER_BUCKETS buckets."""
+    histogram = np.zeros(LETTER_BUCKETS, dtype=np.int16)
+    np.add.at(histogram, np.frombuffer(word.encode('utf-32-le'), dtype=np.uint32) % LETTER_BUCKETS, 1)
+    return histogram
+
+
+def deletes(word, max_distance):
+    """Every string obtained by deleting up to max_distance characters from word (including word)."""
+    found = {word}
+    frontier = [word]
+    for _ in range(max_distance):
+        frontier = [w[:i] + w[i + 1:] for w in frontier if w for i in range(len(w))]
+        frontier = [w for w in frontier if w not in found]
+        found.update(frontier)
+    return found
+
+
+def edit_distance(a, b, limit):
+    """
+    Restricted Damerau-Levenshtein distance (adjacent swaps cost 1), or
+    limit + 1 as soon as it is certain to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # a shared prefix and suffix never change the distance, and candidates usually share long ones
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if not a or not b:
+        return len(a) + len(b)
+    # only cells within limit of the diagonal can lead to a distance within limit
+    big = limit + 1
+    prev2 = None
+    prev = [j if j <= limit else big for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        cur = [big] * (len(b) + 1)
+        if i <= limit:
+            cur[0] = i
+        row_min = cur[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1] and prev2[j - 2] + 1 < d:
+                d = prev2[j - 2] + 1
+            cur[j] = d
+            if d < row_min:
+                row_min = d
+        if row_min > limit:
+            return big
+        prev2, prev = prev, cur
+    return min(prev[-1], big)
+
+
+def corpus_counts(corpus_path, vocabulary):
+    """Occurrences of every vocabulary word in a corpus, as an int32 array in vocabulary order."""
+    index = {word: i for i, word in enumerate(vocabulary)}
+    counts = np.zeros(len(vocabulary), dtype=np.int32)
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            for token in WORD_RE.findall(line):
+                i = index.get(token)
+                if i is None:
+                    i = index.get(token.lower())
+                if i is not None:
+                    counts[i] += 1
+    return counts
+
+
+class SymSpellIndex:
+    def __init__(self, arrays, max_distance, prefix_length):
+        """Use build() or load(); arrays is a dict of the ARRAYS NumPy arrays."""
+        # plain ndarray views of memory-mapped arrays skip np.memmap's per-slice overhead
+        arrays = {name: np.asarray(array) for name, array in arrays.items()}
+        self.keys = arrays['keys']        # sorted uint64 hashes of the deletion strings
+        self.ids = arrays['ids']          # word id filed under each key
+        self.offsets = arrays['offsets']  # word i is blob[offsets[i]:offsets[i + 1]]
+        self.blob = arrays['blob']
+        self.lengths = arrays['lengths']  # length of each word in characters
+        self.letters = arrays['letters']  # letter histogram of each word
+        self.counts = arrays['counts']    # corpus frequency of each word
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.total = int(self.counts.sum())
+        self._words = {}
+        self.lookups = 0
+        self.candidates_checked = 0
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def build(cls, words, max_distance=2, prefix_length=7, counts=None):
+        """
+        Args:
+            words: Dictionary words
+            max_distance: Largest edit distance suggestions are searched at
+            prefix_length: Only deletions of each word's first prefix_length
+                           characters are indexed (SymSpell's prefix trick)
+            counts: Corpus frequency of each word, for the ranking prior
+        """
+        keys, ids = [], []
+        for i, word in enumerate(words):
+            for d in deletes(word[:prefix_length], max_distance):
+                keys.append(_hash(d))
+                ids.append(i)
+        keys = np.array(keys, dtype=np.uint64)
+        order = np.argsort(keys, kind='stable')
+        encoded = [word.encode('utf-8') for word in words]
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        arrays = {
+            'keys': keys[order],
+            'ids': np.array(ids, dtype=np.int32)[order],
+            'offsets': offsets,
+            'blob': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+            'lengths': np.array([len(word) for word in words], dtype=np.int32),
+            'letters': np.array([letter_histogram(word) for word in words], dtype=np.uint8).reshape(-1, LETTER_BUCKETS),
+            'counts': np.zeros(len(words), dtype=np.int32) if counts is None else np.asarray(counts, dtype=np.int32),
+        }
+        return cls(arrays, max_distance, prefix_length)
+
+    def save(self, directory):
+        save_arrays(directory, {name: getattr(self, name) for name in ARRAYS})
+
+    @classmethod
+    def load(cls, directory, max_distance=2, prefix_length=7):
+        """Memory-map a saved index."""
+        return cls(load_arrays(directory, ARRAYS), max_distance, prefix_length)
+
+    @classmethod
+    def for_dictionaries(cls, paths=None, corpus_path=None, max_distance=2, prefix_length=7, cache_dir=None):
+        """
+        Index of the dictionary files, loaded from the cache when it was built
+        from the same file contents and settings, otherwise built and cached.
+
+        Args:
+            paths: Dictionary files (one word per line), default
+                   dictionaries.DEFAULT_DICTIONARIES
+            corpus_path: Corpus for the frequency prior, default the isiZulu corpus if present
+        """
+        paths = DEFAULT_DICTIONARIES if paths is None else paths
+        if corpus_path is None and os.path.exists(DEFAULT_CORPUS):
+            corpus_path = DEFAULT_CORPUS
+        directory = cache_directory('symspell', list(paths) + ([corpus_path] if corpus_path else []),
+                                    f"{FORMAT_VERSION}:{max_distance}:{prefix_length}", cache_dir)
+        if has_arrays(directory, ARRAYS):
+            return cls.load(directory, max_distance, prefix_length)
+
+        words = sorted(read_dictionaries(paths))
+        counts = corpus_counts(corpus_path, words) if corpus_path else None
+        index = cls.build(words, max_distance, prefix_length, counts)
+        index.save(directory)
+        return index
+
+    def word(self, i):
+        word = self._words.get(i)
+        if word is None:
+            word = bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+            self._words[i] = word
+        return word
+
+    def _matches(self, word, max_distance=None):
+        """(word id, distance) of every dictionary word within max_distance edits, closest first"""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        self.lookups += 1
+        hashes = np.fromiter((_hash(d) for d in deletes(word[:self.prefix_length], max_distance)), dtype=np.uint64)
+        starts = np.searchsorted(self.keys, hashes, side='left')
+        ends = np.searchsorted(self.keys, hashes, side='right')
+        hit = ends > starts
+        if not hit.any():
+            return []
+        ids = np.unique(np.concatenate([self.ids[s:e] for s, e in zip(starts[hit], ends[hit])]))
+        ids = ids[np.abs(self.lengths[ids] - len(word)) <= max_distance]
+        # one edit changes the letter counts by at most 2 in total, so most candidates fail this cheap bound
+        spread = np.abs(self.letters[ids].astype(np.int16) - letter_histogram(word)).sum(axis=1)
+        ids = ids[spread <= 2 * max_distance]
+
+        found = []
+        for i in ids.tolist():
+            self.candidates_checked += 1
+            distance = edit_distance(word, self.word(i), max_distance)
+            if distance <= max_distance:
+                found.append((i, distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def lookup(self, word, max_distance=None):
+        """
+        Dictionary words within max_distance edits of word.
+
+        Returns:
+            List of (candidate, distance), closest first
+        """
+        return [(self.word(i), distance) for i, distance in self._matches(word, max_distance)]
+
+    def suggest(self, word, k=5, scorer=None, prior_weight=1.0):
+        """
+        Up to k corrections for word.
+
+        Candidates are ordered by edit distance, then by the character LM
+        score (when a scorer is given) plus prior_weight times the add-one
+        log10 corpus frequency.
+
+        Returns:
+            List of (candidate, distance, score)
+        """
+        found = self._matches(word)
+        if not found:
+            return []
+        ids = np.array([i for i, _ in found], dtype=np.intp)
+        candidates = [self.word(i) for i in ids.tolist()]
+        score = prior_weight * np.log10((self.counts[ids] + 1.0) / (self.total + len(self)))
+        if scorer is not None:
+            score = score + scorer.score_many(candidates)
+        order = sorted(range(len(found)), key=lambda i: (found[i][1], -score[i]))
+        return [(candidates[i], found[i][1], float(score[i])) for i in order[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the deletion index and evaluate its suggestions.")
+    parser.add_argument('--word', nargs='+', help="show suggestions for these words")
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="character model used for ranking")
+    parser.add_argument('--language', default='isiZulu', help="test pairs to evaluate on")
+    parser.add_argument('-k', type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = SymSpellIndex.for_dictionaries()
+    print(f"Index of {len(index)} words, {len(index.keys)} deletions, ready in {time.perf_counter() - start:.3f}s")
+    scorer = CharScorer(args.model) if os.path.exists(args.model) else None
+
+    if args.word:
+        for word in args.word:
+            print(f"{word}: " + ', '.join(f"{c} ({d}, {s:.2f})" for c, d, s in index.suggest(word, args.k, scorer)))
+        return
+
+    wrong_words, correct_words = load_test_pairs(os.path.join(TEST_DATA_DIR, f'{args.language}_test_pairs.txt'))
+    pairs = [(w.lower(), c.lower()) for w, c in zip(wrong_words, correct_words)]
+    known = [(w, c) for w, c in pairs if index.lookup(c, 0)]
+    top1 = top_k = 0
+    start = time.perf_counter()
+    for wrong, correct in known:
+        suggestions = [candidate for candidate, _, _ in index.suggest(wrong, args.k, scorer)]
+        top1 += bool(suggestions) and suggestions[0] == correct
+        top_k += correct in suggestions
+    elapsed = time.perf_counter() - start
+    print(f"{args.language}: {len(known)} of {len(pairs)} corrections are dictionary words")
+    print(f"  top-1 {top1 / len(known) * 100:.1f}%  top-{args.k} {top_k / len(known) * 100:.1f}%  "
+          f"{elapsed / len(known) * 1000:.2f} ms per suggest, "
+          f"{index.candidates_checked / max(index.lookups, 1):.1f} candidates checked per lookup")
+
+
+if __name__ == '__main__':
+    main()
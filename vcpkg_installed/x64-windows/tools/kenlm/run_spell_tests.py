@@ -1,6 +1,10 @@
 import os
 import sys
-import kenlm
+
+# The shared scoring module lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 4)))
+
+from char_scorer import CharScorer, load_test_pairs
 
 
 LANGS = [
@@ -11,11 +15,6 @@ LANGS = [
 ]
 
 
-def char_score(model: kenlm.LanguageModel, word: str) -> float:
-    seq = " ".join(list(word.strip()))
-    return model.score(seq, bos=True, eos=True)
-
-
 def run_language(tools_dir: str, name: str, model_file: str, test_file: str, margin: float = 1.5):
     model_path = os.path.join(tools_dir, model_file)
     test_path = os.path.join(tools_dir, test_file)
@@ -27,24 +26,17 @@ def run_language(tools_dir: str, name: str, model_file: str, test_file: str, mar
         print(f"[WARN] {name}: Missing test file {test_file}")
         return None
 
-    lm = kenlm.LanguageModel(model_path)
+    scorer = CharScorer(model_path, cache=True)
 
-    total = 0
-    correct = 0
-    with open(test_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line or '-' not in line:
-                continue
-            wrong, correct_word = [w.strip() for w in line.split('-', 1)]
-            s_wrong = char_score(lm, wrong)
-            s_correct = char_score(lm, correct_word)
-            if (s_correct - s_wrong) > margin:
-                correct += 1
-            total += 1
+    wrong_words, correct_words = load_test_pairs(test_path)
+    s_wrong = scorer.score_many(wrong_words)
+    s_correct = scorer.score_many(correct_words)
+    correct = int(((s_correct - s_wrong) > margin).sum())
+    total = len(wrong_words)
 
     acc = (correct / total * 100.0) if total else 0.0
     print(f"{name}: {correct}/{total} = {acc:.2f}%")
+    print(f"  {scorer.report()}")
     return name, correct, total, acc
 
 